@@ -3,28 +3,70 @@
 # Version 1.0.7
 
 
-
-import pickle
-import faiss
+import json
+import argparse
+import numpy as np
 from pathlib import Path
 
+from src import vector_store
+from src import faiss_index
+
 ROOT = Path(__file__).resolve().parent
 VAR_DIR = ROOT / "var"
-VECTORSTORE_FILE = VAR_DIR / "vectorstore.pkl"
+VECTORSTORE_DIR = vector_store.DEFAULT_STORE_DIR
 FAISS_INDEX_FILE = VAR_DIR / "vectorstore.index"
 
-with open(VECTORSTORE_FILE, "rb") as f:
-    store = pickle.load(f)
 
-embeddings = store["embeddings"]
-items = store["items"]
+def main():
+    parser = argparse.ArgumentParser(description="Build (or benchmark) the FAISS index over var/vectorstore.")
+    parser.add_argument("--type", choices=faiss_index.INDEX_TYPES, default="flat")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cells (ivf, ivfpq).")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF cells probed per query (ivf, ivfpq).")
+    parser.add_argument("--m", type=int, default=None, help="HNSW neighbours per node.")
+    parser.add_argument("--ef-construction", type=int, default=None, help="HNSW build beam width.")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW query beam width.")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers (must divide dim).")
+    parser.add_argument("--nbits", type=int, default=None, help="Bits per PQ code.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare all index types (recall@k vs flat, p50/p99 latency) instead of building.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", type=Path, default=FAISS_INDEX_FILE)
+    args = parser.parse_args()
+
+    overrides = {
+        "nlist": args.nlist, "nprobe": args.nprobe, "m": args.m,
+        "ef_construction": args.ef_construction, "ef_search": args.ef_search,
+        "pq_m": args.pq_m, "nbits": args.nbits,
+    }
+
+    store = vector_store.load_store(VECTORSTORE_DIR)
+    emb_matrix = np.ascontiguousarray(store.embeddings, dtype="float32")
+
+    if args.benchmark:
+        results = faiss_index.benchmark(
+            emb_matrix,
+            k=args.k,
+            n_queries=args.queries,
+            overrides={t: overrides for t in faiss_index.INDEX_TYPES},
+        )
+        print(f"FAISS benchmark over {emb_matrix.shape[0]} vectors x {emb_matrix.shape[1]} dims")
+        print(f"{'type':<8}{'recall@' + str(min(args.k, emb_matrix.shape[0])):>12}{'p50 ms':>10}{'p99 ms':>10}{'build s':>10}")
+        for r in results:
+            if "error" in r:
+                print(f"{r['type']:<8}  error: {r['error']}")
+                continue
+            print(f"{r['type']:<8}{r['recall']:>12.4f}{r['p50_ms']:>10.4f}{r['p99_ms']:>10.4f}{r['build_s']:>10.3f}")
+        print(json.dumps(results, indent=2))
+        return
 
-emb_matrix = embeddings.astype("float32")
+    index, params = faiss_index.build_index(args.type, emb_matrix, overrides)
+    faiss_index.save_index(index, args.out, params)
 
-index = faiss.IndexFlatL2(emb_matrix.shape[1])  
-index.add(emb_matrix)
+    print(f"✅ FAISS vector index created at {args.out}")
+    print(f"- Index type: {args.type} {json.dumps({k: v for k, v in params.items() if k != 'type'})}")
+    print(f"- Total vectors indexed: {index.ntotal}")
 
-faiss.write_index(index, str(FAISS_INDEX_FILE))
 
-print(f"✅ FAISS vector index created at {FAISS_INDEX_FILE}")
-print(f"- Total vectors indexed: {index.ntotal}")
+if __name__ == "__main__":
+    main()
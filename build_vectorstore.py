@@ -5,52 +5,89 @@
 
 from pathlib import Path
 import json
-import pickle
-from sentence_transformers import SentenceTransformer
+import time
+import argparse
 import numpy as np
 
+from src import embeddings
+from src import vector_store
+
 
 ROOT = Path(__file__).resolve().parent
-VAR_DIR = ROOT / "var"  
-DATA_DIR = ROOT / "data" / "docs" 
+VAR_DIR = ROOT / "var"
+DATA_DIR = ROOT / "data" / "docs"
 VAR_DIR.mkdir(exist_ok=True)
 
-VECTORSTORE_FILE = VAR_DIR / "vectorstore.pkl"
+VECTORSTORE_DIR = vector_store.DEFAULT_STORE_DIR
 JSON_FILES = ["tasks.json", "events.json", "folders.json", "notes.json", "features.json"]
 
-for f in JSON_FILES:
-    path = VAR_DIR / f
-    if not path.exists():
-        path.write_text("[]", encoding="utf-8")
 
+def collect_items():
+    for f in JSON_FILES:
+        path = VAR_DIR / f
+        if not path.exists():
+            path.write_text("[]", encoding="utf-8")
+
+    items = []
+    texts = []
+
+    for f in JSON_FILES:
+        path = VAR_DIR / f
+        with open(path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+            items.extend(data)
+            for item in data:
+                texts.append(item.get("text") or item.get("title") or item.get("content") or "")
+
+    if DATA_DIR.exists():
+        for file_path in DATA_DIR.glob("**/*"):
+            if file_path.suffix.lower() in ['.txt', '.md']:
+                with open(file_path, "r", encoding="utf-8") as fp:
+                    content = fp.read().strip()
+                    if content:
+                        items.append({"id": file_path.stem, "title": file_path.stem, "content": content, "source": str(file_path)})
+                        texts.append(content)
+
+    return items, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed var/*.json records and data/docs into the var/vectorstore store.")
+    parser.add_argument("--workers", type=int, default=embeddings.EMBED_WORKERS,
+                        help="Embedding processes (one model copy each). 1 = in-process.")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Torch threads per worker. Default: cpu_count // workers.")
+    parser.add_argument("--batch-size", type=int, default=embeddings.EMBED_BATCH_SIZE)
+    parser.add_argument("--quantize", default="",
+                        help="Also write quantized search copies: int8, float16, or both comma-separated.")
+    args = parser.parse_args()
 
-items = []
-texts = []
+    items, texts = collect_items()
 
-for f in JSON_FILES:
-    path = VAR_DIR / f
-    with open(path, "r", encoding="utf-8") as fp:
-        data = json.load(fp)
-        items.extend(data)
-        for item in data:
-            texts.append(item.get("text") or item.get("title") or item.get("content") or "")
+    t0 = time.perf_counter()
+    if args.workers > 1:
+        vectors = embeddings.encode_parallel(
+            texts, workers=args.workers, threads_per_worker=args.threads, batch_size=args.batch_size
+        )
+    else:
+        embeddings.configure(num_threads=args.threads)
+        vectors = embeddings.encode(texts, batch_size=args.batch_size, show_progress_bar=True)
+    elapsed = time.perf_counter() - t0
 
-if DATA_DIR.exists():
-    for file_path in DATA_DIR.glob("**/*"):
-        if file_path.suffix.lower() in ['.txt', '.md']:
-            with open(file_path, "r", encoding="utf-8") as fp:
-                content = fp.read().strip()
-                if content:
-                    items.append({"id": file_path.stem, "title": file_path.stem, "content": content, "source": str(file_path)})
-                    texts.append(content)
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(texts, show_progress_bar=True)
+    vector_store.write_store(VECTORSTORE_DIR, items, vectors, model=embeddings.MODEL_NAME, source="build_vectorstore")
+    if args.quantize:
+        vector_store.quantize_store(VECTORSTORE_DIR, [d.strip() for d in args.quantize.split(",")])
 
+    print(f"✅ Vectorstore created at {VECTORSTORE_DIR}")
+    print(f"- Total documents embedded: {len(items)}")
+    print(f"- Embedding: {len(texts)} texts in {elapsed:.2f}s "
+          f"({len(texts) / elapsed if elapsed > 0 else 0.0:.1f} texts/sec, workers={args.workers})")
+    print(f"- Default JSON tool files initialized in {VAR_DIR}")
+    if args.quantize:
+        sizes = vector_store.load_store(VECTORSTORE_DIR).memory_footprint()
+        print("- Search copies: " + ", ".join(f"{k} {v / 1e6:.2f} MB" for k, v in sizes.items()))
 
-with open(VECTORSTORE_FILE, "wb") as f:
-    pickle.dump({"items": items, "embeddings": embeddings}, f)
 
-print(f"✅ Vectorstore created at {VECTORSTORE_FILE}")
-print(f"- Total documents embedded: {len(items)}")
-print(f"- Default JSON tool files initialized in {VAR_DIR}")
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import and run the agent
-from src.agent107 import cli, WorkerOptions, entrypoint, prewarm
+from src.agent107 import cli, WorkerOptions, entrypoint, prewarm, AGENT_PREWARM_TIMEOUT_S
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, initialize_process_timeout=AGENT_PREWARM_TIMEOUT_S))
@@ -6,7 +6,9 @@
 
 import logging
 import os
+import time
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 import os, json, requests
@@ -45,6 +47,20 @@ try:
 except Exception:
     import query_engine  
 
+try:
+    from src import context_packer
+except Exception:
+    import context_packer
+
+# Fit search_documents results into RAG_CONTEXT_TOKEN_BUDGET tokens before they reach the LLM
+RAG_CONTEXT_PACKING = os.getenv("RAG_CONTEXT_PACKING", "1") != "0"
+
+# Components loaded in prewarm: vad plus query_engine.warmup components (embedder, chroma, query); "none" disables
+AGENT_PREWARM = os.getenv("AGENT_PREWARM", "vad,embedder,chroma,query")
+AGENT_PREWARM_CONCURRENT = os.getenv("AGENT_PREWARM_CONCURRENT", "1") != "0"
+# LiveKit kills a job process whose prewarm runs longer than this (its default is 10 s)
+AGENT_PREWARM_TIMEOUT_S = float(os.getenv("AGENT_PREWARM_TIMEOUT_S", "60"))
+
 
 MYBLOG_INGEST_URL = os.getenv("MYBLOG_INGEST_URL", "http://localhost:3000/api/myblog/ingest")
 MYBLOG_INGEST_TOKEN = os.getenv("MYBLOG_INGEST_TOKEN", "")
@@ -72,6 +88,7 @@ try:
         get_note_by_title,
         get_note_by_content,
         get_note_by_folder_id,
+        search_notes,
 
     )
    
@@ -100,6 +117,7 @@ except Exception:
             get_note_by_folder_id,
             get_note_by_title_and_content,
             get_note_by_title_and_folder_id,
+            search_notes,
 
         )
     except Exception:
@@ -107,6 +125,7 @@ except Exception:
         add_event = list_events = delete_event = None 
         add_folder = list_folders = delete_folder = rename_folder = None 
         add_note = list_notes = delete_note = rename_note = update_note_content = get_note = get_note_by_title = get_note_by_content = get_note_by_folder_id = get_note_by_title_and_content = get_note_by_title_and_folder_id = None  
+        search_notes = None
 
 
 search_documents = getattr(query_engine, "search_documents", None)
@@ -132,9 +151,11 @@ class Assistant(Agent):
             "• If the user mentions calendar/events/reminders/schedule, you MUST call one of:\n"
             "  list_events, add_event, delete_event. Never claim you lack access; tools are your interface.\n"
             "• Only when the user asks about external documents/knowledge (e.g., “search docs”, “what’s in X file”),\n"
-            "  call search_documents (RAG) and incorporate results.\n"
+            "  call search_documents (RAG) and incorporate results. For several related questions in one turn,\n"
+            "  call search_documents_batch once with all of them instead of search_documents repeatedly.\n"
             "• If the user mentions folders/notes/notes in folders, you MUST call one of:\n"
-            "  list_folders, add_folder, delete_folder, rename_folder, list_notes, add_note, delete_note, rename_note, update_note_content, get_note, get_note_by_title, get_note_by_content, get_note_by_folder_id, get_note_by_title_and_content, get_note_by_title_and_folder_id. Never claim you lack access; tools are your interface.\n"
+            "  list_folders, add_folder, delete_folder, rename_folder, list_notes, add_note, delete_note, rename_note, update_note_content, get_note, get_note_by_title, get_note_by_content, get_note_by_folder_id, get_note_by_title_and_content, get_note_by_title_and_folder_id, search_notes. Never claim you lack access; tools are your interface.\n"
+            "• To find a note or task by a word or phrase it contains, call search_notes instead of list_notes.\n"
             "• If the user mentions notes in folders, you MUST call one of:\n"
             "  get_note_by_folder_id, get_note_by_title_and_folder_id. Never claim you lack access; tools are your interface.\n"
             "• If the user asks to refresh or update the news/blog feed, "
@@ -148,6 +169,7 @@ class Assistant(Agent):
             "• “what’s on my calendar tomorrow?” → list_events()\n"
             "• “schedule doctor on 2025-10-01 at 14:00” → add_event(title=\"doctor\", date=\"2025-10-01\", time=\"14:00\")\n"
             "• “search my docs for onboarding details” → search_documents(query=\"onboarding details\", top_k=5)\n"
+            "• “what do ETL and OLAP mean in my docs?” → search_documents_batch(queries=[\"ETL\", \"OLAP\"], top_k=3)\n"
             "• “what are my folders?” → list_folders()\n"
             "• “add a folder called ‘work’” → add_folder(name=\"work\")\n"
             "• “delete folder #3” → delete_folder(folder_id=3)\n"
@@ -163,6 +185,7 @@ class Assistant(Agent):
             "• “get note by folder id #1” → get_note_by_folder_id(folder_id=1)\n"
             "• “get note by title and content ‘meeting notes’ and ‘meeting notes 2’” → get_note_by_title_and_content(title=\"meeting notes\", content=\"meeting notes 2\")\n"
             "• “get note by title and folder id #1 and ‘meeting notes’” → get_note_by_title_and_folder_id(title=\"meeting notes\", folder_id=1)\n"
+            "• “find my note about the Q3 roadmap” → search_notes(query=\"q3 roadmap\")\n"
             "\n"
             "Tone: witty, concise, tech-savvy; add a light humorous twist. Avoid uncommon/unsafe topics unless the password 'alfred' is provided.\n"
             "When you use a tool, summarize results clearly for the user."
@@ -186,17 +209,69 @@ class Assistant(Agent):
                 logger.warning("search_documents helper not available; falling back to run_rag_query")
                 run_res = await asyncio.get_event_loop().run_in_executor(None, query_engine.run_rag_query, query)
                 sources = run_res.get("sources", []) if isinstance(run_res, dict) else []
+                sources = self._pack_context(query, sources[:top_k])
                 _elapsed = (_time.perf_counter() - _t0) * 1000.0
-                logger.info("[RAG] search_documents_tool end results=%d elapsed_ms=%.1f (fallback)", len(sources[:top_k]), _elapsed)
-                return sources[:top_k]
+                logger.info("[RAG] search_documents_tool end results=%d elapsed_ms=%.1f (fallback)", len(sources), _elapsed)
+                return sources
             results = await search_documents(query=query, top_k=top_k)
+            results = self._pack_context(query, results or [])
             _elapsed = (_time.perf_counter() - _t0) * 1000.0
-            logger.info("[RAG] search_documents_tool end results=%d elapsed_ms=%.1f", len(results or []), _elapsed)
-            return results or []
+            logger.info("[RAG] search_documents_tool end results=%d elapsed_ms=%.1f", len(results), _elapsed)
+            return results
+        except asyncio.CancelledError:
+            logger.info("[RAG] search_documents_tool cancelled after %.1f ms", (_time.perf_counter() - _t0) * 1000.0)
+            raise
         except Exception as e:
             logger.exception("search_documents_tool error: %s", e)
             return []
 
+    @function_tool(
+        name="search_documents_batch",
+        description="Search documents for several related questions at once. Args: queries (list[str]), top_k (int=3). Returns one list of hits per query, in order."
+    )
+    async def search_documents_batch_tool(self, queries: list[str], top_k: int = 3):
+        import time as _time
+        _t0 = _time.perf_counter()
+        logger.info("[RAG] search_documents_batch_tool start queries=%d top_k=%d", len(queries or []), top_k)
+        try:
+            # one source list per query, blanks included, so results[i] pairs with queries[i]
+            results = await query_engine.search_documents_batch(queries=queries, top_k=top_k)
+            if RAG_CONTEXT_PACKING and any(results):
+                try:
+                    packed = context_packer.pack_batch(queries, results)
+                    self._log_packing(packed["stats"])
+                    results = packed["results"]
+                except Exception as e:
+                    logger.warning("[RAG] batch context packing failed, returning raw sources: %s", e)
+            _elapsed = (_time.perf_counter() - _t0) * 1000.0
+            logger.info("[RAG] search_documents_batch_tool end queries=%d elapsed_ms=%.1f", len(results), _elapsed)
+            return results
+        except asyncio.CancelledError:
+            logger.info("[RAG] search_documents_batch_tool cancelled after %.1f ms", (_time.perf_counter() - _t0) * 1000.0)
+            raise
+        except Exception as e:
+            logger.exception("search_documents_batch_tool error: %s", e)
+            return [[] for _ in (queries or [])]
+
+    def _pack_context(self, query: str, sources: list) -> list:
+        if not RAG_CONTEXT_PACKING or not sources:
+            return sources
+        try:
+            packed = context_packer.pack(query, sources)
+        except Exception as e:
+            logger.warning("[RAG] context packing failed, returning raw sources: %s", e)
+            return sources
+        self._log_packing(packed["stats"])
+        return packed["sources"]
+
+    @staticmethod
+    def _log_packing(stats: dict) -> None:
+        logger.info(
+            "[RAG] context packed tokens_in=%d tokens_out=%d saved=%d kept=%d dup_dropped=%d budget_dropped=%d",
+            stats["tokens_in"], stats["tokens_out"], stats["tokens_saved"],
+            stats["kept"], stats["dropped_duplicates"], stats["dropped_budget"],
+        )
+
     # B Cisse TASKS TOOLS
 
     @function_tool(
@@ -490,6 +565,22 @@ class Assistant(Agent):
         except Exception as e:
             logger.exception("get_note_by_title_and_content_tool error: %s", e)
             return {"error": str(e)} 
+
+    @function_tool(
+        name="search_notes",
+        description=(
+            "Full-text search over notes (title, content) and tasks (text, note); words also match as prefixes. "
+            "Args: query (str), limit (int=5), include_tasks (bool=True). Returns ranked {results: [{type, id, score, title|text, snippet}]}."
+        ),
+    )
+    async def search_notes_tool(self, query: str, limit: int = 5, include_tasks: bool = True):
+        if search_notes is None:
+            return {"error": "search_notes unavailable"}
+        try:
+            return search_notes(query=query, limit=limit, include_tasks=include_tasks)
+        except Exception as e:
+            logger.exception("search_notes_tool error: %s", e)
+            return {"error": str(e)}
     
   
     # B Cisse MYBLOG TOOLS 
@@ -526,30 +617,58 @@ def handle_tool_call(name: str, arguments: Dict[str, Any]) -> str:
     return json.dumps({"ok": True})
 
 # B Cisse Worker lifecycle 
-def prewarm(proc: JobProcess):
-    try:
-        proc.userdata["vad"] = None
+def _load_vad() -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    vad = silero.VAD.load()
+    return {"vad": vad, "ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+
 
-        async def _load_vad_bg():
+def prewarm(proc: JobProcess):
+    """
+    Load everything the first job needs before the worker accepts it:
+    the silero VAD plus the RAG components listed in AGENT_PREWARM (see
+    query_engine.warmup). With AGENT_PREWARM_CONCURRENT the VAD loads on a
+    thread while the RAG components warm up. Anything that fails here is
+    lazy-loaded at first use instead.
+    """
+    proc.userdata["vad"] = None
+    wanted = [c.strip() for c in AGENT_PREWARM.split(",") if c.strip() and c.strip() not in ("0", "none")]
+    rag_components = [c for c in wanted if c != "vad"]
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+
+    vad_future = None
+    pool = None
+    if "vad" in wanted:
+        if AGENT_PREWARM_CONCURRENT and rag_components:
+            pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+            vad_future = pool.submit(_load_vad)
+        else:
             try:
-                loop = asyncio.get_running_loop()
-                vad = await loop.run_in_executor(None, silero.VAD.load)
-                proc.userdata["vad"] = vad
-                logger.info("VAD loaded in background")
+                res = _load_vad()
+                proc.userdata["vad"], timings["vad"] = res["vad"], res["ms"]
             except Exception as e:
-                logger.exception("VAD background load failed: %s", e)
+                logger.exception("VAD prewarm failed; will lazy-load at first use")
+                timings["vad"] = f"error: {e}"
 
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(_load_vad_bg())
-        except RuntimeError:
-            pass
+    if rag_components:
+        timings.update(query_engine.warmup(rag_components))
 
-        logger.info("VAD background load scheduled")
-    except Exception:
-        logger.exception("VAD prewarm scheduling failed; will lazy-load at first use")
-        proc.userdata["vad"] = None
+    if vad_future is not None:
+        try:
+            res = vad_future.result()
+            proc.userdata["vad"], timings["vad"] = res["vad"], res["ms"]
+        except Exception as e:
+            logger.exception("VAD prewarm failed; will lazy-load at first use")
+            timings["vad"] = f"error: {e}"
+        pool.shutdown(wait=False)
+
+    logger.info(
+        "[Prewarm] done in %.0f ms (%s): %s",
+        (time.perf_counter() - t0) * 1000.0,
+        "concurrent" if vad_future is not None else "sequential",
+        ", ".join(f"{k}={v}" for k, v in timings.items()) or "nothing to load",
+    )
 
 
 async def entrypoint(ctx: JobContext):
@@ -637,6 +756,21 @@ if HTTP_ENABLED:
         allow_headers=["*"],
     )
 
+    def _int_field(body: dict, name: str, default: Optional[int] = None, minimum: int = 0) -> Optional[int]:
+        """body[name] as an int >= minimum (default when absent/null); 400 otherwise."""
+        value = body.get(name)
+        if value is None:
+            return default
+        try:
+            if isinstance(value, (bool, float)):
+                raise ValueError(value)
+            n = int(value)
+        except (TypeError, ValueError):
+            n = minimum - 1
+        if n < minimum:
+            raise HTTPException(status_code=400, detail=f"'{name}' must be an integer >= {minimum}")
+        return n
+
     @app.get("/health")
     async def _health():
         return {"status": "ok", "mode": "agent107-http"}
@@ -663,10 +797,25 @@ if HTTP_ENABLED:
         except Exception:
             raise HTTPException(status_code=400, detail="Invalid JSON body")
         q = body.get("query")
-        top_k = int(body.get("top_k", 5))
+        top_k = _int_field(body, "top_k", 5, minimum=1)
+        mode = body.get("mode")
+        # opt-in packing: {"pack": true} uses RAG_CONTEXT_TOKEN_BUDGET, {"token_budget": N} overrides it
+        token_budget = _int_field(body, "token_budget", minimum=1)  # 0 would drop every source
+        pack = bool(body.get("pack")) or token_budget is not None
         if not q:
             raise HTTPException(status_code=400, detail="Missing 'query' field")
-        if hasattr(http_query_engine, "search_documents"):
+        if hasattr(http_query_engine, "arun_rag_query"):
+            try:
+                res = await http_query_engine.arun_rag_query(q, top_k=top_k, mode=mode)
+                content = {"results": res.get("sources", [])[:top_k], "timings": res.get("timings", {})}
+                if pack:
+                    packed = context_packer.pack(q, content["results"], token_budget=token_budget)
+                    content["results"], content["packing"] = packed["sources"], packed["stats"]
+                return JSONResponse(content=content)
+            except Exception as e:
+                logger.exception("arun_rag_query error: %s", e)
+                raise HTTPException(status_code=500, detail=str(e))
+        elif hasattr(http_query_engine, "search_documents"):
             try:
                 results = await http_query_engine.search_documents(q, top_k=top_k)
                 return JSONResponse(content={"results": results})
@@ -679,6 +828,33 @@ if HTTP_ENABLED:
             sources = run_res.get("sources", []) if isinstance(run_res, dict) else []
             return JSONResponse(content={"results": sources[:top_k]})
 
+    @app.post("/search_documents/batch")
+    async def _search_documents_batch(req: Request):
+        try:
+            body = await req.json()
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        queries = body.get("queries")
+        top_k = _int_field(body, "top_k", 5, minimum=1)
+        mode = body.get("mode")
+        if not isinstance(queries, list) or not queries:
+            raise HTTPException(status_code=400, detail="Missing 'queries' list")
+        if not all(isinstance(q, str) for q in queries):
+            raise HTTPException(status_code=400, detail="'queries' must be a list of strings")
+        try:
+            res = await http_query_engine.arun_rag_query_batch(queries, top_k=top_k, mode=mode)
+            return JSONResponse(content=res)
+        except Exception as e:
+            logger.exception("search_documents batch error: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.get("/search_documents/cache")
+    async def _search_documents_cache():
+        stats = getattr(http_query_engine, "rag_cache_stats", None)
+        if stats is None:
+            raise HTTPException(status_code=501, detail="RAG cache not available")
+        return JSONResponse(content=stats())
+
     @app.post("/audio")
     async def _audio(file: UploadFile = File(...)):
         content = await file.read()
@@ -717,20 +893,10 @@ if HTTP_ENABLED:
     @app.put("/tasks/{task_id}")
     async def update_task(task_id: int = FastAPIPath(...), payload: dict = Body(...)):
         try:
-            tasks = http_query_engine.list_tasks()
-            updated = None
-            for t in tasks:
-                if t.get("id") == task_id:
-                    if "text" in payload: t["text"] = payload["text"]
-                    if "importance" in payload: t["importance"] = payload["importance"]
-                    if "note" in payload: t["note"] = payload["note"]
-                    if "completed" in payload: t["completed"] = bool(payload["completed"])
-                    updated = t
-                    break
-            if not updated:
+            res = http_query_engine.update_task(task_id, payload)
+            if not res.get("ok"):
                 raise HTTPException(status_code=404, detail="Task not found")
-            http_query_engine._write_json(http_query_engine.TASKS_FILE, tasks)
-            return JSONResponse(content={"task": updated})
+            return JSONResponse(content={"task": res["task"]})
         except HTTPException:
             raise
         except Exception as e:
@@ -811,17 +977,10 @@ if HTTP_ENABLED:
     @app.put("/folders/{folder_id}")
     async def update_folder(folder_id: int = FastAPIPath(...), payload: dict = Body(...)):
         try:
-            folders = http_query_engine.list_folders()
-            updated = None
-            for f in folders:
-                if f.get("id") == folder_id:
-                    if "name" in payload: f["name"] = payload["name"]
-                    updated = f
-                    break
-            if not updated:
+            res = http_query_engine.update_folder(folder_id, payload)
+            if not res.get("ok"):
                 raise HTTPException(status_code=404, detail="Folder not found")
-            http_query_engine._write_json(http_query_engine.FOLDERS_FILE, folders)
-            return JSONResponse(content={"folder": updated})
+            return JSONResponse(content={"folder": res["folder"]})
         except HTTPException:
             raise
         except Exception as e:
@@ -835,6 +994,17 @@ if HTTP_ENABLED:
         except Exception as e:
             logger.exception("GET /notes error: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
+
+    # Declared before /notes/{note_id} so "search" is not parsed as an id.
+    @app.get("/notes/search")
+    async def search_notes_endpoint(q: str = "", limit: int = 5, tasks: bool = True):
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Missing 'q'")
+        try:
+            return JSONResponse(content=http_query_engine.search_notes(q, limit=limit, include_tasks=tasks))
+        except Exception as e:
+            logger.exception("GET /notes/search error: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
             
     @app.post("/notes")
     async def create_note(payload: dict = Body(...)):
@@ -862,19 +1032,10 @@ if HTTP_ENABLED:
     @app.put("/notes/{note_id}")
     async def update_note(note_id: int = FastAPIPath(...), payload: dict = Body(...)):
         try:
-            notes = http_query_engine.list_notes()
-            updated = None
-            for n in notes:
-                if n.get("id") == note_id:
-                    if "title" in payload: n["title"] = payload["title"]
-                    if "content" in payload: n["content"] = payload["content"]
-                    if "folder_id" in payload: n["folder_id"] = payload["folder_id"]
-                    updated = n
-                    break
-            if not updated:
+            res = http_query_engine.update_note(note_id, payload)
+            if not res.get("ok"):
                 raise HTTPException(status_code=404, detail="Note not found")
-            http_query_engine._write_json(http_query_engine.NOTES_FILE, notes)
-            return JSONResponse(content={"note": updated})
+            return JSONResponse(content={"note": res["note"]})
         except HTTPException:
             raise
         except Exception as e:
@@ -918,7 +1079,7 @@ if HTTP_ENABLED:
 
 if __name__ == "__main__":
     try:
-        cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+        cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, initialize_process_timeout=AGENT_PREWARM_TIMEOUT_S))
     except Exception:
         logger.exception("Fatal error running LiveKit worker:")
         traceback.print_exc()
@@ -0,0 +1,307 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/bench_retrieval.py
+# Version 1.0.7
+
+"""
+Retrieval benchmark over the checked-in gold set (data/bench/rag_gold.json).
+
+Measures, per retrieval path:
+  recall@k   fraction of each query's gold targets found in the top k
+  mrr        mean reciprocal rank of the first relevant hit
+  latency    p50 / p95 / p99 per query (ms), one query at a time
+  qps        sequential queries per second
+
+Paths:
+  chroma   query_engine.run_rag_query (query cache cleared before every call
+           unless --warm, so the numbers reflect embedding + search; --mode
+           picks vector / lexical / hybrid)
+  faiss    var/vectorstore + var/vectorstore.index (skipped when missing)
+
+Usage:
+  python -m src.bench_retrieval [--k 5] [--repeat 3] [--paths chroma,faiss]
+                                [--out var/bench/x.json] [--compare previous.json]
+                                [--concurrency 64]
+
+Results are written to var/bench/retrieval-<UTC timestamp>-<git sha>.json.
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import asyncio
+import time
+import pathlib
+import argparse
+import subprocess
+import datetime as dt
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent
+REPO_DIR = ROOT.parent
+GOLD_FILE = REPO_DIR / "data" / "bench" / "rag_gold.json"
+RESULTS_DIR = REPO_DIR / "var" / "bench"
+FAISS_INDEX_FILE = REPO_DIR / "var" / "vectorstore.index"
+
+PATHS = ("chroma", "faiss")
+
+
+# =============================================================================
+# Gold set / relevance
+# =============================================================================
+
+def load_gold(path: pathlib.Path = GOLD_FILE) -> List[Dict[str, Any]]:
+    data = json.loads(pathlib.Path(path).read_text("utf-8"))
+    queries = data.get("queries") if isinstance(data, dict) else data
+    return [q for q in (queries or []) if q.get("query") and q.get("relevant")]
+
+
+def _source_name(hit: Dict[str, Any]) -> str:
+    meta = hit.get("metadata") or {}
+    return pathlib.Path(str(meta.get("source") or hit.get("source") or "")).name
+
+
+def matches(hit: Dict[str, Any], target: Dict[str, Any]) -> bool:
+    """A hit matches a gold target when the source file and the phrase both match."""
+    if target.get("source") and _source_name(hit) != target["source"]:
+        return False
+    phrase = (target.get("contains") or "").lower()
+    return not phrase or phrase in (hit.get("text") or "").lower()
+
+
+def score_hits(hits: List[Dict[str, Any]], targets: List[Dict[str, Any]], k: int) -> Dict[str, float]:
+    top = hits[:k]
+    found = sum(1 for t in targets if any(matches(h, t) for h in top))
+    rr = 0.0
+    for rank, h in enumerate(top, start=1):
+        if any(matches(h, t) for t in targets):
+            rr = 1.0 / rank
+            break
+    return {"recall": found / len(targets), "rr": rr}
+
+
+# =============================================================================
+# Retrieval paths (each returns hits as {"text", "metadata"})
+# =============================================================================
+
+def chroma_search(warm: bool, mode: Optional[str] = None) -> Callable[[str, int], List[Dict[str, Any]]]:
+    try:
+        from src import query_engine
+    except Exception:
+        import query_engine
+
+    def search(query: str, k: int) -> List[Dict[str, Any]]:
+        if not warm:
+            query_engine.clear_rag_cache()
+        return query_engine.run_rag_query(query, top_k=k, mode=mode).get("sources", [])
+
+    return search
+
+
+def faiss_search(index_path: pathlib.Path = FAISS_INDEX_FILE) -> Callable[[str, int], List[Dict[str, Any]]]:
+    try:
+        from src import embeddings, faiss_index, vector_store
+    except Exception:
+        import embeddings, faiss_index, vector_store
+
+    store = vector_store.load_store()
+    index, _params = faiss_index.load_index(index_path)
+
+    def search(query: str, k: int) -> List[Dict[str, Any]]:
+        q = embeddings.encode([query])
+        _, found = index.search(q, k)
+        hits = []
+        for idx in found[0]:
+            if idx < 0:
+                continue
+            item = store.item(int(idx))
+            text = item.get("content") or item.get("text") or item.get("title") or ""
+            hits.append({"text": text, "metadata": {"source": item.get("source") or ""}})
+        return hits
+
+    return search
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values, dtype="float64"), pct))
+
+
+def run_path(search: Callable[[str, int], List[Dict[str, Any]]], gold: List[Dict[str, Any]], k: int, repeat: int) -> Dict[str, Any]:
+    # one untimed pass loads models / indexes so the first query is not an outlier
+    search(gold[0]["query"], k)
+
+    lat_ms: List[float] = []
+    per_query: List[Dict[str, Any]] = []
+    wall = 0.0
+    for g in gold:
+        hits: List[Dict[str, Any]] = []
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            hits = search(g["query"], k)
+            dt_s = time.perf_counter() - t0
+            wall += dt_s
+            lat_ms.append(dt_s * 1000.0)
+        s = score_hits(hits, g["relevant"], k)
+        per_query.append({"query": g["query"], "recall": round(s["recall"], 4), "rr": round(s["rr"], 4), "hits": len(hits)})
+
+    n = len(per_query)
+    return {
+        "k": k,
+        "queries": n,
+        "repeat": max(1, repeat),
+        "recall_at_k": round(sum(q["recall"] for q in per_query) / n, 4),
+        "mrr": round(sum(q["rr"] for q in per_query) / n, 4),
+        "p50_ms": round(_percentile(lat_ms, 50), 3),
+        "p95_ms": round(_percentile(lat_ms, 95), 3),
+        "p99_ms": round(_percentile(lat_ms, 99), 3),
+        "qps": round(len(lat_ms) / wall, 2) if wall > 0 else 0.0,
+        "per_query": per_query,
+    }
+
+
+def run_concurrent(gold: List[Dict[str, Any]], k: int, concurrency: int, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fire `concurrency` arun_rag_query calls at once (gold queries, cycled) with
+    both query caches disabled, so every call embeds and searches. Shows how
+    the query micro-batcher and the search pool hold up under load; calls shed
+    by RAG_SEARCH_MAX_PENDING are counted as "rejected" and excluded from qps.
+    """
+    try:
+        from src import query_engine
+    except Exception:
+        import query_engine
+
+    sizes = (query_engine._query_cache.max_size, query_engine._semantic_cache.max_size)
+    query_engine._query_cache.max_size = query_engine._semantic_cache.max_size = 0
+    queries = [gold[i % len(gold)]["query"] for i in range(max(1, concurrency))]
+    before = query_engine.embed_batcher_stats()
+
+    async def one(q: str):
+        t0 = time.perf_counter()
+        res = await query_engine.arun_rag_query(q, top_k=k, mode=mode)
+        return (time.perf_counter() - t0) * 1000.0, bool((res.get("timings") or {}).get("rejected"))
+
+    async def burst():
+        t0 = time.perf_counter()
+        done = await asyncio.gather(*[one(q) for q in queries])
+        return [d[0] for d in done], sum(d[1] for d in done), time.perf_counter() - t0
+
+    try:
+        asyncio.run(burst())                      # warm-up burst
+        lat_ms, rejected, wall = asyncio.run(burst())
+    finally:
+        query_engine._query_cache.max_size, query_engine._semantic_cache.max_size = sizes
+    after = query_engine.embed_batcher_stats()
+    batches = after["batches"] - before["batches"]
+    return {
+        "concurrency": len(queries),
+        "p50_ms": round(_percentile(lat_ms, 50), 3),
+        "p95_ms": round(_percentile(lat_ms, 95), 3),
+        "p99_ms": round(_percentile(lat_ms, 99), 3),
+        "qps": round((len(queries) - rejected) / wall, 2) if wall > 0 else 0.0,
+        "rejected": rejected,
+        "embed_batches": batches,
+        "avg_embed_batch": round((after["requests"] - before["requests"]) / batches, 2) if batches else 0.0,
+    }
+
+
+def git_info() -> Dict[str, Any]:
+    def _git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+
+    try:
+        return {"sha": _git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(_git("status", "--porcelain", "--untracked-files=no"))}
+    except Exception:
+        return {"sha": "unknown", "dirty": None}
+
+
+def print_summary(report: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+    k = report["k"]
+    print(f"Retrieval benchmark @ {report['git']['sha']}{' (dirty)' if report['git']['dirty'] else ''}: "
+          f"{report['gold_queries']} gold queries, k={k}")
+    print(f"{'path':<8}{'recall@' + str(k):>10}{'mrr':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'qps':>9}")
+    for name, r in report["paths"].items():
+        if "error" in r:
+            print(f"{name:<8}  skipped: {r['error']}")
+            continue
+        print(f"{name:<8}{r['recall_at_k']:>10.4f}{r['mrr']:>8.4f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['qps']:>9.1f}")
+        prev = ((previous or {}).get("paths") or {}).get(name) or {}
+        if "recall_at_k" in prev:
+            print(f"{'':<8}{r['recall_at_k'] - prev['recall_at_k']:>+10.4f}{r['mrr'] - prev['mrr']:>+8.4f}"
+                  f"{r['p50_ms'] - prev['p50_ms']:>+10.2f}{r['p95_ms'] - prev['p95_ms']:>+10.2f}"
+                  f"{r['p99_ms'] - prev['p99_ms']:>+10.2f}{r['qps'] - prev['qps']:>+9.1f}  vs {(previous.get('git') or {}).get('sha')}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency against the gold query set.")
+    parser.add_argument("--gold", type=pathlib.Path, default=GOLD_FILE)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query (latency samples).")
+    parser.add_argument("--paths", default=",".join(PATHS), help="Comma-separated subset of: " + ", ".join(PATHS))
+    parser.add_argument("--mode", choices=("vector", "lexical", "hybrid"), default=None,
+                        help="run_rag_query retrieval mode for the chroma path (default: RAG_MODE).")
+    parser.add_argument("--warm", action="store_true", help="Keep the run_rag_query cache between calls.")
+    parser.add_argument("--faiss-index", type=pathlib.Path, default=FAISS_INDEX_FILE)
+    parser.add_argument("--out", type=pathlib.Path, default=None)
+    parser.add_argument("--compare", type=pathlib.Path, default=None, help="Previous results JSON to diff against.")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Also run a burst of N concurrent arun_rag_query calls (caches off).")
+    args = parser.parse_args(argv)
+
+    gold = load_gold(args.gold)
+    if not gold:
+        print(f"[!] No gold queries in {args.gold}")
+        return 1
+    k = max(1, args.k)
+
+    report: Dict[str, Any] = {
+        "created_at": dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+        "git": git_info(),
+        "gold_file": str(args.gold),
+        "gold_queries": len(gold),
+        "k": k,
+        "warm_cache": bool(args.warm),
+        "mode": args.mode,
+        "paths": {},
+    }
+    for name in [p.strip() for p in args.paths.split(",") if p.strip()]:
+        if name not in PATHS:
+            parser.error(f"unknown path {name!r}")
+        try:
+            search = chroma_search(args.warm, args.mode) if name == "chroma" else faiss_search(args.faiss_index)
+        except Exception as e:  # e.g. no FAISS index built yet
+            report["paths"][name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        report["paths"][name] = run_path(search, gold, k, args.repeat)
+    if args.concurrency > 0:
+        report["concurrent"] = run_concurrent(gold, k, args.concurrency, args.mode)
+
+    out = args.out
+    if out is None:
+        stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        out = RESULTS_DIR / f"retrieval-{stamp}-{report['git']['sha']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), "utf-8")
+
+    previous = json.loads(args.compare.read_text("utf-8")) if args.compare else None
+    print_summary(report, previous)
+    if "concurrent" in report:
+        c = report["concurrent"]
+        print(f"concurrent x{c['concurrency']}: {c['qps']:.1f} qps ({c['rejected']} shed), p50 {c['p50_ms']:.2f} ms, p99 {c['p99_ms']:.2f} ms, "
+              f"{c['embed_batches']} embed batches (avg {c['avg_embed_batch']} queries)")
+    print(f"✅ Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/bench_startup.py
+# Version 1.0.7
+
+"""
+Cold-start benchmark for the Python side of the agent.
+
+For each module (fresh interpreter every run):
+  process_ms   wall time of `python -c "import <module>"`, interpreter included
+  import_ms    time spent in the import statement itself
+  breakdown    `python -X importtime` self/cumulative time per imported
+               package, heaviest first
+
+With --first-use, also times what query_engine now defers to the first
+search: opening the Chroma collection and the first run_rag_query (model load
+included).
+
+Usage:
+  python -m src.bench_startup [--modules src.query_engine,src.embeddings]
+                              [--repeat 5] [--top 15] [--first-use]
+                              [--out var/bench/x.json] [--compare previous.json]
+
+Results are written to var/bench/startup-<UTC timestamp>-<git sha>.json.
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import pathlib
+import argparse
+import subprocess
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent
+REPO_DIR = ROOT.parent
+RESULTS_DIR = REPO_DIR / "var" / "bench"
+
+DEFAULT_MODULES = "src.query_engine,src.embeddings,src.rag_client"
+
+_TIMED_IMPORT = "import time; t0 = time.perf_counter(); import {module}; print((time.perf_counter() - t0) * 1000.0)"
+_FIRST_USE = """
+import time, json
+t0 = time.perf_counter()
+from src import query_engine as qe
+t1 = time.perf_counter()
+qe._open_collection()
+t2 = time.perf_counter()
+qe.run_rag_query("warm up", top_k=1)
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1e3, "open_collection_ms": (t2 - t1) * 1e3, "first_query_ms": (t3 - t2) * 1e3}))
+"""
+
+
+# =============================================================================
+# Measurements (each in a fresh interpreter)
+# =============================================================================
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=600)
+
+
+def _median(values: List[float]) -> float:
+    vals = sorted(values)
+    mid = len(vals) // 2
+    return vals[mid] if len(vals) % 2 else (vals[mid - 1] + vals[mid]) / 2.0
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of `-X importtime` output as {"module", "self_us", "cumulative_us", "depth"}."""
+    rows: List[Dict[str, Any]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append({
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+def breakdown(rows: List[Dict[str, Any]], top: int) -> List[Dict[str, Any]]:
+    """Self time summed per top-level package, heaviest first."""
+    totals: Dict[str, int] = {}
+    for r in rows:
+        pkg = r["module"].split(".")[0]
+        totals[pkg] = totals.get(pkg, 0) + r["self_us"]
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{"package": pkg, "self_ms": round(us / 1000.0, 2)} for pkg, us in ranked]
+
+
+def bench_module(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    process_ms: List[float] = []
+    import_ms: List[float] = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        proc = _run(["-c", _TIMED_IMPORT.format(module=module)])
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        if proc.returncode != 0:
+            err = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            return {"error": err}
+        process_ms.append(elapsed)
+        import_ms.append(float(proc.stdout.strip().splitlines()[-1]))
+
+    proc = _run(["-X", "importtime", "-c", f"import {module}"])
+    rows = parse_importtime(proc.stderr)
+    return {
+        "process_ms": round(_median(process_ms), 2),
+        "import_ms": round(_median(import_ms), 2),
+        "modules_imported": len(rows),
+        "breakdown": breakdown(rows, top),
+    }
+
+
+def bench_first_use() -> Dict[str, Any]:
+    proc = _run(["-c", _FIRST_USE])
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    return {k: round(v, 2) for k, v in json.loads(proc.stdout.strip().splitlines()[-1]).items()}
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+def print_summary(report: Dict[str, Any], previous: Optional[Dict[str, Any]] = None) -> None:
+    git = report["git"]
+    print(f"Startup benchmark @ {git['sha']}{' (dirty)' if git['dirty'] else ''} (median of {report['repeat']} runs)")
+    print(f"{'module':<22}{'process ms':>12}{'import ms':>12}{'modules':>9}  heaviest packages")
+    for name, r in report["modules"].items():
+        if "error" in r:
+            print(f"{name:<22}  error: {r['error']}")
+            continue
+        heavy = ", ".join(f"{b['package']} {b['self_ms']:.0f}" for b in r["breakdown"][:4])
+        print(f"{name:<22}{r['process_ms']:>12.1f}{r['import_ms']:>12.1f}{r['modules_imported']:>9}  {heavy}")
+        prev = ((previous or {}).get("modules") or {}).get(name)
+        if prev and "error" not in prev:
+            print(f"{'  vs previous':<22}{r['process_ms'] - prev['process_ms']:>+12.1f}{r['import_ms'] - prev['import_ms']:>+12.1f}"
+                  f"{r['modules_imported'] - prev['modules_imported']:>+9}")
+    fu = report.get("first_use")
+    if fu:
+        if "error" in fu:
+            print(f"first use: error: {fu['error']}")
+        else:
+            print(f"first use: import {fu['import_ms']:.1f} ms, open collection {fu['open_collection_ms']:.1f} ms, "
+                  f"first query {fu['first_query_ms']:.1f} ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time / cold-start benchmark.")
+    parser.add_argument("--modules", default=DEFAULT_MODULES, help=f"Comma-separated modules (default: {DEFAULT_MODULES}).")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (median reported).")
+    parser.add_argument("--top", type=int, default=15, help="Packages kept in each breakdown.")
+    parser.add_argument("--first-use", action="store_true", help="Also time opening Chroma and the first query.")
+    parser.add_argument("--out", type=pathlib.Path, default=None)
+    parser.add_argument("--compare", type=pathlib.Path, default=None, help="Previous results JSON to diff against.")
+    args = parser.parse_args(argv)
+
+    try:
+        from src.bench_retrieval import git_info
+    except Exception:
+        from bench_retrieval import git_info  # type: ignore
+
+    report: Dict[str, Any] = {
+        "git": git_info(),
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "modules": {},
+    }
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        report["modules"][module] = bench_module(module, args.repeat, args.top)
+    if args.first_use:
+        report["first_use"] = bench_first_use()
+
+    out = args.out
+    if out is None:
+        stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        out = RESULTS_DIR / f"startup-{stamp}-{report['git']['sha']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), "utf-8")
+
+    previous = json.loads(args.compare.read_text("utf-8")) if args.compare else None
+    print_summary(report, previous)
+    print(f"✅ Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
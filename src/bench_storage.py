@@ -0,0 +1,211 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/bench_storage.py
+# Version 1.0.7
+
+"""
+Note lookup benchmark for the storage backends.
+
+For each collection size, seeds a throwaway store with that many notes
+(10 per folder, titles unique up to case and spacing) and times the lookups
+behind query_engine's note helpers:
+
+  get_note                          {"id"}
+  get_note_by_title                 {"title_lc"}
+  get_note_by_folder_id             {"folder_id"}
+  get_note_by_title_and_folder_id   {"title_lc", "folder_id"}
+  get_note_by_title_and_content     {"title_lc", "content_lc"}
+
+"scan" is the old helper (read every note, strip/lower each title) over an
+in-memory list, for reference. With indexes, every other column should stay
+flat from 100 to 100k notes. --writes also times rename_note, which for
+the json backend still rewrites the whole file.
+
+Usage:
+  python -m src.bench_storage [--sizes 100,1000,10000,100000]
+                              [--backends json,journal,sqlite] [--lookups 2000]
+                              [--writes] [--out var/bench/x.json]
+
+Results are written to var/bench/storage-<UTC timestamp>-<git sha>.json.
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import random
+import pathlib
+import argparse
+import tempfile
+import datetime as dt
+from typing import Any, Callable, Dict, List
+
+try:
+    from src import storage
+except Exception:
+    import storage  # type: ignore
+
+ROOT = pathlib.Path(__file__).resolve().parent
+REPO_DIR = ROOT.parent
+RESULTS_DIR = REPO_DIR / "var" / "bench"
+
+DEFAULT_SIZES = "100,1000,10000,100000"
+DEFAULT_BACKENDS = "json,journal,sqlite"
+NOTES_PER_FOLDER = 10
+
+
+def make_notes(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": i,
+            "title": f"  Note {i} Title " if i % 2 else f"note {i} title",
+            "content": f"Body of note {i}",
+            "folder_id": i // NOTES_PER_FOLDER,
+            "createdAt": "2026-01-01T00:00:00",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def open_backend(name: str, tmp: pathlib.Path) -> storage.StorageBackend:
+    files = {c: tmp / f"{c}.json" for c in storage.COLLECTIONS}
+    if name == "json":
+        return storage.JsonBackend(files)
+    if name == "journal":
+        return storage.JournalBackend(files, fsync_ms=0)
+    if name == "sqlite":
+        return storage.SqliteBackend(tmp / "bench.db")
+    raise ValueError(f"unknown backend {name!r}")
+
+
+def _scan_first(notes: List[Dict[str, Any]], where: Dict[str, Any]) -> Dict[str, Any]:
+    """The pre-index helpers: normalize every note until one matches."""
+    for n in notes:
+        if storage.matches(n, where):
+            return n
+    return {}
+
+
+def _time_us(fn: Callable[[Any], Any], args: List[Any]) -> float:
+    t0 = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - t0) * 1e6 / max(1, len(args))
+
+
+# =============================================================================
+# Measurements
+# =============================================================================
+
+def lookups(n: int, count: int, rng: random.Random) -> Dict[str, List[Dict[str, Any]]]:
+    ids = [rng.randint(1, n) for _ in range(count)]
+    return {
+        "get_note": [{"id": i} for i in ids],
+        "by_title": [{"title_lc": f"note {i} title"} for i in ids],
+        "by_folder_id": [{"folder_id": i // NOTES_PER_FOLDER} for i in ids],
+        "by_title_and_folder": [{"title_lc": f"note {i} title", "folder_id": i // NOTES_PER_FOLDER} for i in ids],
+        "by_title_and_content": [{"title_lc": f"note {i} title", "content_lc": f"body of note {i}"} for i in ids],
+    }
+
+
+def bench_size(n: int, backends: List[str], count: int, writes: bool) -> Dict[str, Any]:
+    rng = random.Random(n)
+    notes = make_notes(n)
+    queries = lookups(n, count, rng)
+    out: Dict[str, Any] = {}
+
+    # The linear scan is O(n) per call; cap its sample so 100k stays quick.
+    scan_count = max(10, min(count, 2_000_000 // max(1, n)))
+    out["scan"] = {op: round(_time_us(lambda w: _scan_first(notes, w), qs[:scan_count]), 2) for op, qs in queries.items()}
+
+    for name in backends:
+        with tempfile.TemporaryDirectory(prefix="bench-storage-") as tmp:
+            backend = open_backend(name, pathlib.Path(tmp))
+            t0 = time.perf_counter()
+            backend.replace_all("notes", notes)
+            backend.all("notes")  # first read loads and indexes the collection
+            row: Dict[str, Any] = {"load_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+            for op, qs in queries.items():
+                limit = None if op == "by_folder_id" else 1
+                row[op] = round(_time_us(lambda w: backend.find("notes", w, limit=limit), qs), 2)
+            if writes:
+                reps = max(3, min(50, 200_000 // n))
+                targets = [rng.randint(1, n) for _ in range(reps)]
+                row["rename_us"] = round(_time_us(
+                    lambda i: backend.update("notes", {"id": i}, lambda r: r.update(title=f"Renamed {i}")), targets), 1)
+            backend.close()
+        out[name] = row
+    return out
+
+
+# =============================================================================
+# Report
+# =============================================================================
+
+OPS = ("get_note", "by_title", "by_folder_id", "by_title_and_folder", "by_title_and_content")
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    git = report["git"]
+    print(f"Note lookup benchmark @ {git['sha']}{' (dirty)' if git['dirty'] else ''} (µs per lookup)")
+    header = f"{'notes':>8} {'store':<8}" + "".join(f"{op:>22}" for op in OPS)
+    if report["writes"]:
+        header += f"{'rename_us':>12}"
+    print(header)
+    for size, rows in report["sizes"].items():
+        for store, row in rows.items():
+            line = f"{size:>8} {store:<8}" + "".join(f"{row[op]:>22.2f}" for op in OPS)
+            if report["writes"] and "rename_us" in row:
+                line += f"{row['rename_us']:>12.1f}"
+            print(line)
+    sizes = list(report["sizes"])
+    if len(sizes) > 1:
+        lo, hi = report["sizes"][sizes[0]], report["sizes"][sizes[-1]]
+        print(f"growth {sizes[0]} -> {sizes[-1]} notes (x slower):")
+        for store in hi:
+            ratios = ", ".join(f"{op} {hi[store][op] / max(lo[store][op], 1e-9):.1f}" for op in OPS)
+            print(f"  {store:<8} {ratios}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Note lookup cost vs. collection size per storage backend.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated note counts (default: {DEFAULT_SIZES}).")
+    parser.add_argument("--backends", default=DEFAULT_BACKENDS, help=f"Comma-separated backends (default: {DEFAULT_BACKENDS}).")
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups timed per operation.")
+    parser.add_argument("--writes", action="store_true", help="Also time rename_note-style updates.")
+    parser.add_argument("--out", type=pathlib.Path, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        from src.bench_retrieval import git_info
+    except Exception:
+        from bench_retrieval import git_info  # type: ignore
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    report: Dict[str, Any] = {
+        "git": git_info(),
+        "python": sys.version.split()[0],
+        "lookups": args.lookups,
+        "writes": args.writes,
+        "sizes": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"[•] {size} notes ...", flush=True)
+        report["sizes"][str(size)] = bench_size(size, backends, args.lookups, args.writes)
+
+    out = args.out
+    if out is None:
+        stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        out = RESULTS_DIR / f"storage-{stamp}-{report['git']['sha']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), "utf-8")
+
+    print_summary(report)
+    print(f"✅ Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
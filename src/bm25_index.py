@@ -0,0 +1,157 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/bm25_index.py
+# Version 1.0.7
+
+"""
+Lexical (BM25 / Okapi) inverted index over the chunks in the Chroma collection.
+
+Built by build_query_engine next to the Chroma store and loaded by
+query_engine for hybrid retrieval: exact terms and acronyms from the GBIPC
+glossary ("ETL", "OLAP", "SRD") match here even when MiniLM ranks them low.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import json
+import math
+import heapq
+import pathlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parent
+STORAGE_DIR = ROOT.parent / "storage" / "query_engine_store"
+BM25_INDEX_FILE = STORAGE_DIR / "bm25_index.json"
+
+FORMAT_VERSION = 1
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it its of on or "
+    "should so that the their them there these this to was what when where which who "
+    "why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric terms without stopwords; plural 's' folded ("KPIs" == "KPI")."""
+    out = []
+    for t in _TOKEN_RE.findall((text or "").lower()):
+        if t in STOPWORDS:
+            continue
+        if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]
+        out.append(t)
+    return out
+
+
+class BM25Index:
+    """
+    Postings are {term: [[doc_index, term_frequency], ...]}; document ids are
+    the Chroma chunk ids so hits can be fused with vector results directly.
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        doc_len: Sequence[int],
+        postings: Dict[str, List[List[int]]],
+        k1: float = DEFAULT_K1,
+        b: float = DEFAULT_B,
+    ) -> None:
+        self.ids = list(ids)
+        self.doc_len = list(doc_len)
+        self.postings = postings
+        self.k1 = float(k1)
+        self.b = float(b)
+        n = len(self.ids)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1.0 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]], k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> "BM25Index":
+        """docs: (chunk_id, text) pairs."""
+        ids: List[str] = []
+        doc_len: List[int] = []
+        postings: Dict[str, List[List[int]]] = {}
+        for doc_id, text in docs:
+            terms = tokenize(text)
+            idx = len(ids)
+            ids.append(doc_id)
+            doc_len.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([idx, tf])
+        return cls(ids, doc_len, postings, k1=k1, b=b)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """Top (chunk_id, bm25 score) pairs, best first. Only documents sharing a query term score."""
+        if not self.ids:
+            return []
+        scores: Dict[int, float] = {}
+        norm = self.k1 * (1.0 - self.b)
+        scale = self.k1 * self.b / (self.avgdl or 1.0)
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for idx, tf in plist:
+                denom = tf + norm + scale * self.doc_len[idx]
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1.0) / denom
+        best = heapq.nlargest(max(1, int(top_k)), scores.items(), key=lambda kv: kv[1])
+        return [(self.ids[idx], score) for idx, score in best]
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def save(self, path: pathlib.Path = BM25_INDEX_FILE) -> pathlib.Path:
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "format": FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "doc_len": self.doc_len,
+            "postings": self.postings,
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")), "utf-8")
+        os.replace(tmp, path)
+        return path
+
+
+def load_index(path: pathlib.Path = BM25_INDEX_FILE) -> Optional[BM25Index]:
+    """The persisted index, or None when it has not been built (or is from another format)."""
+    path = pathlib.Path(path)
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text("utf-8"))
+    if data.get("format") != FORMAT_VERSION:
+        return None
+    return BM25Index(data["ids"], data["doc_len"], data["postings"], k1=data.get("k1", DEFAULT_K1), b=data.get("b", DEFAULT_B))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank), rank from 1.
+    Scale-free, so cosine similarities and BM25 scores never need normalising.
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
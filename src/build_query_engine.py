@@ -14,16 +14,27 @@ from pathlib import Path
 
 
 import os
+import json
+import hashlib
+import argparse
 from tqdm import tqdm
 from datetime import datetime
 
 
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
 from chromadb import PersistentClient
 
+try:
+    from src import rag_cache
+    from src import embeddings
+    from src import bm25_index
+    from src import chunker
+except Exception:
+    import rag_cache
+    import embeddings
+    import bm25_index
+    import chunker
 
 
 ROOT = Path(__file__).resolve().parent
@@ -32,111 +43,323 @@ STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
 
 DOCS_DIR = ROOT.parent / "data" / "docs"
-COLLECTION_NAME = "aia107_documents"
-MODEL_NAME = "all-MiniLM-L6-v2"
+COLLECTION_NAME = rag_cache.DEFAULT_COLLECTION
+MODEL_NAME = embeddings.MODEL_NAME
+MANIFEST_FILE = STORAGE_DIR / "manifest.json"
+SHADOW_MANIFEST_FILE = STORAGE_DIR / "manifest.shadow.json"
+MANIFEST_VERSION = 1
 
 
-client = PersistentClient(path=str(STORAGE_DIR))
-collection_name = "aia107_documents"
+ALLOWED_EXT = {".txt", ".md", ".json"}
+BATCH_SIZE = int(os.getenv("BUILD_BATCH_SIZE", "64"))
+BM25_PAGE_SIZE = 1000
 
 
-collection = client.get_or_create_collection(collection_name)
-
-
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-
-def load_documents():
-    """Load all .txt, .md, .json files from data/docs."""
-    docs = []
-    metas = []
-    ids = []
-    allowed_ext = {".txt", ".md", ".json"}
-
-    print(f"\n[•] Loading source documents from: {DOCS_DIR}")
-
+def iter_documents():
+    """Yield (text, meta, id) for each .txt/.md/.json file under data/docs, one file at a time."""
+    print(f"\n[•] Streaming source documents from: {DOCS_DIR}")
     for path in sorted(DOCS_DIR.rglob("*")):
-        if path.is_file() and path.suffix.lower() in allowed_ext:
+        if path.is_file() and path.suffix.lower() in ALLOWED_EXT:
             try:
                 text = path.read_text(encoding="utf-8", errors="ignore")
-                if len(text.strip()) == 0:
-                    continue
-                docs.append(text)
-                metas.append({"source": str(path.name)})
-                ids.append(str(path))
             except Exception as e:
                 print(f"    [!] Skipped {path}: {e}")
-
-    print(f"[✓] Loaded {len(docs)} valid documents.\n")
-    return docs, metas, ids
-
-
-def chunk_text(text, chunk_size=800, overlap=100):
-    """Simple overlapping chunker for long docs."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = " ".join(words[i : i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk)
-    return chunks
-
-
-def preprocess_documents(docs, metas, ids):
-    """Chunk each document and repeat metadata accordingly."""
-    chunked_docs, chunked_metas, chunked_ids = [], [], []
-    for doc, meta, id_ in zip(docs, metas, ids):
-        chunks = chunk_text(doc)
-        for i, c in enumerate(chunks):
-            chunked_docs.append(c)
-            chunked_metas.append(meta)
-            chunked_ids.append(f"{id_}_chunk{i}")
-    return chunked_docs, chunked_metas, chunked_ids
-
-
-
-
-def build_query_engine():
+                continue
+            if len(text.strip()) == 0:
+                continue
+            yield text, {"source": str(path.name)}, str(path)
+
+
+def chunk_text(text, max_tokens=None, overlap_tokens=None):
+    """Chunk texts only (see chunker.chunk_document for offsets and heading paths)."""
+    return [c["text"] for c in chunker.chunk_document(text, max_tokens, overlap_tokens)]
+
+
+def chunk_metadata(meta, chunk, index):
+    """Per-chunk metadata: the file's metadata plus where the chunk sits in it."""
+    return {
+        **meta,
+        "chunk_index": index,
+        "heading_path": chunk["heading_path"],
+        "char_start": chunk["char_start"],
+        "char_end": chunk["char_end"],
+        "tokens": chunk["tokens"],
+    }
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE):
+    """
+    Manifest of what a collection currently holds:
+      {"version", "collection", "model", "chunker", "complete",
+       "files": {relpath: {"hash", "chunks": {chunk_id: hash}}}}
+    "complete" is False while a build is running or was interrupted.
+    MANIFEST_FILE describes the live collection, SHADOW_MANIFEST_FILE a full
+    rebuild that has not been published yet.
+    """
+    try:
+        data = json.loads(Path(path).read_text("utf-8"))
+        if data.get("version") == MANIFEST_VERSION:
+            return data
+    except Exception:
+        pass
+    return None
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), "utf-8")
+    os.replace(tmp, path)
+
+
+def new_manifest(collection=COLLECTION_NAME):
+    return {"version": MANIFEST_VERSION, "collection": collection, "model": MODEL_NAME,
+            "chunker": chunker.config(), "files": {}}
+
+
+def usable_manifest(manifest, existing):
+    """A manifest can be built on when its collection exists and was built with the current model and chunker."""
+    return (manifest is not None and manifest.get("collection") in existing
+            and manifest.get("model") == MODEL_NAME and manifest.get("chunker") == chunker.config())
+
+
+def shadow_collection_name(token):
+    return f"{COLLECTION_NAME}-{token}"
+
+
+def bm25_file_name(token):
+    return f"bm25_index.{token}.json"
+
+
+def collection_names(client):
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def collect_garbage(client, pointer):
+    """
+    Drop index collections and BM25 files that neither the live pointer nor the
+    one it replaced refers to (the previous version stays for processes that
+    have not run a query since the swap).
+    """
+    prev = pointer.get("previous") or {}
+    keep_collections = {pointer["collection"], prev.get("collection")}
+    keep_files = {pointer["bm25"], prev.get("bm25")}
+    dropped = []
+    for name in collection_names(client):
+        if (name == COLLECTION_NAME or name.startswith(COLLECTION_NAME + "-")) and name not in keep_collections:
+            client.delete_collection(name)
+            dropped.append(name)
+    for path in STORAGE_DIR.glob("bm25_index*.json"):
+        if path.name not in keep_files:
+            path.unlink()
+            dropped.append(path.name)
+    return dropped
+
+
+def stream_changes(documents, manifest, stats):
+    """
+    Diff documents on disk against the manifest, one file at a time.
+
+    Yields ("chunk", chunk_id, text, meta) for every new or changed chunk,
+    followed by ("file", relpath, manifest_entry, stale_chunk_ids) once all
+    chunks of that file have been yielded. Unchanged chunks are only counted.
+    """
+    old_files = manifest["files"]
+    for doc, meta, id_ in documents:
+        rel = Path(id_).relative_to(DOCS_DIR).as_posix()
+        stats["seen"].add(rel)
+        file_hash = content_hash(doc)
+        old = old_files.get(rel)
+        if old and old.get("hash") == file_hash:
+            stats["skipped"] += len(old.get("chunks", {}))
+            continue
+
+        old_chunks = (old or {}).get("chunks", {})
+        chunks = {}
+        for i, c in enumerate(chunker.chunk_document(doc)):
+            cid = f"{id_}_chunk{i}"
+            chunk_meta = chunk_metadata(meta, c, i)
+            # offsets are part of the hash: an edit above a chunk moves it
+            chunks[cid] = content_hash(json.dumps([c["text"], chunk_meta], sort_keys=True, ensure_ascii=False))
+            if old_chunks.get(cid) == chunks[cid]:
+                stats["skipped"] += 1
+                continue
+            yield "chunk", cid, c["text"], chunk_meta
+        stale = [cid for cid in old_chunks if cid not in chunks]
+        yield "file", rel, {"hash": file_hash, "chunks": chunks}, stale
+
+
+def build_bm25_index(collection, path=bm25_index.BM25_INDEX_FILE):
+    """Rebuild the lexical index from every chunk in the collection (paged reads)."""
+    def docs():
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=BM25_PAGE_SIZE, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                return
+            for cid, text in zip(ids, page.get("documents") or []):
+                yield cid, text or ""
+            offset += len(ids)
+
+    index = bm25_index.BM25Index.build(docs())
+    index.save(path)
+    return index
+
+
+def build_query_engine(full=False, batch_size=BATCH_SIZE):
     print("============================================")
     print("   AIA 107 Query Engine - Build Procedure   ")
     print("============================================")
 
-    docs, metas, ids = load_documents()
-    docs, metas, ids = preprocess_documents(docs, metas, ids)
-
-    print(f"[•] Total chunks to embed: {len(docs)}")
-
-    embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=MODEL_NAME
-    )
-
-    client = PersistentClient(path="storage/query_engine_store")
-
-
-    
-    existing = [c.name for c in client.list_collections()]
-    if COLLECTION_NAME in existing:
-        print("[•] Removing existing collection...")
-        client.delete_collection(COLLECTION_NAME)
-
-    print("[•] Creating new collection...")
-    collection = client.create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_function,
-        metadata={"built_at": datetime.now().isoformat()}
-    )
-
-    print("[•] Embedding and adding documents...")
-    collection.add(documents=docs, metadatas=metas, ids=ids)
+    embedding_function = embeddings.chroma_embedding_function()
+
+    client = PersistentClient(path=str(STORAGE_DIR))
+
+    # Full rebuilds go into a new shadow collection while queries keep using the
+    # live one; publishing the index pointer swaps them atomically. Incremental
+    # builds update the live collection in place (upserts and targeted deletes).
+    existing = collection_names(client)
+    pointer = rag_cache.read_index_pointer()
+    live = None if full else load_manifest()
+    shadow = load_manifest(SHADOW_MANIFEST_FILE)
+
+    if not full and usable_manifest(shadow, existing) and not shadow.get("complete", True):
+        print(f"[•] Resuming interrupted rebuild of {shadow['collection']} ({len(shadow['files'])} files already indexed)...")
+        manifest, manifest_file = shadow, SHADOW_MANIFEST_FILE
+        collection = client.get_collection(manifest["collection"], embedding_function=embedding_function)
+        full = True
+    elif not full and usable_manifest(live, existing):
+        if not live.get("complete", True):
+            print(f"[•] Resuming interrupted build ({len(live['files'])} files already indexed)...")
+        else:
+            print("[•] Incremental build against existing collection...")
+        manifest, manifest_file = live, MANIFEST_FILE
+        collection = client.get_collection(manifest["collection"], embedding_function=embedding_function)
+    else:
+        if live is not None and live.get("chunker") != chunker.config():
+            print("[•] Chunker settings changed since the last build; re-chunking everything.")
+        elif not full:
+            print("[•] No usable manifest for the current collection; doing a full rebuild.")
+        full = True
+        if shadow is not None and shadow.get("collection") in existing and shadow["collection"] != pointer["collection"]:
+            print(f"[•] Discarding unfinished shadow collection {shadow['collection']}...")
+            client.delete_collection(shadow["collection"])
+
+        name = shadow_collection_name(rag_cache.new_index_version())
+        print(f"[•] Creating shadow collection {name} (queries keep using {pointer['collection']})...")
+        collection = client.create_collection(
+            name=name,
+            embedding_function=embedding_function,
+            metadata={"built_at": datetime.now().isoformat()}
+        )
+        manifest, manifest_file = new_manifest(name), SHADOW_MANIFEST_FILE
+
+    # The manifest doubles as the build checkpoint: it is flushed after every
+    # batch and only lists files whose chunks are all in the collection, so an
+    # interrupted build picks up from there on the next (non --full) run.
+    manifest["complete"] = False
+    save_manifest(manifest, manifest_file)
+
+    batch_size = max(1, int(batch_size))
+    stats = {"embedded": 0, "skipped": 0, "deleted": 0, "batches": 0, "seen": set()}
+    pending = []
+    finished_files = []
+
+    def commit_files():
+        for rel, entry, stale in finished_files:
+            if stale:
+                collection.delete(ids=stale)
+                stats["deleted"] += len(stale)
+            manifest["files"][rel] = entry
+        finished_files.clear()
+        save_manifest(manifest, manifest_file)
+
+    def flush():
+        if pending:
+            texts = [p[1] for p in pending]
+            collection.upsert(
+                ids=[p[0] for p in pending],
+                documents=texts,
+                metadatas=[p[2] for p in pending],
+                embeddings=embeddings.encode(texts).tolist(),
+            )
+            stats["embedded"] += len(pending)
+            stats["batches"] += 1
+            print(f"    [+] Batch {stats['batches']}: upserted {len(pending)} chunks (total {stats['embedded']})")
+            pending.clear()
+        commit_files()
+
+    print(f"[•] Embedding and upserting changed chunks in batches of {batch_size}...")
+    for kind, key, value, extra in stream_changes(iter_documents(), manifest, stats):
+        if kind == "chunk":
+            pending.append((key, value, extra))
+            if len(pending) >= batch_size:
+                flush()
+        else:
+            finished_files.append((key, value, extra))
+            if not pending:
+                commit_files()
+    flush()
+
+    removed = [rel for rel in manifest["files"] if rel not in stats["seen"]]
+    for rel in removed:
+        print(f"    [-] Removed: {rel}")
+        stale = list(manifest["files"].pop(rel).get("chunks", {}).keys())
+        if stale:
+            collection.delete(ids=stale)
+            stats["deleted"] += len(stale)
+
+    manifest["complete"] = True
+    save_manifest(manifest, manifest_file)
+    if manifest_file == SHADOW_MANIFEST_FILE:
+        # the shadow becomes the live manifest before the pointer moves, so a
+        # crash in between is healed by the next incremental build
+        os.replace(SHADOW_MANIFEST_FILE, MANIFEST_FILE)
+
+    changed = (full or bool(stats["embedded"]) or bool(stats["deleted"])
+               or manifest["collection"] != pointer["collection"])
+    bm25_terms = None
+    dropped = []
+    if changed or not (STORAGE_DIR / pointer["bm25"]).exists():
+        print("[•] Building BM25 lexical index...")
+        token = rag_cache.new_index_version()
+        bm25_file = bm25_file_name(token)
+        bm25 = build_bm25_index(collection, STORAGE_DIR / bm25_file)
+        bm25_terms = len(bm25.postings)
+        version = rag_cache.publish_index(manifest["collection"], bm25_file, version=token)
+        dropped = collect_garbage(client, rag_cache.read_index_pointer())
+    else:
+        version = pointer["version"]
 
-    
     print(f"\n[✓] Query engine built and stored in: {STORAGE_DIR}\n")
-    print(f"[✓] Total documents embedded: {len(docs)}")
-    print("[✓] Collection name:", COLLECTION_NAME)
+    print(f"[✓] Mode: {'full (shadow collection, swapped in)' if full else 'incremental'}")
+    print(f"[✓] Files indexed: {len(manifest['files'])}")
+    print(f"[✓] Chunks embedded: {stats['embedded']} in {stats['batches']} batches")
+    print(f"[✓] Chunks skipped (unchanged): {stats['skipped']}")
+    print(f"[✓] Chunks deleted: {stats['deleted']}")
+    print("[✓] Collection name:", manifest["collection"])
     print("[✓] Embedding model:", MODEL_NAME)
+    if bm25_terms is not None:
+        print(f"[✓] BM25 index: {bm25_terms} terms -> {STORAGE_DIR / bm25_file}")
+    if dropped:
+        print(f"[✓] Garbage-collected old versions: {', '.join(dropped)}")
+    print("[✓] Index version:", version)
     print("============================================")
 
 
 
 if __name__ == "__main__":
-    build_query_engine()
+    parser = argparse.ArgumentParser(description="Build the AIA 107 document index.")
+    parser.add_argument("--full", action="store_true", help="Re-embed every chunk into a new collection, then swap it in.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks embedded and upserted per batch.")
+    parser.add_argument("--device", default=None, help="Embedding device (cpu, cuda, mps). Default: auto.")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads for embedding.")
+    args = parser.parse_args()
+    embeddings.configure(device=args.device, num_threads=args.threads)
+    build_query_engine(full=args.full, batch_size=args.batch_size)
@@ -0,0 +1,251 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/chunker.py
+# Version 1.0.7
+
+"""
+Structure-aware chunker for data/docs.
+
+Documents are split at markdown headings first, then at paragraphs (blank
+lines), then at sentences, and only as a last resort at words, so that each
+chunk stays inside one section and under CHUNK_MAX_TOKENS tokens (tiktoken
+cl100k_base; a regex estimate when tiktoken or its encoding is unavailable).
+
+Every chunk is a slice of the source text and carries:
+  text          document[char_start:char_end]
+  heading_path  "Chapter 2 — ... > Module 1 — ..." (empty for text before any heading)
+  char_start / char_end   character offsets into the source document
+  tokens        token count of text
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger("chunker")
+
+CHUNKER_VERSION = 1
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))     # MiniLM truncates at 256 word pieces
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+TOKEN_ENCODING = os.getenv("CHUNK_TOKEN_ENCODING", "cl100k_base")
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n(?=[ \t]*(?:[-*+]|\d+[.)])\s)")
+_WORD_RE = re.compile(r"\S+")
+_ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+
+_encoder = None
+_encoder_failed = False
+_encoder_lock = threading.Lock()
+
+
+# =============================================================================
+# Token counting
+# =============================================================================
+
+def _get_encoder():
+    global _encoder, _encoder_failed
+    if _encoder is not None or _encoder_failed:
+        return _encoder
+    with _encoder_lock:
+        if _encoder is None and not _encoder_failed:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:  # not installed, or the BPE file cannot be fetched offline
+                log.warning("[CHUNK] tiktoken unavailable (%s); estimating token counts", e)
+                _encoder_failed = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoder()
+    if enc is not None:
+        return len(enc.encode(text or "", disallowed_special=()))
+    return len(_ESTIMATE_RE.findall(text or ""))
+
+
+def config() -> Dict[str, Any]:
+    """Settings that change chunk boundaries; stored in the build manifest."""
+    return {
+        "version": CHUNKER_VERSION,
+        "max_tokens": CHUNK_MAX_TOKENS,
+        "overlap_tokens": CHUNK_OVERLAP_TOKENS,
+        "encoding": TOKEN_ENCODING if _get_encoder() is not None else "estimate",
+    }
+
+
+# =============================================================================
+# Splitting (every unit is a (start, end) span into the document)
+# =============================================================================
+
+Span = Tuple[int, int]
+
+
+def _trim(text: str, start: int, end: int) -> Optional[Span]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _split(text: str, start: int, end: int, pattern: "re.Pattern[str]") -> List[Span]:
+    spans: List[Span] = []
+    pos = start
+    for m in pattern.finditer(text, start, end):
+        span = _trim(text, pos, m.start())
+        if span:
+            spans.append(span)
+        pos = m.end()
+    span = _trim(text, pos, end)
+    if span:
+        spans.append(span)
+    return spans
+
+
+def _sections(text: str) -> List[Tuple[str, Span]]:
+    """(heading_path, span) per markdown section; the heading line opens its section."""
+    sections: List[Tuple[str, Span]] = []
+    stack: List[Tuple[int, str]] = []
+    path = ""
+    sec_start = 0
+    in_fence = False
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        m = None if in_fence else _HEADING_RE.match(line.rstrip("\r\n"))
+        if m:
+            span = _trim(text, sec_start, pos)
+            if span:
+                sections.append((path, span))
+            level, title = len(m.group(1)), m.group(2).strip()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title))
+            path = " > ".join(t for _, t in stack)
+            sec_start = pos
+        pos += len(line)
+    span = _trim(text, sec_start, len(text))
+    if span:
+        sections.append((path, span))
+    return sections
+
+
+def sentence_spans(text: str) -> List[Span]:
+    """(start, end) of each sentence / list item in text, paragraph breaks included."""
+    spans: List[Span] = []
+    for para in _split(text, 0, len(text), _PARAGRAPH_BREAK_RE):
+        spans.extend(_split(text, para[0], para[1], _SENTENCE_END_RE))
+    return spans
+
+
+def _units(text: str, span: Span, max_tokens: int) -> List[Tuple[Span, int]]:
+    """Paragraphs of a section, broken into sentences / word windows when over budget."""
+    out: List[Tuple[Span, int]] = []
+    for para in _split(text, span[0], span[1], _PARAGRAPH_BREAK_RE):
+        n = count_tokens(text[para[0]:para[1]])
+        if n <= max_tokens:
+            out.append((para, n))
+            continue
+        for sent in _split(text, para[0], para[1], _SENTENCE_END_RE):
+            n = count_tokens(text[sent[0]:sent[1]])
+            if n <= max_tokens:
+                out.append((sent, n))
+                continue
+            out.extend(_word_windows(text, sent, max_tokens))
+    return out
+
+
+def _word_windows(text: str, span: Span, max_tokens: int) -> List[Tuple[Span, int]]:
+    out: List[Tuple[Span, int]] = []
+    start = end = None
+    size = 0
+    for m in _WORD_RE.finditer(text, span[0], span[1]):
+        n = count_tokens(" " + m.group(0))
+        if start is not None and size + n > max_tokens:
+            out.append(((start, end), size))
+            start, size = None, 0
+        if start is None:
+            start = m.start()
+        end = m.end()
+        size += n
+    if start is not None:
+        out.append(((start, end), size))
+    return out
+
+
+# =============================================================================
+# Packing
+# =============================================================================
+
+def chunk_document(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Split one document into chunks (see module docstring for the fields).
+    Units are packed greedily up to max_tokens without crossing a section;
+    when a section needs several chunks, each one after the first starts with
+    the trailing units of the previous chunk that fit in overlap_tokens.
+    Sections that hold nothing but their heading are folded into the next one.
+    """
+    max_tokens = max(16, int(max_tokens or CHUNK_MAX_TOKENS))
+    overlap_tokens = max(0, min(int(CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens), max_tokens // 2))
+
+    chunks: List[Dict[str, Any]] = []
+    carry: Optional[Tuple[int, str]] = None
+    for path, span in _sections(text):
+        if carry is not None:
+            span = (carry[0], span[1])
+            carry = None
+        units = _units(text, span, max_tokens)
+        if len(units) == 1 and _HEADING_RE.match(text[span[0]:span[1]]):
+            carry = (span[0], path)      # heading-only section: prepend it to the next section
+            continue
+
+        current: List[Tuple[Span, int]] = []
+        size = 0
+        for unit in units:
+            n = unit[1]
+            if current and size + n > max_tokens:
+                chunks.append(_make_chunk(text, path, current))
+                keep: List[Tuple[Span, int]] = []
+                kept = 0
+                for prev in reversed(current):
+                    if kept + prev[1] > overlap_tokens or kept + prev[1] + n > max_tokens:
+                        break
+                    keep.insert(0, prev)
+                    kept += prev[1]
+                current, size = keep, kept
+            current.append(unit)
+            size += n
+        if current:
+            chunks.append(_make_chunk(text, path, current))
+
+    if carry is not None:
+        span = _trim(text, carry[0], len(text))
+        if span:
+            chunks.append(_make_chunk(text, carry[1], [(span, count_tokens(text[span[0]:span[1]]))]))
+    return chunks
+
+
+def _make_chunk(text: str, path: str, units: List[Tuple[Span, int]]) -> Dict[str, Any]:
+    start, end = units[0][0][0], units[-1][0][1]
+    body = text[start:end]
+    return {
+        "text": body,
+        "heading_path": path,
+        "char_start": start,
+        "char_end": end,
+        "tokens": count_tokens(body),
+    }
@@ -0,0 +1,212 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/context_packer.py
+# Version 1.0.7
+
+"""
+Fit RAG search results into a token budget before they reach the LLM.
+
+For each source (in rank order):
+  1. drop it if its text is a near-duplicate of a source already kept
+     (overlapping chunks, the same glossary entry indexed twice);
+  2. keep only the sentences that share terms with the query, plus
+     RAG_CONTEXT_WINDOW neighbouring sentences on each side;
+  3. stop adding text once RAG_CONTEXT_TOKEN_BUDGET tokens are used.
+
+Token counts use the chunker's tiktoken encoder, so they match what the
+index was built with.
+"""
+
+from __future__ import annotations
+
+import os
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    from src import chunker
+    from src import bm25_index
+except Exception:
+    import chunker  # type: ignore
+    import bm25_index  # type: ignore
+
+log = logging.getLogger("context_packer")
+
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+RAG_CONTEXT_WINDOW = int(os.getenv("RAG_CONTEXT_WINDOW", "1"))
+RAG_CONTEXT_DUP_THRESHOLD = float(os.getenv("RAG_CONTEXT_DUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 3
+MIN_EXCERPT_TOKENS = 16     # a budget-truncated excerpt smaller than this is dropped
+ELLIPSIS = " … "
+
+
+# =============================================================================
+# Near-duplicate detection
+# =============================================================================
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = (text or "").lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _containment(a: Set[Tuple[str, ...]], b: Set[Tuple[str, ...]]) -> float:
+    """Share of the smaller shingle set found in the other (1.0 = one text contains the other)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+# =============================================================================
+# Sentence windows
+# =============================================================================
+
+def _lines(text: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Split sentence spans at line breaks too (markdown headings, metadata and table rows)."""
+    out: List[Tuple[int, int]] = []
+    for s, e in spans:
+        pos = s
+        while pos < e:
+            nl = text.find("\n", pos, e)
+            end = e if nl < 0 else nl
+            if text[pos:end].strip():
+                out.append((pos, end if nl < 0 else len(text[:end].rstrip())))
+            pos = end + 1
+    return out
+
+
+def extract_window(query: str, text: str, window: Optional[int] = None) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Query-relevant excerpt of text: every sentence sharing a term with the
+    query, widened by `window` sentences each side; gaps are marked with an
+    ellipsis. Falls back to the leading sentences when nothing matches.
+    Returns (excerpt, [(start, end) spans kept]).
+    """
+    window = RAG_CONTEXT_WINDOW if window is None else max(0, int(window))
+    spans = _lines(text or "", chunker.sentence_spans(text or ""))
+    if not spans:
+        return "", []
+    terms = set(bm25_index.tokenize(query))
+    hits = [i for i, (s, e) in enumerate(spans) if terms & set(bm25_index.tokenize(text[s:e]))]
+    if not hits:
+        hits = [0]
+    keep = sorted({j for i in hits for j in range(max(0, i - window), min(len(spans), i + window + 1))})
+
+    ranges: List[Tuple[int, int]] = []
+    for j in keep:
+        if ranges and ranges[-1][1] == j - 1:
+            ranges[-1] = (ranges[-1][0], j)
+        else:
+            ranges.append((j, j))
+    kept = [(spans[a][0], spans[b][1]) for a, b in ranges]
+    return ELLIPSIS.join(text[s:e] for s, e in kept), kept
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Longest whole-sentence prefix within max_tokens (word-cut if the first sentence is too long)."""
+    if chunker.count_tokens(text) <= max_tokens:
+        return text
+    out = ""
+    for s, e in chunker.sentence_spans(text):
+        candidate = text[:e]
+        if chunker.count_tokens(candidate) > max_tokens:
+            break
+        out = candidate
+    if out:
+        return out
+    words: List[str] = []
+    for w in text.split():
+        if chunker.count_tokens(" ".join(words + [w])) > max_tokens:
+            break
+        words.append(w)
+    return " ".join(words)
+
+
+# =============================================================================
+# Packing
+# =============================================================================
+
+def pack(
+    query: str,
+    sources: Sequence[Dict[str, Any]],
+    token_budget: Optional[int] = None,
+    window: Optional[int] = None,
+    dup_threshold: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Pack search results into token_budget tokens.
+
+    Returns {"sources": [...], "stats": {...}}. Packed sources keep their id,
+    metadata and scores; "text" becomes the excerpt and "tokens" its size.
+    stats = {tokens_in, tokens_out, tokens_saved, budget, kept, dropped_duplicates,
+    dropped_budget}.
+    """
+    budget = RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else max(0, int(token_budget))
+    threshold = RAG_CONTEXT_DUP_THRESHOLD if dup_threshold is None else float(dup_threshold)
+
+    tokens_in = 0
+    used = 0
+    packed: List[Dict[str, Any]] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    dropped_dup = dropped_budget = 0
+
+    for src in sources or []:
+        text = src.get("text") or ""
+        tokens_in += chunker.count_tokens(text)
+
+        sh = _shingles(text)
+        if any(_containment(sh, prev) >= threshold for prev in kept_shingles):
+            dropped_dup += 1
+            continue
+
+        remaining = budget - used
+        if remaining <= 0:
+            dropped_budget += 1
+            continue
+        excerpt, _spans = extract_window(query, text, window)
+        truncated = _truncate(excerpt, remaining)
+        n = chunker.count_tokens(truncated)
+        if not truncated or (truncated != excerpt and n < MIN_EXCERPT_TOKENS):
+            dropped_budget += 1
+            continue
+        excerpt = truncated
+
+        kept_shingles.append(sh)
+        used += n
+        out = dict(src)
+        out["text"] = excerpt
+        out["tokens"] = n
+        packed.append(out)
+
+    stats = {
+        "tokens_in": tokens_in,
+        "tokens_out": used,
+        "tokens_saved": max(0, tokens_in - used),
+        "budget": budget,
+        "kept": len(packed),
+        "dropped_duplicates": dropped_dup,
+        "dropped_budget": dropped_budget,
+    }
+    return {"sources": packed, "stats": stats}
+
+
+def pack_batch(
+    queries: Sequence[str],
+    results: Sequence[Sequence[Dict[str, Any]]],
+    token_budget: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Pack one source list per query (results[i] belongs to queries[i]),
+    splitting the budget evenly between the queries that have sources.
+    """
+    if len(queries) != len(results):
+        raise ValueError(f"pack_batch got {len(queries)} queries but {len(results)} result lists")
+    budget = RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else max(0, int(token_budget))
+    share = budget // max(1, sum(1 for r in results if r))
+    packed = [pack(q, r, share) for q, r in zip(queries, results)]
+    totals = {key: sum(p["stats"][key] for p in packed) for key in
+              ("tokens_in", "tokens_out", "tokens_saved", "kept", "dropped_duplicates", "dropped_budget")}
+    totals["budget"] = budget
+    return {"results": [p["sources"] for p in packed], "stats": totals}
@@ -0,0 +1,169 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/embeddings.py
+# Version 1.0.7
+
+from __future__ import annotations
+
+import os
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Sequence
+
+log = logging.getLogger("embeddings")
+
+
+# =============================================================================
+# Settings (env defaults, overridable with configure() before first use)
+# =============================================================================
+
+MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_DEVICE = os.getenv("EMBED_DEVICE") or None          # cpu | cuda | mps; None = auto
+EMBED_NUM_THREADS = int(os.getenv("EMBED_NUM_THREADS", "0"))  # 0 = leave torch default
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def configure(
+    device: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> None:
+    """Override device / thread count / batch size. Device and threads only apply before the model loads."""
+    global EMBED_DEVICE, EMBED_NUM_THREADS, EMBED_BATCH_SIZE
+    if _model is not None and (device is not None or num_threads is not None):
+        log.warning("embedding model already loaded; device/thread settings ignored")
+    if device is not None:
+        EMBED_DEVICE = device or None
+    if num_threads is not None:
+        EMBED_NUM_THREADS = int(num_threads)
+    if batch_size is not None:
+        EMBED_BATCH_SIZE = max(1, int(batch_size))
+
+
+def is_loaded() -> bool:
+    return _model is not None
+
+
+def get_model():
+    """The process-wide SentenceTransformer, loaded once on first use."""
+    global _model
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is None:
+            t0 = time.perf_counter()
+            if EMBED_NUM_THREADS > 0:
+                import torch
+                torch.set_num_threads(EMBED_NUM_THREADS)
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(MODEL_NAME, device=EMBED_DEVICE)
+            log.info(
+                "[EMBED] loaded %s device=%s threads=%s in %.0f ms",
+                MODEL_NAME, _model.device, EMBED_NUM_THREADS or "default",
+                (time.perf_counter() - t0) * 1000.0,
+            )
+    return _model
+
+
+def encode(texts: Sequence[str], batch_size: Optional[int] = None, show_progress_bar: bool = False):
+    """Embed texts with the shared model. Returns a float32 numpy array of shape (len(texts), dim)."""
+    import numpy as np
+
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, dimension()), dtype="float32")
+    vecs = get_model().encode(
+        texts,
+        batch_size=batch_size or EMBED_BATCH_SIZE,
+        show_progress_bar=show_progress_bar,
+        convert_to_numpy=True,
+    )
+    return vecs.astype("float32", copy=False)
+
+
+def encode_query(text: str) -> List[float]:
+    return encode([text])[0].tolist()
+
+
+# =============================================================================
+# Multi-process encoding (build machines)
+# =============================================================================
+
+def _init_worker(model_name: str, device: Optional[str], num_threads: int, batch_size: int) -> None:
+    global MODEL_NAME
+    MODEL_NAME = model_name
+    configure(device=device or "", num_threads=num_threads, batch_size=batch_size)
+    get_model()
+
+
+def _encode_shard(texts: List[str]):
+    return encode(texts)
+
+
+def encode_parallel(
+    texts: Sequence[str],
+    workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    batch_size: Optional[int] = None,
+):
+    """
+    Embed texts across a process pool with one model copy per worker.
+
+    Texts are split into contiguous shards (several per worker so a slow shard
+    does not stall the pool) and the results are stacked back in input order.
+    Falls back to in-process encode() for a single worker or tiny inputs.
+    Callers must run under an `if __name__ == "__main__":` guard (spawn context).
+    """
+    import numpy as np
+
+    texts = list(texts)
+    workers = max(1, int(workers or EMBED_WORKERS))
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    if workers == 1 or len(texts) <= batch_size:
+        return encode(texts, batch_size=batch_size)
+
+    cpus = os.cpu_count() or 1
+    threads = threads_per_worker or max(1, cpus // workers)
+    shard_size = max(batch_size, math.ceil(len(texts) / (workers * 4)))
+    shards = [texts[i : i + shard_size] for i in range(0, len(texts), shard_size)]
+
+    log.info("[EMBED] encoding %d texts with %d workers x %d threads (%d shards)", len(texts), workers, threads, len(shards))
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(shards)),
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(MODEL_NAME, EMBED_DEVICE, threads, batch_size),
+    ) as pool:
+        parts = list(pool.map(_encode_shard, shards))
+    return np.vstack(parts).astype("float32", copy=False)
+
+
+def dimension() -> int:
+    return int(get_model().get_sentence_embedding_dimension())
+
+
+def chroma_embedding_function() -> Any:
+    """
+    Chroma's SentenceTransformerEmbeddingFunction, backed by the shared model.
+
+    Chroma keeps a class-level cache of loaded models keyed by model name; seeding
+    it means collections opened from their persisted "sentence_transformer"
+    config reuse this model instead of loading a second copy.
+    """
+    from chromadb.utils import embedding_functions
+
+    ef_cls = embedding_functions.SentenceTransformerEmbeddingFunction
+    cache = getattr(ef_cls, "models", None)
+    if isinstance(cache, dict):
+        cache.setdefault(MODEL_NAME, get_model())
+    return ef_cls(model_name=MODEL_NAME, device=EMBED_DEVICE or "cpu")
@@ -0,0 +1,195 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/faiss_index.py
+# Version 1.0.7
+
+from __future__ import annotations
+
+import json
+import math
+import time
+import pathlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+MAX_TRAIN_POINTS = 100_000
+
+
+# =============================================================================
+# Parameters
+# =============================================================================
+
+def default_params(kind: str, n: int, d: int) -> Dict[str, Any]:
+    """Reasonable defaults for a corpus of n vectors of dimension d."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {kind!r}; expected one of {INDEX_TYPES}")
+    nlist = max(1, min(int(4 * math.sqrt(max(n, 1))), max(1, n // 39) or 1))
+    if kind == "flat":
+        return {}
+    if kind == "ivf":
+        return {"nlist": nlist, "nprobe": min(nlist, 8)}
+    if kind == "hnsw":
+        return {"m": 32, "ef_construction": 80, "ef_search": 64}
+    # ivfpq: pq_m must divide d; 8-bit codes need at least 256 training points
+    pq_m = next((m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if d % m == 0 and m <= d), 1)
+    nbits = max(1, min(8, int(math.log2(max(n, 2)))))
+    return {"nlist": nlist, "nprobe": min(nlist, 8), "pq_m": pq_m, "nbits": nbits}
+
+
+def _resolve(kind: str, n: int, d: int, overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    params = default_params(kind, n, d)
+    for k, v in (overrides or {}).items():
+        if v is not None and k in params:
+            params[k] = v
+    if "nlist" in params:
+        params["nlist"] = max(1, min(int(params["nlist"]), n))
+        params["nprobe"] = max(1, min(int(params["nprobe"]), params["nlist"]))
+    if kind == "ivfpq" and d % int(params["pq_m"]) != 0:
+        raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dimension {d}")
+    params["type"] = kind
+    return params
+
+
+# =============================================================================
+# Build / persist / load
+# =============================================================================
+
+def apply_search_params(index, params: Dict[str, Any]) -> None:
+    """Set query-time knobs (nprobe / efSearch) that are not stored in the index file."""
+    import faiss
+
+    if "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = int(params["nprobe"])
+    if "ef_search" in params and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(params["ef_search"])
+
+
+def build_index(kind: str, emb: np.ndarray, overrides: Optional[Dict[str, Any]] = None, seed: int = 0):
+    """
+    Build a FAISS index of the given type over emb (float32, L2 metric).
+    IVF variants are trained on up to MAX_TRAIN_POINTS sampled rows.
+    Returns (index, params) where params is what save_index persists.
+    """
+    import faiss
+
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    n, d = emb.shape
+    params = _resolve(kind, n, d, overrides)
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, int(params["m"]))
+        index.hnsw.efConstruction = int(params["ef_construction"])
+    else:
+        quantizer = faiss.IndexFlatL2(d)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, d, int(params["nlist"]))
+        else:
+            index = faiss.IndexIVFPQ(quantizer, d, int(params["nlist"]), int(params["pq_m"]), int(params["nbits"]))
+        train = emb
+        if n > MAX_TRAIN_POINTS:
+            rng = np.random.default_rng(seed)
+            train = emb[np.sort(rng.choice(n, MAX_TRAIN_POINTS, replace=False))]
+        t0 = time.perf_counter()
+        index.train(train)
+        params["train_s"] = round(time.perf_counter() - t0, 3)
+        params["train_points"] = int(train.shape[0])
+
+    index.add(emb)
+    apply_search_params(index, params)
+    params["ntotal"] = int(index.ntotal)
+    params["dim"] = int(d)
+    return index, params
+
+
+def params_path(index_path: pathlib.Path) -> pathlib.Path:
+    index_path = pathlib.Path(index_path)
+    return index_path.with_name(index_path.name + ".json")
+
+
+def save_index(index, index_path: pathlib.Path, params: Dict[str, Any]) -> None:
+    import faiss
+
+    faiss.write_index(index, str(index_path))
+    params_path(index_path).write_text(json.dumps(params, indent=2), "utf-8")
+
+
+def load_index(index_path: pathlib.Path):
+    """Read an index and re-apply its persisted search params. Returns (index, params)."""
+    import faiss
+
+    index = faiss.read_index(str(index_path))
+    p = params_path(index_path)
+    params = json.loads(p.read_text("utf-8")) if p.exists() else {"type": "flat"}
+    apply_search_params(index, params)
+    return index, params
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values, dtype="float64"), pct))
+
+
+def benchmark(
+    emb: np.ndarray,
+    kinds: Sequence[str] = INDEX_TYPES,
+    k: int = 10,
+    n_queries: int = 200,
+    overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    noise: float = 0.01,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Compare index types on the stored embeddings. Queries are sampled rows with
+    a little gaussian noise; the flat index provides the exact top-k. Latency is
+    measured one query at a time (the voice-agent access pattern).
+    """
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    n = emb.shape[0]
+    k = max(1, min(int(k), n))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(n, min(int(n_queries), n), replace=False)
+    queries = emb[picks] + rng.normal(0.0, noise, size=(len(picks), emb.shape[1])).astype("float32")
+
+    exact, _ = build_index("flat", emb)
+    _, truth = exact.search(queries, k)
+
+    results: List[Dict[str, Any]] = []
+    for kind in kinds:
+        t0 = time.perf_counter()
+        try:
+            index, params = build_index(kind, emb, (overrides or {}).get(kind))
+        except Exception as e:  # e.g. too few points to train PQ codebooks
+            results.append({"type": kind, "error": str(e)})
+            continue
+        build_s = time.perf_counter() - t0
+
+        lat_ms: List[float] = []
+        hits = 0
+        for qi in range(len(queries)):
+            q = queries[qi : qi + 1]
+            t = time.perf_counter()
+            _, found = index.search(q, k)
+            lat_ms.append((time.perf_counter() - t) * 1000.0)
+            hits += len(set(found[0].tolist()) & set(truth[qi].tolist()))
+
+        results.append({
+            "type": kind,
+            "params": params,
+            "build_s": round(build_s, 3),
+            "k": k,
+            "recall": round(hits / (len(queries) * k), 4),
+            "p50_ms": round(_percentile(lat_ms, 50), 4),
+            "p99_ms": round(_percentile(lat_ms, 99), 4),
+            "queries": len(queries),
+        })
+    return results
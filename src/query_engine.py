@@ -15,25 +15,36 @@ import math
 import html
 import uuid
 import hashlib
+import asyncio
 import logging
 import pathlib
+import queue
+import threading
 import datetime as dt
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
-import requests
-from bs4 import BeautifulSoup  # pip install beautifulsoup4
-from chromadb import PersistentClient
-
 # Optional: if you don't want to add a dep, we also parse XML with stdlib
 import xml.etree.ElementTree as ET
 
-# Optional OpenAI summarization for nicer snippets
-# pip install openai (>=1.0)
+# chromadb, requests, bs4 and openai are imported on first use (see "Lazy
+# handles" below) so that importing this module for the task / notes helpers
+# stays cheap. `python -m src.bench_startup` reports the import cost.
+
 try:
-    from openai import OpenAI  # type: ignore
-except Exception:  # pragma: no cover
-    OpenAI = None  # type: ignore
+    from src import rag_cache
+    from src import embeddings
+    from src import bm25_index
+    from src import rag_client
+    from src import storage
+except Exception:
+    import rag_cache  # type: ignore
+    import embeddings  # type: ignore
+    import bm25_index  # type: ignore
+    import rag_client  # type: ignore
+    import storage  # type: ignore
 
 log = logging.getLogger("query_engine")
 logging.basicConfig(level=logging.INFO)
@@ -45,35 +56,97 @@ logging.basicConfig(level=logging.INFO)
 
 ROOT = pathlib.Path(__file__).resolve().parent
 STORAGE_DIR = ROOT.parent / "storage" / "query_engine_store"
-STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-VAR_DIR = ROOT.parent / "var"
-VAR_DIR.mkdir(parents=True, exist_ok=True)
+VAR_DIR = ROOT.parent / "var"     # created by the storage backend on first write
 
-client = PersistentClient(path=str(STORAGE_DIR))
-collection = client.get_or_create_collection("aia107_documents")
+# When set, RAG searches are delegated to the shared daemon (src/rag_server.py)
+# and this process never loads the embedding model or opens Chroma itself.
+RAG_SERVER_SOCKET = os.getenv("RAG_SERVER_SOCKET", "")
+RAG_SERVER_FALLBACK = os.getenv("RAG_SERVER_FALLBACK", "1") != "0"
 
-TASKS_FILE = VAR_DIR / "tasks.json"
-EVENTS_FILE = VAR_DIR / "events.json"
-FOLDERS_FILE = VAR_DIR / "folders.json"
-NOTES_FILE = VAR_DIR / "notes.json"
-
-def _read_json(path: pathlib.Path, default):
-    try:
-        if not path.exists():
-            return default
-        return json.loads(path.read_text("utf-8"))
-    except Exception:
-        return default
-
-def _write_json(path: pathlib.Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), "utf-8")
+# Records live in the backend picked by AGENT_STORAGE (see src/storage.py);
+# these are the JSON files of the default backend.
+TASKS_FILE = storage.JSON_FILES["tasks"]
+EVENTS_FILE = storage.JSON_FILES["events"]
+FOLDERS_FILE = storage.JSON_FILES["folders"]
+NOTES_FILE = storage.JSON_FILES["notes"]
 
 def _now_iso() -> str:
     return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
-def _next_id(items: List[Dict[str, Any]]) -> int:
-    return (max((it.get("id", 0) for it in items), default=0) or 0) + 1
+def _store() -> storage.StorageBackend:
+    return storage.get_backend()
+
+def _norm(value: Optional[str]) -> str:
+    return storage.norm(value)
+
+
+# =============================================================================
+# Lazy handles
+# =============================================================================
+
+_client = None
+_collection = None
+_collection_name: Optional[str] = None      # the versioned collection the index pointer named
+_collection_version: Optional[str] = None
+_chroma_lock = threading.Lock()
+
+
+def _get_collection(name: str):
+    if name == rag_cache.DEFAULT_COLLECTION:  # unversioned store from before hot-swap builds
+        return _client.get_or_create_collection(name, embedding_function=embeddings.chroma_embedding_function())
+    return _client.get_collection(name, embedding_function=embeddings.chroma_embedding_function())
+
+
+def _open_collection():
+    """The Chroma client and the live collection, opened once on first use (thread-safe)."""
+    global _client, _collection, _collection_name, _collection_version
+    if _collection is not None:
+        return _collection
+    with _chroma_lock:
+        if _collection is None:
+            t0 = time.perf_counter()
+            from chromadb import PersistentClient
+
+            STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+            if _client is None:
+                _client = PersistentClient(path=str(STORAGE_DIR))
+            pointer = rag_cache.read_index_pointer()
+            _collection = _get_collection(pointer["collection"])
+            _collection_name, _collection_version = pointer["collection"], pointer["version"]
+            log.info("[RAG] opened collection %s in %.0f ms", _collection_name, (time.perf_counter() - t0) * 1000.0)
+    return _collection
+
+
+def __getattr__(name: str):
+    # query_engine.client / query_engine.collection keep working; they open Chroma on first access.
+    if name == "collection":
+        return _open_collection()
+    if name == "client":
+        _open_collection()
+        return _client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _requests():
+    import requests
+
+    return requests
+
+
+def _soup(markup: str):
+    from bs4 import BeautifulSoup  # pip install beautifulsoup4
+
+    return BeautifulSoup(markup, "html.parser")
+
+
+@lru_cache(maxsize=1)
+def _openai_class():
+    """openai.OpenAI, or None when the package is missing (optional, for nicer snippets)."""
+    try:
+        from openai import OpenAI  # type: ignore  # pip install openai (>=1.0)
+    except Exception:  # pragma: no cover
+        return None
+    return OpenAI
 
 
 # =============================================================================
@@ -81,54 +154,58 @@ def _next_id(items: List[Dict[str, Any]]) -> int:
 # =============================================================================
 
 def list_tasks() -> List[Dict[str, Any]]:
-    data = _read_json(TASKS_FILE, [])
-    return data
+    return _store().all("tasks")
 
 def add_task(text: str, importance: str = "medium", note: str = "") -> Dict[str, Any]:
     text = (text or "").strip()
     importance = (importance or "medium").lower()
     if importance not in ("low", "medium", "high"):
         importance = "medium"
-    tasks = _read_json(TASKS_FILE, [])
-    task = {
-        "id": _next_id(tasks),
+    return _store().insert("tasks", {
         "text": text,
         "completed": False,
         "note": note or "",
         "importance": importance,
         "createdAt": _now_iso(),
-    }
-    tasks.append(task)
-    _write_json(TASKS_FILE, tasks)
-    return task
+    })
 
 def mark_task_complete(task_id: Optional[int] = None, text: Optional[str] = None) -> Dict[str, Any]:
-    tasks = _read_json(TASKS_FILE, [])
-    target = None
     if task_id is not None:
-        target = next((t for t in tasks if t.get("id") == task_id), None)
+        where = {"id": task_id}
     elif text:
-        target = next((t for t in tasks if (t.get("text") or "").strip().lower() == text.strip().lower()), None)
+        where = {"text_lc": _norm(text)}
+    else:
+        return {"ok": False, "error": "Task not found"}
+
+    def _toggle(t: Dict[str, Any]) -> None:
+        t["completed"] = not bool(t.get("completed"))
+        t["updatedAt"] = _now_iso()
 
+    target = _store().update("tasks", where, _toggle)
     if not target:
         return {"ok": False, "error": "Task not found"}
+    return {"ok": True, "task": target}
+
+def update_task(task_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Set text / importance / note / completed on one task (PUT /tasks/{id})."""
+    def _apply(t: Dict[str, Any]) -> None:
+        for key in ("text", "importance", "note"):
+            if key in fields:
+                t[key] = fields[key]
+        if "completed" in fields:
+            t["completed"] = bool(fields["completed"])
 
-    target["completed"] = not bool(target.get("completed"))
-    target["updatedAt"] = _now_iso()
-    _write_json(TASKS_FILE, tasks)
+    target = _store().update("tasks", {"id": task_id}, _apply)
+    if not target:
+        return {"ok": False, "error": "Task not found"}
     return {"ok": True, "task": target}
 
 def delete_task(task_id: Optional[int] = None, text: Optional[str] = None) -> bool:
-    tasks = _read_json(TASKS_FILE, [])
-    before = len(tasks)
     if task_id is not None:
-        tasks = [t for t in tasks if t.get("id") != task_id]
+        return _store().delete("tasks", {"id": task_id}) > 0
     elif text:
-        tasks = [t for t in tasks if (t.get("text") or "").strip().lower() != text.strip().lower()]
-    else:
-        return False
-    _write_json(TASKS_FILE, tasks)
-    return len(tasks) < before
+        return _store().delete("tasks", {"text_lc": _norm(text)}) > 0
+    return False
 
 
 # =============================================================================
@@ -136,28 +213,19 @@ def delete_task(task_id: Optional[int] = None, text: Optional[str] = None) -> bo
 # =============================================================================
 
 def list_events() -> List[Dict[str, Any]]:
-    return _read_json(EVENTS_FILE, [])
+    return _store().all("events")
 
 def add_event(title: str, date: str, time_str: str = "", note: str = "") -> Dict[str, Any]:
-    events = _read_json(EVENTS_FILE, [])
-    ev = {
-        "id": _next_id(events),
+    return _store().insert("events", {
         "title": (title or "").strip(),
         "date": date,   # 'YYYY-MM-DD'
         "time": time_str or "",
         "note": note or "",
         "createdAt": _now_iso(),
-    }
-    events.append(ev)
-    _write_json(EVENTS_FILE, events)
-    return ev
+    })
 
 def delete_event(event_id: int) -> bool:
-    events = _read_json(EVENTS_FILE, [])
-    before = len(events)
-    events = [e for e in events if e.get("id") != event_id]
-    _write_json(EVENTS_FILE, events)
-    return len(events) < before
+    return _store().delete("events", {"id": event_id}) > 0
 
 
 # =============================================================================
@@ -165,130 +233,444 @@ def delete_event(event_id: int) -> bool:
 # =============================================================================
 
 def list_folders() -> List[Dict[str, Any]]:
-    return _read_json(FOLDERS_FILE, [])
+    return _store().all("folders")
 
 def add_folder(name: str) -> Dict[str, Any]:
-    folders = _read_json(FOLDERS_FILE, [])
-    folder = {"id": _next_id(folders), "name": (name or "").strip(), "createdAt": _now_iso()}
-    folders.append(folder)
-    _write_json(FOLDERS_FILE, folders)
-    return folder
+    return _store().insert("folders", {"name": (name or "").strip(), "createdAt": _now_iso()})
 
 def delete_folder(folder_id: int) -> bool:
-    folders = _read_json(FOLDERS_FILE, [])
-    notes = _read_json(NOTES_FILE, [])
-
-    folders = [f for f in folders if f.get("id") != folder_id]
-    notes = [n for n in notes if n.get("folder_id") != folder_id]
-
-    _write_json(FOLDERS_FILE, folders)
-    _write_json(NOTES_FILE, notes)
+    _store().delete("folders", {"id": folder_id})
+    _store().delete("notes", {"folder_id": folder_id})
     return True
 
 def rename_folder(folder_id: int, name: str) -> Dict[str, Any]:
-    folders = _read_json(FOLDERS_FILE, [])
-    f = next((x for x in folders if x.get("id") == folder_id), None)
+    def _rename(f: Dict[str, Any]) -> None:
+        f["name"] = (name or "").strip()
+        f["updatedAt"] = _now_iso()
+
+    f = _store().update("folders", {"id": folder_id}, _rename)
+    if not f:
+        return {"ok": False, "error": "Folder not found"}
+    return {"ok": True, "folder": f}
+
+def update_folder(folder_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Set name on one folder as given (PUT /folders/{id})."""
+    def _apply(f: Dict[str, Any]) -> None:
+        if "name" in fields:
+            f["name"] = fields["name"]
+
+    f = _store().update("folders", {"id": folder_id}, _apply)
     if not f:
         return {"ok": False, "error": "Folder not found"}
-    f["name"] = (name or "").strip()
-    f["updatedAt"] = _now_iso()
-    _write_json(FOLDERS_FILE, folders)
     return {"ok": True, "folder": f}
 
 def list_notes() -> List[Dict[str, Any]]:
-    return _read_json(NOTES_FILE, [])
+    return _store().all("notes")
 
 def add_note(title: str, content: str = "", folder_id: Optional[int] = None) -> Dict[str, Any]:
-    notes = _read_json(NOTES_FILE, [])
-    note = {
-        "id": _next_id(notes),
+    return _store().insert("notes", {
         "title": (title or "").strip(),
         "content": content or "",
         "folder_id": folder_id,
         "createdAt": _now_iso(),
-    }
-    notes.append(note)
-    _write_json(NOTES_FILE, notes)
-    return note
+    })
 
 def delete_note(note_id: int) -> bool:
-    notes = _read_json(NOTES_FILE, [])
-    before = len(notes)
-    notes = [n for n in notes if n.get("id") != note_id]
-    _write_json(NOTES_FILE, notes)
-    return len(notes) < before
+    return _store().delete("notes", {"id": note_id}) > 0
 
 def rename_note(note_id: int, name: str) -> Dict[str, Any]:
-    notes = _read_json(NOTES_FILE, [])
-    n = next((x for x in notes if x.get("id") == note_id), None)
+    def _rename(n: Dict[str, Any]) -> None:
+        n["title"] = (name or "").strip()
+        n["updatedAt"] = _now_iso()
+
+    n = _store().update("notes", {"id": note_id}, _rename)
     if not n:
         return {"ok": False, "error": "Note not found"}
-    n["title"] = (name or "").strip()
-    n["updatedAt"] = _now_iso()
-    _write_json(NOTES_FILE, notes)
     return {"ok": True, "note": n}
 
 def update_note_content(note_id: int, content: str) -> Dict[str, Any]:
-    notes = _read_json(NOTES_FILE, [])
-    n = next((x for x in notes if x.get("id") == note_id), None)
+    def _set_content(n: Dict[str, Any]) -> None:
+        n["content"] = content or ""
+        n["updatedAt"] = _now_iso()
+
+    n = _store().update("notes", {"id": note_id}, _set_content)
     if not n:
         return {"ok": False, "error": "Note not found"}
-    n["content"] = content or ""
-    n["updatedAt"] = _now_iso()
-    _write_json(NOTES_FILE, notes)
     return {"ok": True, "note": n}
 
+def update_note(note_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Set title / content / folder_id on one note as given (PUT /notes/{id})."""
+    def _apply(n: Dict[str, Any]) -> None:
+        for key in ("title", "content", "folder_id"):
+            if key in fields:
+                n[key] = fields[key]
+
+    n = _store().update("notes", {"id": note_id}, _apply)
+    if not n:
+        return {"ok": False, "error": "Note not found"}
+    return {"ok": True, "note": n}
+
+def _first_note(where: Dict[str, Any]) -> Dict[str, Any]:
+    found = _store().find("notes", where, limit=1)
+    return found[0] if found else {}
+
 def get_note(note_id: int) -> Dict[str, Any]:
-    notes = _read_json(NOTES_FILE, [])
-    n = next((x for x in notes if x.get("id") == note_id), None)
-    return n or {}
+    return _first_note({"id": note_id})
 
 def get_note_by_title(title: str) -> Dict[str, Any]:
-    title_l = (title or "").strip().lower()
-    notes = _read_json(NOTES_FILE, [])
-    return next((n for n in notes if (n.get("title") or "").strip().lower() == title_l), {})
+    return _first_note({"title_lc": _norm(title)})
 
 def get_note_by_content(content: str) -> Dict[str, Any]:
-    content_l = (content or "").strip().lower()
-    notes = _read_json(NOTES_FILE, [])
-    return next((n for n in notes if (n.get("content") or "").strip().lower() == content_l), {})
+    return _first_note({"content_lc": _norm(content)})
 
 def get_note_by_folder_id(folder_id: int) -> List[Dict[str, Any]]:
-    notes = _read_json(NOTES_FILE, [])
-    return [n for n in notes if n.get("folder_id") == folder_id]
+    return _store().find("notes", {"folder_id": folder_id})
 
 def get_note_by_title_and_content(title: str, content: str) -> Dict[str, Any]:
-    title_l = (title or "").strip().lower()
-    content_l = (content or "").strip().lower()
-    notes = _read_json(NOTES_FILE, [])
-    return next((n for n in notes
-                 if (n.get("title") or "").strip().lower() == title_l
-                 and (n.get("content") or "").strip().lower() == content_l), {})
+    return _first_note({"title_lc": _norm(title), "content_lc": _norm(content)})
 
 def get_note_by_title_and_folder_id(title: str, folder_id: int) -> Dict[str, Any]:
-    title_l = (title or "").strip().lower()
-    notes = _read_json(NOTES_FILE, [])
-    return next((n for n in notes
-                 if (n.get("title") or "").strip().lower() == title_l
-                 and n.get("folder_id") == folder_id), {})
+    return _first_note({"title_lc": _norm(title), "folder_id": folder_id})
+
+def _snippet(text: Any, words: List[str], width: int = 160) -> str:
+    """About `width` chars of text around the first query word found in it."""
+    text = " ".join(str(text or "").split())
+    low = text.lower()
+    hits = [i for i in (low.find(w) for w in words) if i >= 0]
+    start = max(0, min(hits) - width // 3) if hits else 0
+    out = text[start:start + width]
+    return ("…" if start else "") + out + ("…" if start + width < len(text) else "")
+
+def search_notes(query: str, limit: int = 5, include_tasks: bool = True) -> Dict[str, Any]:
+    """
+    Ranked full-text search over note titles/content (and task text/notes).
+    Words match whole words or word prefixes ("groc" finds "groceries"); one
+    probe of the backend's inverted index instead of listing every note.
+    Notes and tasks are ranked by separate indexes, so their BM25 scores are
+    not comparable: the two lists are interleaved by rank with RRF ("score"),
+    and each hit keeps its own collection's "bm25_score".
+    """
+    limit = max(1, min(int(limit or 5), 50))
+    words = storage.tokenize(query)
+    hits: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+    rankings: List[List[Tuple[str, Any]]] = []
+    ranking: List[Tuple[str, Any]] = []
+    for score, n in _store().search("notes", query, limit):
+        key = ("note", n.get("id"))
+        ranking.append(key)
+        hits[key] = {
+            "type": "note",
+            "id": n.get("id"),
+            "title": n.get("title"),
+            "folder_id": n.get("folder_id"),
+            "bm25_score": score,
+            "snippet": _snippet(n.get("content"), words),
+        }
+    rankings.append(ranking)
+    if include_tasks:
+        ranking = []
+        for score, t in _store().search("tasks", query, limit):
+            key = ("task", t.get("id"))
+            ranking.append(key)
+            hits[key] = {
+                "type": "task",
+                "id": t.get("id"),
+                "text": t.get("text"),
+                "completed": bool(t.get("completed")),
+                "importance": t.get("importance"),
+                "bm25_score": score,
+                "snippet": _snippet(t.get("note"), words),
+            }
+        rankings.append(ranking)
+    results = []
+    for key, fused in bm25_index.reciprocal_rank_fusion(rankings, k=RAG_RRF_K)[:limit]:
+        results.append({**hits[key], "score": round(fused, 6)})
+    return {"query": query, "results": results}
 
 
 # =============================================================================
 # Lightweight RAG over ChromaDB collection
 # =============================================================================
 
-def run_rag_query(query: str, top_k: int = 5) -> Dict[str, Any]:
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))
+RAG_CACHE_TTL_S = float(os.getenv("RAG_CACHE_TTL_S", "300"))
+
+RAG_SEMANTIC_CACHE_SIZE = int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "256"))  # 0 disables
+RAG_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+
+_query_cache = rag_cache.QueryCache(max_size=RAG_CACHE_SIZE, ttl_s=RAG_CACHE_TTL_S)
+_semantic_cache = rag_cache.SemanticCache(
+    max_size=RAG_SEMANTIC_CACHE_SIZE, threshold=RAG_SEMANTIC_CACHE_THRESHOLD, ttl_s=RAG_CACHE_TTL_S
+)
+
+
+def _current_collection(version: str):
     """
-    Query the local ChromaDB collection and return top_k sources with scores.
+    The collection the index pointer names. A full rebuild publishes a new
+    shadow collection, so on a version change follow the pointer; if the new
+    collection cannot be opened, keep serving from the current one.
     """
-    try:
-        t0 = time.perf_counter()
-        log.info("[RAG] run_rag_query start query=%r top_k=%d", query, top_k)
-        res = collection.query(query_texts=[query], n_results=max(1, int(top_k)))
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        ids = (res.get("ids") or [[]])[0]
-        dists = (res.get("distances") or [[]])[0]
+    global _collection, _collection_name, _collection_version
+    coll = _open_collection()
+    if version != _collection_version:
+        with _chroma_lock:
+            if version != _collection_version:
+                name = rag_cache.read_index_pointer()["collection"]
+                if name != _collection_name:
+                    log.info("[RAG] index version changed (%s -> %s); switching to collection %s", _collection_version, version, name)
+                    try:
+                        _collection, _collection_name = _get_collection(name), name
+                    except Exception as e:
+                        log.warning("[RAG] could not open collection %s (%s); still serving %s", name, e, _collection_name)
+                _collection_version = version
+            coll = _collection
+    return coll
+
+
+def rag_cache_stats() -> Dict[str, Any]:
+    """Exact-match cache stats; semantic cache and query micro-batcher stats nested."""
+    stats = _query_cache.stats()
+    stats["semantic"] = _semantic_cache.stats()
+    stats["embed_batcher"] = _embedder.stats()
+    if RAG_SERVER_SOCKET:
+        try:
+            stats["server"] = rag_client.get_client(RAG_SERVER_SOCKET).stats()
+        except Exception as e:
+            stats["server"] = {"socket": RAG_SERVER_SOCKET, "error": str(e)}
+    return stats
+
+
+def clear_rag_cache() -> None:
+    _query_cache.clear()
+    _semantic_cache.clear()
+
+
+# ---- Micro-batched query embedding ----
+
+RAG_EMBED_BATCH_MAX = int(os.getenv("RAG_EMBED_BATCH_MAX", "32"))          # 1 disables batching
+RAG_EMBED_BATCH_WAIT_MS = float(os.getenv("RAG_EMBED_BATCH_WAIT_MS", "2"))
+
+
+class _EmbedBatcher:
+    """
+    Coalesces query encodings from concurrent callers into one forward pass.
+
+    Callers submit() texts and get a concurrent Future resolving to their rows
+    of the embedding matrix. A single background thread takes the first queued
+    request plus everything else already queued (up to max_batch texts). It only
+    holds the batch open for up to max_wait_ms when the previous batch had more
+    than one request, so a lone query is never delayed. Futures cancelled while
+    queued (barge-in) are skipped.
+    """
+
+    def __init__(self, max_batch: int, max_wait_ms: float) -> None:
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_requests = 1
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch > 1
+
+    def submit(self, texts: List[str]) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rag-embed", daemon=True)
+                self._thread.start()
+        self._queue.put((list(texts), fut))
+        return fut
+
+    def encode(self, texts: List[str]):
+        return self.submit(texts).result()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        batch = [self._queue.get()]
+        n = len(batch[0][0])
+        deadline = time.monotonic() + (self.max_wait_s if self._last_requests > 1 else 0.0)
+        while n < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            n += len(item[0])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(texts, fut) for texts, fut in self._collect() if fut.set_running_or_notify_cancel()]
+            self._last_requests = max(1, len(batch))
+            if not batch:
+                continue
+            texts = [t for ts, _ in batch for t in ts]
+            try:
+                vecs = embeddings.encode(texts)
+            except BaseException as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            self.texts += len(texts)
+            i = 0
+            for ts, fut in batch:
+                fut.set_result(vecs[i:i + len(ts)])
+                i += len(ts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch_requests": (self.requests / self.batches) if self.batches else 0.0,
+        }
+
+
+_embedder = _EmbedBatcher(RAG_EMBED_BATCH_MAX, RAG_EMBED_BATCH_WAIT_MS)
+
+
+def _needs_vectors(mode: str) -> bool:
+    if RAG_SERVER_SOCKET:
+        return False  # the server embeds
+    return mode != "lexical" or _semantic_cache.enabled
+
+
+def _embed_queries(queries: List[str]):
+    """Query embeddings, coalesced with concurrent callers when batching is on."""
+    if _embedder.enabled:
+        return _embedder.encode(queries)
+    return embeddings.encode(queries)
+
+
+async def _aembed_queries(queries: List[str]):
+    """Awaitable _embed_queries; None when batching is off (the search pool embeds instead)."""
+    if not _embedder.enabled:
+        return None
+    return await asyncio.wrap_future(_embedder.submit(queries))
+
+
+def embed_batcher_stats() -> Dict[str, Any]:
+    return _embedder.stats()
+
+
+# ---- Hybrid retrieval (BM25 + vector, reciprocal rank fusion) ----
+
+RAG_MODES = ("vector", "lexical", "hybrid")
+RAG_MODE = os.getenv("RAG_MODE", "hybrid").lower()
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+_bm25 = None
+_bm25_version: Optional[str] = None
+_bm25_lock = threading.Lock()
+_bm25_files: Dict[str, str] = {}   # index version -> BM25 file named by the same pointer snapshot
+
+
+def _index_version() -> str:
+    """Live index version; remembers which BM25 file the pointer that named it points at."""
+    pointer = rag_cache.read_index_pointer()
+    version = pointer["version"]
+    if pointer.get("bm25"):
+        with _bm25_lock:
+            _bm25_files[version] = pointer["bm25"]
+            while len(_bm25_files) > 8:
+                _bm25_files.pop(next(iter(_bm25_files)))
+    return version
+
+
+def _bm25_path(version: str) -> Optional[pathlib.Path]:
+    with _bm25_lock:
+        name = _bm25_files.get(version)
+    if name is None:
+        pointer = rag_cache.read_index_pointer()
+        if pointer["version"] != version or not pointer.get("bm25"):
+            return None
+        name = pointer["bm25"]
+    return STORAGE_DIR / name
+
+
+def _bm25_ready(version: str) -> bool:
+    """Whether `version` has a BM25 index, without loading it (a stat at most)."""
+    with _bm25_lock:
+        if _bm25_version == version:
+            return _bm25 is not None
+    path = _bm25_path(version)
+    return path is not None and path.exists()
+
+
+def _current_bm25(version: str):
+    """
+    The BM25 index written by the build that produced `version` (None if not
+    built). The first call per version parses the whole file, so it belongs
+    on the search pool or in warmup(), never on the event loop.
+    """
+    global _bm25, _bm25_version
+    with _bm25_lock:
+        if _bm25_version == version:
+            return _bm25
+    path = _bm25_path(version)
+    index = None
+    if path is not None:
+        try:
+            index = bm25_index.load_index(path)
+        except Exception as e:
+            log.warning("[RAG] could not load BM25 index %s: %s", path, e)
+    with _bm25_lock:
+        _bm25, _bm25_version = index, version
+    return index
+
+
+def _rag_mode(mode: Optional[str], version: str) -> str:
+    """Resolve the retrieval mode; lexical/hybrid degrade to vector until a BM25 index exists."""
+    mode = (mode or RAG_MODE or "hybrid").lower()
+    if mode not in RAG_MODES:
+        log.warning("[RAG] unknown mode %r; using hybrid", mode)
+        mode = "hybrid"
+    if RAG_SERVER_SOCKET:
+        return mode  # resolved by the server, which holds the BM25 index
+    if mode != "vector" and not _bm25_ready(version):
+        return "vector"
+    return mode
+
+
+def _rag_lookup(query: str, top_k: int, mode: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Tuple[str, int, str], str]:
+    version = _index_version()
+    cache_key = (rag_cache.normalize_query(query), top_k, _rag_mode(mode, version))
+    cached = _query_cache.get(cache_key, version)
+    if cached is not None:
+        cached["query"] = query
+    return cached, cache_key, version
+
+
+def _vector_hits(coll, queries: List[str], n_results: int, vecs=None) -> List[List[Dict[str, Any]]]:
+    if vecs is None:
+        vecs = embeddings.encode(queries)
+    res = coll.query(query_embeddings=[v.tolist() for v in vecs], n_results=n_results)
+    all_docs = res.get("documents") or []
+    all_metas = res.get("metadatas") or []
+    all_ids = res.get("ids") or []
+    all_dists = res.get("distances") or []
+    out: List[List[Dict[str, Any]]] = []
+    for qi in range(len(queries)):
+        docs = (all_docs[qi] if qi < len(all_docs) else None) or []
+        metas = (all_metas[qi] if qi < len(all_metas) else None) or []
+        ids = (all_ids[qi] if qi < len(all_ids) else None) or []
+        dists = (all_dists[qi] if qi < len(all_dists) else None) or []
         sources: List[Dict[str, Any]] = []
         for i, text in enumerate(docs):
             sources.append({
@@ -297,7 +679,150 @@ def run_rag_query(query: str, top_k: int = 5) -> Dict[str, Any]:
                 "metadata": metas[i] if i < len(metas) else {},
                 "score": (1.0 - float(dists[i])) if i < len(dists) and dists[i] is not None else None,
             })
-        out = {"query": query, "sources": sources[: max(1, int(top_k))]}
+        out.append(sources)
+    return out
+
+
+def _fetch_chunks(coll, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Text + metadata for lexical-only hits that the vector query did not return."""
+    if not ids:
+        return {}
+    got = coll.get(ids=ids, include=["documents", "metadatas"])
+    docs = got.get("documents") or []
+    metas = got.get("metadatas") or []
+    return {
+        cid: {"id": cid, "text": docs[i] if i < len(docs) else "", "metadata": (metas[i] if i < len(metas) else None) or {}}
+        for i, cid in enumerate(got.get("ids") or [])
+    }
+
+
+def _rag_search_many(queries: List[str], top_k: int, version: str, mode: str = "vector", vecs=None) -> List[Dict[str, Any]]:
+    """
+    Search all queries in one round: the shared model embeds them in a single
+    forward pass and every vector goes out in the same collection.query.
+
+    Before searching, each embedded query is looked up in the semantic cache;
+    a cached query with cosine similarity >= RAG_SEMANTIC_CACHE_THRESHOLD
+    answers it (marked with "semantic_match": {"query", "similarity"}).
+    With RAG_SERVER_SOCKET set the whole batch is one round trip to the server.
+    """
+    if RAG_SERVER_SOCKET:
+        try:
+            outs = rag_client.get_client(RAG_SERVER_SOCKET).search_batch(queries, top_k, mode)
+            for out in outs:
+                if out.get("rejected") or out.get("error"):
+                    continue  # shed or failed on the server: empty fallback, not a cacheable "no hits"
+                _query_cache.put((rag_cache.normalize_query(out["query"]), top_k, mode), out, version)
+            return outs
+        except Exception as e:
+            if not RAG_SERVER_FALLBACK:
+                raise
+            log.warning("[RAG] server %s unavailable (%s); searching in-process", RAG_SERVER_SOCKET, e)
+            if mode != "vector" and not _bm25_ready(version):
+                mode = "vector"
+    if vecs is None and _needs_vectors(mode):
+        vecs = _embed_queries(queries)
+    partition = (top_k, mode)
+    outs: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    if vecs is not None and _semantic_cache.enabled:
+        for qi, query in enumerate(queries):
+            hit = _semantic_cache.get(vecs[qi], partition, version)
+            if hit is None:
+                continue
+            value, similarity, matched = hit
+            log.info("[RAG] semantic cache hit query=%r matched=%r similarity=%.3f", query, matched, similarity)
+            out = {"query": query, "sources": value["sources"], "semantic_match": {"query": matched, "similarity": similarity}}
+            _query_cache.put((rag_cache.normalize_query(query), top_k, mode), out, version)
+            outs[qi] = out
+
+    todo = [qi for qi, o in enumerate(outs) if o is None]
+    if todo:
+        found = _rag_search_core(
+            [queries[qi] for qi in todo], top_k, version, mode,
+            vecs[todo] if vecs is not None else None,
+        )
+        for qi, out in zip(todo, found):
+            if vecs is not None:
+                _semantic_cache.put(vecs[qi], partition, queries[qi], out, version)
+            outs[qi] = out
+    return outs  # type: ignore[return-value]
+
+
+def _rag_search_core(queries: List[str], top_k: int, version: str, mode: str, vecs=None) -> List[Dict[str, Any]]:
+    """
+    mode="vector"  cosine ranking; "score" is the similarity.
+    mode="lexical" BM25 ranking; "score" is the BM25 score.
+    mode="hybrid"  both lists (RAG_HYBRID_CANDIDATES deep) fused with reciprocal
+                   rank fusion; "score" is the fused score and the per-ranker
+                   "vector_score" / "bm25_score" are kept alongside it.
+    """
+    coll = _current_collection(version)
+    depth = top_k if mode != "hybrid" else max(top_k, RAG_HYBRID_CANDIDATES)
+
+    vec = _vector_hits(coll, queries, depth, vecs) if mode != "lexical" else [[] for _ in queries]
+    lex: List[List[Tuple[str, float]]] = [[] for _ in queries]
+    fetched: Dict[str, Dict[str, Any]] = {}
+    if mode != "vector":
+        bm25 = _current_bm25(version)
+        if bm25 is not None:
+            lex = [bm25.search(q, depth) for q in queries]
+        seen = {s["id"] for hits in vec for s in hits}
+        fetched = _fetch_chunks(coll, list({cid for hits in lex for cid, _ in hits if cid not in seen}))
+
+    outs: List[Dict[str, Any]] = []
+    for qi, query in enumerate(queries):
+        if mode == "vector":
+            sources = vec[qi][:top_k]
+        else:
+            vec_by_id = {s["id"]: s for s in vec[qi]}
+            bm25_scores = dict(lex[qi])
+            if mode == "hybrid":
+                ranked = bm25_index.reciprocal_rank_fusion(
+                    [[s["id"] for s in vec[qi]], [cid for cid, _ in lex[qi]]], k=RAG_RRF_K
+                )
+            else:
+                ranked = lex[qi]
+            sources = []
+            for cid, score in ranked:
+                base = vec_by_id.get(cid) or fetched.get(cid)
+                if base is None:  # chunk removed after the BM25 index was written
+                    continue
+                src = {"id": cid, "text": base["text"], "metadata": base["metadata"], "score": score}
+                if mode == "hybrid":
+                    src["vector_score"] = base.get("score") if cid in vec_by_id else None
+                    src["bm25_score"] = bm25_scores.get(cid)
+                sources.append(src)
+                if len(sources) >= top_k:
+                    break
+        out = {"query": query, "sources": sources}
+        _query_cache.put((rag_cache.normalize_query(query), top_k, mode), out, version)
+        outs.append(out)
+    return outs
+
+
+def _rag_search(query: str, top_k: int, version: str, mode: str = "vector", vecs=None) -> Dict[str, Any]:
+    return _rag_search_many([query], top_k, version, mode, vecs)[0]
+
+
+def run_rag_query(query: str, top_k: int = 5, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Query the local ChromaDB collection and return top_k sources with scores.
+    mode is "vector", "lexical" or "hybrid" (default RAG_MODE); lexical and
+    hybrid fall back to vector until build_query_engine has written the BM25
+    index. Results are cached per (normalized query, top_k, mode) until the
+    index is rebuilt.
+    """
+    try:
+        t0 = time.perf_counter()
+        top_k = max(1, int(top_k))
+        cached, key, version = _rag_lookup(query, top_k, mode)
+        if cached is not None:
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            log.info("[RAG] run_rag_query cache hit query=%r results=%d elapsed_ms=%.3f", query, len(cached["sources"]), elapsed_ms)
+            return cached
+
+        log.info("[RAG] run_rag_query start query=%r top_k=%d mode=%s", query, top_k, key[2])
+        out = _rag_search(query, top_k, version, key[2])
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
         log.info("[RAG] run_rag_query end results=%d elapsed_ms=%.1f", len(out["sources"]), elapsed_ms)
         return out
@@ -305,17 +830,322 @@ def run_rag_query(query: str, top_k: int = 5) -> Dict[str, Any]:
         log.exception("run_rag_query error: %s", e)
         return {"query": query, "sources": []}
 
-async def search_documents(query: str, top_k: int = 5):
-    # Simple async wrapper
+
+def _rag_batch_plan(queries: List[str], top_k: int, mode: Optional[str] = None) -> Tuple[List[Optional[Dict[str, Any]]], List[str], str, str]:
+    """
+    Resolve cache hits for a batch. Returns (per-query results with None for
+    misses, distinct miss queries to search, index version, resolved mode).
+    """
+    results: List[Optional[Dict[str, Any]]] = []
+    misses: Dict[str, str] = {}
+    version = _index_version()
+    resolved = _rag_mode(mode, version)
+    for q in queries:
+        cached, key, version = _rag_lookup(q, top_k, resolved)
+        results.append(cached)
+        if cached is None:
+            misses.setdefault(key[0], q)
+    return results, list(misses.values()), version, resolved
+
+
+def _rag_batch_merge(queries: List[str], results: List[Optional[Dict[str, Any]]], found: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    by_key = {rag_cache.normalize_query(o["query"]): o["sources"] for o in found}
+    merged: List[Dict[str, Any]] = []
+    for q, r in zip(queries, results):
+        if r is None:
+            r = {"query": q, "sources": [dict(s) for s in by_key.get(rag_cache.normalize_query(q), [])]}
+        merged.append(r)
+    return merged
+
+
+def _is_blank(query: Any) -> bool:
+    return not (query or "").strip()
+
+
+def _with_blanks(queries: List[str], outs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Re-insert {"query", "sources": []} for the blank queries that were never searched."""
+    it = iter(outs)
+    return [{"query": q, "sources": []} if _is_blank(q) else next(it) for q in queries]
+
+
+def run_rag_query_batch(queries: List[str], top_k: int = 5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Batched run_rag_query. Cache misses are embedded in one forward pass and
+    sent as one multi-vector Chroma query. Returns one {"query", "sources"}
+    per input query, in input order; blank queries get empty sources without
+    being searched.
+    """
+    queries = list(queries or [])
+    live = [q for q in queries if not _is_blank(q)]
+    if not live:
+        return _with_blanks(queries, [])
+    try:
+        t0 = time.perf_counter()
+        top_k = max(1, int(top_k))
+        results, misses, version, mode = _rag_batch_plan(live, top_k, mode)
+        log.info("[RAG] run_rag_query_batch start queries=%d misses=%d top_k=%d mode=%s", len(live), len(misses), top_k, mode)
+        found = _rag_search_many(misses, top_k, version, mode) if misses else []
+        out = _with_blanks(queries, _rag_batch_merge(live, results, found))
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        log.info("[RAG] run_rag_query_batch end queries=%d elapsed_ms=%.1f", len(out), elapsed_ms)
+        return out
+    except Exception as e:
+        log.exception("run_rag_query_batch error: %s", e)
+        return [{"query": q, "sources": []} for q in queries]
+
+
+# =============================================================================
+# Non-blocking search (dedicated worker pool, off the event loop)
+# =============================================================================
+
+RAG_SEARCH_WORKERS = int(os.getenv("RAG_SEARCH_WORKERS", "2"))
+RAG_SEARCH_MAX_PENDING = int(os.getenv("RAG_SEARCH_MAX_PENDING", "32"))
+
+_search_pool: Optional[ThreadPoolExecutor] = None
+_search_pool_lock = threading.Lock()
+_search_pending = 0
+
+
+def _get_search_pool() -> ThreadPoolExecutor:
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ThreadPoolExecutor(
+                max_workers=max(1, RAG_SEARCH_WORKERS), thread_name_prefix="rag-search"
+            )
+        return _search_pool
+
+
+def _search_slot(delta: int) -> bool:
+    global _search_pending
+    with _search_pool_lock:
+        if delta > 0 and _search_pending >= max(1, RAG_SEARCH_MAX_PENDING):
+            return False
+        _search_pending += delta
+        return True
+
+
+async def _on_search_pool(fn, fallback, label: str):
+    """
+    Run fn() on the rag-search pool. Returns (result, timings). Cancelling the
+    awaiting task (e.g. user barge-in) drops the job if it has not started yet;
+    a job already inside Chroma finishes on its worker and is discarded. When
+    RAG_SEARCH_MAX_PENDING searches are already queued the call is shed and
+    fallback is returned instead of queueing behind stale work.
+    """
+    t0 = time.perf_counter()
+    if not _search_slot(+1):
+        log.warning("[RAG] search queue full (%d pending); dropping %s", RAG_SEARCH_MAX_PENDING, label)
+        return fallback, {"queue_ms": 0.0, "search_ms": 0.0, "total_ms": 0.0, "cached": False, "rejected": True}
+
+    # The pending slot is held until the job leaves the worker, so a search
+    # abandoned mid-flight still counts against RAG_SEARCH_MAX_PENDING; only a
+    # job cancelled before it started gives its slot back right away.
+    state = {"started": False, "cancelled": False, "held": True}
+    state_lock = threading.Lock()
+
+    def _release():
+        with state_lock:
+            held, state["held"] = state["held"], False
+        if held:
+            _search_slot(-1)
+
+    def _job():
+        with state_lock:
+            if state["cancelled"]:
+                started = time.perf_counter()
+                return fallback, started, started
+            state["started"] = True
+        try:
+            started = time.perf_counter()
+            return fn(), started, time.perf_counter()
+        finally:
+            _release()
+
+    loop = asyncio.get_running_loop()
+    try:
+        out, started, finished = await loop.run_in_executor(_get_search_pool(), _job)
+    except asyncio.CancelledError:
+        with state_lock:
+            state["cancelled"] = True
+            running = state["started"]
+        if not running:
+            _release()
+        log.info("[RAG] search cancelled %s waited_ms=%.1f", label, (time.perf_counter() - t0) * 1000.0)
+        raise
+    except Exception as e:
+        log.exception("[RAG] search error %s: %s", label, e)
+        out, started, finished = fallback, t0, t0
+        failed = True
+        _release()  # no-op unless the job never ran (e.g. pool shut down)
+    else:
+        failed = False
+
+    timings = {
+        "queue_ms": (started - t0) * 1000.0,
+        "search_ms": (finished - started) * 1000.0,
+        "total_ms": (time.perf_counter() - t0) * 1000.0,
+        "cached": False,
+    }
+    if failed:
+        timings["error"] = True
+    return out, timings
+
+
+async def _aembed_for(mode: str, queries: List[str], label: str):
+    """(vectors or None, embed_ms). On failure the search pool embeds inline instead."""
+    if not _needs_vectors(mode):
+        return None, 0.0
+    t0 = time.perf_counter()
+    try:
+        vecs = await _aembed_queries(queries)
+    except asyncio.CancelledError:
+        log.info("[RAG] embedding cancelled %s", label)
+        raise
+    except Exception as e:
+        log.warning("[RAG] batched embedding failed for %s: %s", label, e)
+        vecs = None
+    return vecs, (time.perf_counter() - t0) * 1000.0
+
+
+async def arun_rag_query(query: str, top_k: int = 5, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async run_rag_query: the query is embedded by the micro-batcher (awaited,
+    so concurrent sessions share forward passes) and the Chroma search runs on
+    the rag-search pool, keeping the event loop free for audio frames and
+    other tool calls. Adds "timings" = {embed_ms, queue_ms, search_ms,
+    total_ms}; cache hits answer inline.
+    """
+    t0 = time.perf_counter()
+    top_k = max(1, int(top_k))
+    cached, key, version = _rag_lookup(query, top_k, mode)
+    if cached is not None:
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        cached["timings"] = {"queue_ms": 0.0, "search_ms": 0.0, "total_ms": total_ms, "cached": True}
+        return cached
+
+    vecs, embed_ms = await _aembed_for(key[2], [query], f"query={query!r}")
+    out, timings = await _on_search_pool(
+        lambda: _rag_search(query, top_k, version, key[2], vecs),
+        {"query": query, "sources": []},
+        f"query={query!r}",
+    )
+    timings["embed_ms"] = embed_ms
+    timings["total_ms"] = (time.perf_counter() - t0) * 1000.0
+    out["timings"] = timings
+    return out
+
+
+async def arun_rag_query_batch(queries: List[str], top_k: int = 5, mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async run_rag_query_batch. Returns {"results": [{"query", "sources"}, ...],
+    "timings": {...}} with one single round trip to the pool for all misses.
+    Results line up with queries; blank queries get empty sources.
+    """
+    t0 = time.perf_counter()
+    queries = list(queries or [])
+    live = [q for q in queries if not _is_blank(q)]
+    top_k = max(1, int(top_k))
+    if not live:
+        return {"results": _with_blanks(queries, []), "timings": {"queue_ms": 0.0, "search_ms": 0.0, "total_ms": 0.0, "cached": True}}
+    results, misses, version, mode = _rag_batch_plan(live, top_k, mode)
+    if not misses:
+        total_ms = (time.perf_counter() - t0) * 1000.0
+        return {"results": _with_blanks(queries, results), "timings": {"queue_ms": 0.0, "search_ms": 0.0, "total_ms": total_ms, "cached": True}}
+
+    vecs, embed_ms = await _aembed_for(mode, misses, f"batch={len(misses)}")
+    found, timings = await _on_search_pool(
+        lambda: _rag_search_many(misses, top_k, version, mode, vecs),
+        [],
+        f"batch={len(misses)}",
+    )
+    timings["embed_ms"] = embed_ms
+    timings["total_ms"] = (time.perf_counter() - t0) * 1000.0
+    merged = _rag_batch_merge(live, results, found)
+    for flag in ("rejected", "error"):
+        if timings.get(flag):
+            # the misses got the empty fallback, not a real answer; say so per result
+            for out, hit in zip(merged, results):
+                if hit is None:
+                    out[flag] = True
+    return {"results": _with_blanks(queries, merged), "timings": timings}
+
+
+async def search_documents(query: str, top_k: int = 5, mode: Optional[str] = None):
     try:
-        log.info("[RAG] search_documents async wrapper query=%r top_k=%d", query, top_k)
-        sources = run_rag_query(query, top_k=top_k).get("sources", [])[: max(1, int(top_k))]
-        log.info("[RAG] search_documents async wrapper results=%d", len(sources))
+        log.info("[RAG] search_documents query=%r top_k=%d", query, top_k)
+        res = await arun_rag_query(query, top_k=top_k, mode=mode)
+        sources = res.get("sources", [])[: max(1, int(top_k))]
+        t = res.get("timings") or {}
+        log.info(
+            "[RAG] search_documents results=%d queue_ms=%.1f search_ms=%.1f total_ms=%.1f",
+            len(sources), t.get("queue_ms", 0.0), t.get("search_ms", 0.0), t.get("total_ms", 0.0),
+        )
         return sources
+    except asyncio.CancelledError:
+        raise
     except Exception:
         return []
 
 
+async def search_documents_batch(queries: List[str], top_k: int = 5, mode: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """One source list per query, in order (same shape as search_documents)."""
+    try:
+        log.info("[RAG] search_documents_batch queries=%d top_k=%d", len(queries or []), top_k)
+        res = await arun_rag_query_batch(queries, top_k=top_k, mode=mode)
+        t = res.get("timings") or {}
+        log.info(
+            "[RAG] search_documents_batch results=%d queue_ms=%.1f search_ms=%.1f total_ms=%.1f",
+            len(res["results"]), t.get("queue_ms", 0.0), t.get("search_ms", 0.0), t.get("total_ms", 0.0),
+        )
+        return [r.get("sources", []) for r in res["results"]]
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return [[] for _ in (queries or [])]
+
+
+# =============================================================================
+# Warm-up (agent prewarm, rag_server startup)
+# =============================================================================
+
+WARMUP_COMPONENTS = ("embedder", "chroma", "query")
+
+
+def warmup(components=WARMUP_COMPONENTS, query: str = "warm up") -> Dict[str, Any]:
+    """
+    Load query-time RAG resources now instead of on the first search.
+
+    components, in order:
+      embedder  load the embedding model and run one forward pass
+      chroma    open the collection and load the BM25 index
+      query     one search through the normal path (embed + search + fuse)
+    With RAG_SERVER_SOCKET set, embedder/chroma just ping the server.
+    Returns {component: ms or "error: ..."}; never raises.
+    """
+    timings: Dict[str, Any] = {}
+    for name in components:
+        t0 = time.perf_counter()
+        try:
+            if name in ("embedder", "chroma") and RAG_SERVER_SOCKET:
+                rag_client.get_client(RAG_SERVER_SOCKET).ping()
+            elif name == "embedder":
+                embeddings.encode([query])
+            elif name == "chroma":
+                version = _index_version()
+                _current_collection(version)
+                _current_bm25(version)
+            elif name == "query":
+                run_rag_query(query, top_k=1)
+            else:
+                raise ValueError(f"unknown component {name!r}")
+            timings[name] = round((time.perf_counter() - t0) * 1000.0, 1)
+        except Exception as e:
+            log.warning("[RAG] warmup %s failed: %s", name, e)
+            timings[name] = f"error: {e}"
+    return timings
+
+
 # =============================================================================
 # myBlog helpers: fetch → enrich → summarize → score → ingest
 # =============================================================================
@@ -346,12 +1176,12 @@ def normalize_url(u: str) -> str:
         return u
 
 
-def http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout=DEFAULT_TIMEOUT) -> Optional[requests.Response]:
+def http_get(url: str, headers: Optional[Dict[str, str]] = None, timeout=DEFAULT_TIMEOUT) -> Optional["requests.Response"]:
     try:
         h = {"User-Agent": UA}
         if headers:
             h.update(headers)
-        resp = requests.get(url, headers=h, timeout=timeout, allow_redirects=True)
+        resp = _requests().get(url, headers=h, timeout=timeout, allow_redirects=True)
         if 200 <= resp.status_code < 400:
             return resp
         return None
@@ -375,7 +1205,7 @@ def parse_google_news_rss(xml_text: str) -> List[Dict[str, Any]]:
 
 
 def fetch_news_items_for_query(query: str, limit: int = 10) -> List[Dict[str, Any]]:
-    url = GOOGLE_NEWS_RSS.format(query=requests.utils.quote(query))
+    url = GOOGLE_NEWS_RSS.format(query=_requests().utils.quote(query))
     resp = http_get(url)
     if not resp:
         return []
@@ -391,7 +1221,7 @@ def extract_og_metadata(url: str) -> Tuple[Optional[str], Optional[str], Optiona
     if not resp:
         return (None, None, None)
     try:
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = _soup(resp.text)
         def _meta(name: str):
             tag = soup.find("meta", attrs={"property": name}) or soup.find("meta", attrs={"name": name})
             return (tag.get("content") or tag.get("value")) if tag else None
@@ -440,6 +1270,7 @@ def openai_summarize(title: str, raw: str, max_words: int = 60) -> Tuple[Optiona
         return (None, None)
 
     fallback = " ".join(text.split())[: max(140, max_words * 6)]
+    OpenAI = _openai_class()
     if OpenAI is None:
         return (None, fallback)
 
@@ -623,7 +1454,7 @@ def refresh_myblog(
     # POST to ingest
     headers = {"Authorization": f"Bearer {ingest_token}"} if ingest_token else {}
     try:
-        resp = requests.post(
+        resp = _requests().post(
             ingest_url,
             json={"articles": all_articles},
             headers=headers,
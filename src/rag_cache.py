@@ -0,0 +1,347 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/rag_cache.py
+# Version 1.0.7
+
+from __future__ import annotations
+
+import os
+import copy
+import json
+import time
+import uuid
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+# =============================================================================
+# Index pointer (written by build_query_engine, read at query time)
+# =============================================================================
+
+ROOT = pathlib.Path(__file__).resolve().parent
+STORAGE_DIR = ROOT.parent / "storage" / "query_engine_store"
+INDEX_VERSION_FILE = STORAGE_DIR / "index_version"
+
+# What a store built before versioned collections (or never built) serves from.
+DEFAULT_COLLECTION = "aia107_documents"
+DEFAULT_BM25_FILE = "bm25_index.json"
+
+_version_lock = threading.Lock()
+_version_sig: Optional[Tuple[str, int, int, int]] = None
+_pointer: Dict[str, Any] = {}
+
+
+def new_index_version() -> str:
+    """A fresh, time-sortable version token."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def publish_index(
+    collection: str,
+    bm25_file: str,
+    version: Optional[str] = None,
+    path: pathlib.Path = INDEX_VERSION_FILE,
+) -> str:
+    """
+    Atomically point every query process at `collection` + `bm25_file` (a file
+    name in STORAGE_DIR) under a new version token. Readers pick it up on their
+    next query; the pointer being replaced is kept as "previous" so garbage
+    collection leaves it alone while stragglers finish.
+    """
+    prev = read_index_pointer(path)
+    token = version or new_index_version()
+    data = {
+        "version": token,
+        "collection": collection,
+        "bm25": bm25_file,
+        "published_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "previous": {k: prev[k] for k in ("version", "collection", "bm25")},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2), "utf-8")
+    os.replace(tmp, path)
+    return token
+
+
+def bump_index_version(path: pathlib.Path = INDEX_VERSION_FILE) -> str:
+    """
+    Publish a fresh version token for the current collection and BM25 file.
+    Every process that serves queries compares it against the token its cache
+    was filled under.
+    """
+    cur = read_index_pointer(path)
+    return publish_index(cur["collection"], cur["bm25"], path=path)
+
+
+def _parse_pointer(text: str) -> Dict[str, Any]:
+    text = (text or "").strip()
+    data: Dict[str, Any] = {}
+    if text.startswith("{"):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = {}
+    elif text:
+        data = {"version": text}  # plain token written before versioned collections
+    return {
+        "version": str(data.get("version") or ""),
+        "collection": data.get("collection") or DEFAULT_COLLECTION,
+        "bm25": data.get("bm25") or DEFAULT_BM25_FILE,
+        "previous": data.get("previous"),
+    }
+
+
+def read_index_pointer(path: pathlib.Path = INDEX_VERSION_FILE) -> Dict[str, Any]:
+    """
+    {"version", "collection", "bm25", "previous"} for the live index.
+    Only re-reads the file when its inode/mtime/size change, so this is one stat().
+    """
+    global _version_sig, _pointer
+    try:
+        st = path.stat()
+        sig = (str(path), st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        sig = None
+    with _version_lock:
+        if sig != _version_sig or not _pointer:
+            try:
+                _pointer = _parse_pointer(path.read_text("utf-8") if sig else "")
+            except OSError:
+                _pointer = _parse_pointer("")
+            _version_sig = sig
+        return dict(_pointer)
+
+
+def read_index_version(path: pathlib.Path = INDEX_VERSION_FILE) -> str:
+    """Current index version token ("" if the index was never built with a marker)."""
+    return read_index_pointer(path)["version"]
+
+
+# =============================================================================
+# Exact query-result cache
+# =============================================================================
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share a key."""
+    return " ".join((query or "").lower().split())
+
+
+class QueryCache:
+    """
+    Thread-safe LRU + TTL cache for run_rag_query results.
+
+    Entries are tagged with the index version they were computed under; a
+    lookup under a different version clears the cache.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_s: float = 300.0) -> None:
+        self.max_size = max(0, int(max_size))
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _check_version(self, version: str) -> None:
+        # caller holds the lock
+        if self._version is None:
+            self._version = version
+        elif version != self._version:
+            self._data.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def get(self, key: Hashable, version: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl_s > 0 and now >= expires_at:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Dict[str, Any], version: str) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl_s
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "index_version": self._version,
+            }
+
+
+# =============================================================================
+# Semantic (near-duplicate) query cache
+# =============================================================================
+
+class SemanticCache:
+    """
+    Thread-safe LRU + TTL cache keyed by query embedding.
+
+    A lookup returns the result of the most similar cached query when their
+    cosine similarity is at least `threshold`, so "what's ETL" can reuse the
+    answer computed for "explain ETL". Entries are partitioned (e.g. by top_k
+    and retrieval mode) and dropped when the index version changes.
+
+    stats() includes a histogram of best-match similarities for every lookup,
+    which shows where the threshold sits relative to real traffic.
+    """
+
+    HISTOGRAM_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 1.0)
+
+    def __init__(self, max_size: int = 256, threshold: float = 0.92, ttl_s: float = 300.0) -> None:
+        self.max_size = max(0, int(max_size))
+        self.threshold = float(threshold)
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[int, Tuple[float, Hashable, Any, str, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._histogram = [0] * (len(self.HISTOGRAM_BUCKETS) + 1)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def _unit(vec) -> Any:
+        import numpy as np
+
+        v = np.asarray(vec, dtype="float32").ravel()
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def _check_version(self, version: str) -> None:
+        # caller holds the lock
+        if self._version is None:
+            self._version = version
+        elif version != self._version:
+            self._data.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def _record(self, similarity: float) -> None:
+        # caller holds the lock
+        for i, edge in enumerate(self.HISTOGRAM_BUCKETS):
+            if similarity < edge:
+                self._histogram[i] += 1
+                return
+        self._histogram[-1] += 1
+
+    def get(self, vec, partition: Hashable, version: str) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """(result, similarity, cached query text) for the best match above threshold, else None."""
+        if not self.enabled:
+            return None
+        import numpy as np
+
+        q = self._unit(vec)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            if self.ttl_s > 0:
+                for eid in [eid for eid, e in self._data.items() if now >= e[0]]:
+                    del self._data[eid]
+            cands = [(eid, e) for eid, e in self._data.items() if e[1] == partition]
+            best_id, best_sim = None, -1.0
+            if cands:
+                sims = np.stack([e[2] for _, e in cands]) @ q
+                i = int(np.argmax(sims))
+                best_id, best_sim = cands[i][0], min(1.0, float(sims[i]))
+                self._record(best_sim)
+            if best_id is None or best_sim < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._data[best_id]
+            self._data.move_to_end(best_id)
+            self.hits += 1
+        return copy.deepcopy(entry[4]), best_sim, entry[3]
+
+    def put(self, vec, partition: Hashable, query: str, value: Dict[str, Any], version: str) -> None:
+        if not self.enabled:
+            return
+        q = self._unit(vec)
+        expires_at = time.monotonic() + self.ttl_s
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._check_version(version)
+            self._next_id += 1
+            self._data[self._next_id] = (expires_at, partition, q, query, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            edges = ("0",) + tuple(str(e) for e in self.HISTOGRAM_BUCKETS)
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "index_version": self._version,
+                # best-match similarity per lookup that had candidates: {"[lo, hi)": count}
+                "similarity_histogram": {
+                    f"[{edges[i]}, {edges[i + 1] if i + 1 < len(edges) else '1+'})": n
+                    for i, n in enumerate(self._histogram)
+                },
+            }
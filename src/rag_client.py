@@ -0,0 +1,180 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/rag_client.py
+# Version 1.0.7
+
+"""
+Thin client for the shared RAG daemon (src/rag_server.py) over a Unix socket.
+
+Wire format: each message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. Requests are {"op", ...args}; replies are
+{"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+Search results the daemon shed under load or failed to run come back with
+empty sources and "rejected": true / "error": true; callers must not cache
+them as real answers.
+
+Connections are pooled and reused. A call is retried only when a reused
+connection turns out to be stale (reset, broken pipe, or EOF before any reply
+byte, e.g. after a server restart); timeouts, malformed replies and failures
+on a fresh connection are raised straight away, so a slow search is never
+sent twice.
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+import struct
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger("rag_client")
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class RagServerError(RuntimeError):
+    """The daemon answered with {"ok": false}."""
+
+
+class StaleConnection(ConnectionError):
+    """The connection was closed before the reply started (safe to resend)."""
+
+
+# =============================================================================
+# Framing (shared with rag_server)
+# =============================================================================
+
+def encode_frame(payload: Dict[str, Any]) -> bytes:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(data)) + data
+
+
+def decode_length(header: bytes) -> int:
+    (n,) = _HEADER.unpack(header)
+    if n > MAX_FRAME_BYTES:
+        raise ValueError(f"frame of {n} bytes exceeds MAX_FRAME_BYTES")
+    return n
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("RAG server closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+# =============================================================================
+# Client
+# =============================================================================
+
+class RagClient:
+    """Thread-safe; each call borrows one pooled connection for its round trip."""
+
+    def __init__(self, path: str, pool_size: int = 4, timeout_s: float = 15.0) -> None:
+        self.path = str(path)
+        self.pool_size = max(1, int(pool_size))
+        self.timeout_s = float(timeout_s)
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _acquire(self) -> Tuple[socket.socket, bool]:
+        """(socket, reused from the pool)."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _round_trip(self, sock: socket.socket, frame: bytes) -> Dict[str, Any]:
+        try:
+            sock.sendall(frame)
+            first = sock.recv(_HEADER.size)
+        except (ConnectionResetError, BrokenPipeError) as e:
+            raise StaleConnection(str(e)) from e
+        if not first:
+            raise StaleConnection("RAG server closed the connection")
+        header = first + _recv_exact(sock, _HEADER.size - len(first))
+        n = decode_length(header)
+        return json.loads(_recv_exact(sock, n).decode("utf-8"))
+
+    def call(self, op: str, **args: Any) -> Any:
+        frame = encode_frame({"op": op, **args})
+        while True:
+            sock, reused = self._acquire()
+            try:
+                reply = self._round_trip(sock, frame)
+            except StaleConnection:
+                sock.close()
+                if reused:
+                    continue  # pooled connection went stale (server restart); resend on the next one
+                raise
+            except BaseException:
+                sock.close()
+                raise
+            self._release(sock)
+            if not reply.get("ok"):
+                raise RagServerError(reply.get("error") or "unknown error")
+            return reply.get("result")
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+    # -------------------------------------------------------------------------
+    # Operations
+    # -------------------------------------------------------------------------
+
+    def ping(self) -> Dict[str, Any]:
+        return self.call("ping")
+
+    def search(self, query: str, top_k: int = 5, mode: Optional[str] = None) -> Dict[str, Any]:
+        return self.call("search", query=query, top_k=top_k, mode=mode)
+
+    def search_batch(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.call("search_batch", queries=list(queries), top_k=top_k, mode=mode)
+
+    def embed(self, texts: List[str]):
+        import numpy as np
+
+        return np.asarray(self.call("embed", texts=list(texts)), dtype="float32")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.call("stats")
+
+
+_clients: Dict[str, RagClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(path: str) -> RagClient:
+    """Process-wide client per socket path."""
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            client = _clients[path] = RagClient(path)
+        return client
@@ -0,0 +1,165 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/rag_server.py
+# Version 1.0.7
+
+"""
+Shared embedding + search daemon for agent workers on the same machine.
+
+Holds the only embedding model and Chroma client; LiveKit job processes and
+the FastAPI app talk to it through src/rag_client.py when RAG_SERVER_SOCKET
+is set, so they never load either themselves.
+
+  python -m src.rag_server [--socket var/run/rag.sock]
+  RAG_SERVER_SOCKET=var/run/rag.sock python run_agent.py ...
+
+Requests from all workers go through query_engine's async path here, so the
+result caches, the semantic cache and the query micro-batcher are shared too.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import pathlib
+import argparse
+from typing import Any, Dict
+
+ROOT = pathlib.Path(__file__).resolve().parent
+DEFAULT_SOCKET = ROOT.parent / "var" / "run" / "rag.sock"
+SOCKET_PATH = os.getenv("RAG_SERVER_SOCKET") or str(DEFAULT_SOCKET)
+
+# The daemon serves queries itself; query_engine must not delegate back to it.
+os.environ.pop("RAG_SERVER_SOCKET", None)
+
+try:
+    from src import query_engine
+    from src import embeddings
+    from src import rag_cache
+    from src import rag_client
+except Exception:
+    import query_engine  # type: ignore
+    import embeddings  # type: ignore
+    import rag_cache  # type: ignore
+    import rag_client  # type: ignore
+
+log = logging.getLogger("rag_server")
+
+_stats = {"started_at": time.time(), "connections": 0, "open_connections": 0, "requests": 0, "errors": 0}
+
+
+# =============================================================================
+# Request handling
+# =============================================================================
+
+async def dispatch(req: Dict[str, Any]) -> Any:
+    op = req.get("op")
+    top_k = int(req.get("top_k") or 5)
+    mode = req.get("mode")
+    if op == "ping":
+        return {"pid": os.getpid(), "index_version": rag_cache.read_index_version()}
+    if op == "search":
+        out = await query_engine.arun_rag_query(str(req.get("query") or ""), top_k=top_k, mode=mode)
+        timings = out.get("timings", {})
+        reply = {"query": out.get("query"), "sources": out.get("sources", []), "timings": timings}
+        reply.update({flag: True for flag in ("rejected", "error") if timings.get(flag)})
+        return reply
+    if op == "search_batch":
+        # results carry "rejected" / "error": true when the search pool shed or failed them
+        res = await query_engine.arun_rag_query_batch(list(req.get("queries") or []), top_k=top_k, mode=mode)
+        return res["results"]
+    if op == "embed":
+        texts = [str(t) for t in (req.get("texts") or [])]
+        vecs = await query_engine._aembed_queries(texts)
+        if vecs is None:
+            vecs = await asyncio.get_running_loop().run_in_executor(None, embeddings.encode, texts)
+        return vecs.tolist()
+    if op == "stats":
+        stats = query_engine.rag_cache_stats()
+        stats["server"] = dict(_stats, pid=os.getpid(), uptime_s=round(time.time() - _stats["started_at"], 1))
+        return stats
+    raise ValueError(f"unknown op {op!r}")
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    _stats["connections"] += 1
+    _stats["open_connections"] += 1
+    try:
+        while True:
+            try:
+                header = await reader.readexactly(4)
+            except asyncio.IncompleteReadError:
+                return  # client closed
+            body = await reader.readexactly(rag_client.decode_length(header))
+            _stats["requests"] += 1
+            try:
+                reply = {"ok": True, "result": await dispatch(json.loads(body.decode("utf-8")))}
+            except Exception as e:
+                _stats["errors"] += 1
+                log.exception("[RAG-SERVER] request failed: %s", e)
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            writer.write(rag_client.encode_frame(reply))
+            await writer.drain()
+    except (ConnectionError, ValueError) as e:
+        log.info("[RAG-SERVER] dropping connection: %s", e)
+    finally:
+        _stats["open_connections"] -= 1
+        writer.close()
+
+
+# =============================================================================
+# Lifecycle
+# =============================================================================
+
+def warmup() -> None:
+    """Load the model and open the collection before accepting connections."""
+    t0 = time.perf_counter()
+    timings = query_engine.warmup(("embedder", "chroma"))
+    log.info("[RAG-SERVER] warm in %.0f ms (%s)", (time.perf_counter() - t0) * 1000.0, timings)
+
+
+async def serve(path: str) -> None:
+    sock_path = pathlib.Path(path)
+    sock_path.parent.mkdir(parents=True, exist_ok=True)
+    if sock_path.exists():
+        sock_path.unlink()  # stale socket from a previous run
+
+    server = await asyncio.start_unix_server(handle_connection, path=str(sock_path))
+    os.chmod(sock_path, 0o600)
+    log.info("[RAG-SERVER] listening on %s (pid %d)", sock_path, os.getpid())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    async with server:
+        await stop.wait()
+    if sock_path.exists():
+        sock_path.unlink()
+    log.info("[RAG-SERVER] stopped")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Shared embedding/search daemon for agent workers.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path (default: RAG_SERVER_SOCKET or var/run/rag.sock).")
+    parser.add_argument("--no-warmup", action="store_true", help="Load the model on the first request instead of at startup.")
+    args = parser.parse_args(argv)
+
+    if not args.no_warmup:
+        warmup()
+    asyncio.run(serve(args.socket))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1223 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/storage.py
+# Version 1.0.7
+
+"""
+Storage backends for the tasks / events / folders / notes records that
+query_engine's helpers (and the agent's function tools) read and write.
+
+  AGENT_STORAGE=json     var/<collection>.json, one JSON array per file (default;
+                         every write rewrites the file). Each collection is
+                         cached in memory after the first read and updated in
+                         place on writes; changes made by other processes are
+                         picked up through inotify (Linux) or, failing that,
+                         an mtime/size check per read (AGENT_STORAGE_INOTIFY=0
+                         forces the latter)
+  AGENT_STORAGE=sqlite   var/agent.db (AGENT_STORAGE_DB), WAL mode; records are
+                         stored as JSON next to indexed id / folder_id / date /
+                         title_lc columns, so single-record reads and writes
+                         do not touch the rest of the collection
+  AGENT_STORAGE=journal  var/<collection>.json snapshot + an append-only
+                         var/<collection>.journal.jsonl op-log; writes append
+                         one line, fsync is batched (AGENT_JOURNAL_FSYNC_MS),
+                         and the log is folded into a new snapshot in the
+                         background once it passes AGENT_JOURNAL_COMPACT_BYTES
+
+Every backend also answers ranked full-text queries over note title/content
+and task text/note (`search`): BM25 over a tokenized inverted index, where
+each query word also matches words it is a prefix of. The json and journal
+backends keep that index in memory next to their hash indexes and update it
+on every write; SQLite uses an FTS5 table kept in the same transactions.
+
+Records keep exactly the shape the JSON files have. Lookups take a `where`
+dict of field -> value; "<label>_lc" (title_lc, text_lc, name_lc, content_lc)
+compares the field stripped and lower-cased, like the original helpers.
+
+Move existing data into SQLite:
+  python -m src.storage migrate [--to sqlite] [--db var/agent.db]
+  python -m src.storage compact [tasks notes ...]     (journal backend)
+  python -m src.storage info
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import bisect
+import time
+import atexit
+import struct
+import sqlite3
+import logging
+import pathlib
+import argparse
+import threading
+import unicodedata
+import ctypes
+import ctypes.util
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger("storage")
+
+ROOT = pathlib.Path(__file__).resolve().parent
+VAR_DIR = ROOT.parent / "var"
+
+COLLECTIONS = ("tasks", "events", "folders", "notes")
+JSON_FILES = {name: VAR_DIR / f"{name}.json" for name in COLLECTIONS}
+
+# Field whose normalized value backs the title_lc index in each collection.
+LABEL_FIELDS = {"tasks": "text", "events": "title", "folders": "name", "notes": "title"}
+
+# Fields covered by the full-text index; the first one counts TEXT_TITLE_WEIGHT times.
+TEXT_FIELDS = {"notes": ("title", "content"), "tasks": ("text", "note")}
+TEXT_TITLE_WEIGHT = 2.0
+
+STORAGE_BACKEND = os.getenv("AGENT_STORAGE", "json").strip().lower()
+STORAGE_DB = pathlib.Path(os.getenv("AGENT_STORAGE_DB") or (VAR_DIR / "agent.db"))
+STORAGE_INOTIFY = os.getenv("AGENT_STORAGE_INOTIFY", "1").lower() not in ("0", "false", "no")
+JOURNAL_FSYNC_MS = float(os.getenv("AGENT_JOURNAL_FSYNC_MS", "50"))           # 0 = fsync every write
+JOURNAL_COMPACT_BYTES = int(os.getenv("AGENT_JOURNAL_COMPACT_BYTES", str(1 << 20)))
+
+try:
+    import fcntl  # cross-process locking for the journal backend (POSIX)
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+Record = Dict[str, Any]
+Where = Dict[str, Any]
+
+
+def norm(value: Any) -> str:
+    """How the helpers compare titles / text: stripped and lower-cased."""
+    return str(value or "").strip().lower()
+
+
+def matches(record: Record, where: Where) -> bool:
+    for key, value in where.items():
+        if key.endswith("_lc"):
+            if norm(record.get(key[:-3])) != value:
+                return False
+        elif record.get(key) != value:
+            return False
+    return True
+
+
+def _sig(path: pathlib.Path):
+    """(inode, mtime_ns, size) of path, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def next_id(records: Iterable[Record]) -> int:
+    return (max((r.get("id", 0) for r in records), default=0) or 0) + 1
+
+
+# =============================================================================
+# Backend interface
+# =============================================================================
+
+class StorageBackend:
+    """
+    One store for every collection. `mutate` callbacks change a record in
+    place; the backend persists whatever they leave behind.
+    """
+
+    name = "base"
+
+    def all(self, collection: str) -> List[Record]:
+        raise NotImplementedError
+
+    def find(self, collection: str, where: Where, limit: Optional[int] = None) -> List[Record]:
+        raise NotImplementedError
+
+    def get(self, collection: str, record_id: Any) -> Optional[Record]:
+        found = self.find(collection, {"id": record_id}, limit=1)
+        return found[0] if found else None
+
+    def insert(self, collection: str, record: Record) -> Record:
+        """Append record with the next id (max id + 1) and return it."""
+        raise NotImplementedError
+
+    def update(self, collection: str, where: Where, mutate: Callable[[Record], None]) -> Optional[Record]:
+        """Apply mutate to the first record matching where; None if there is none."""
+        raise NotImplementedError
+
+    def delete(self, collection: str, where: Where) -> int:
+        """Delete every record matching where; returns how many went."""
+        raise NotImplementedError
+
+    def replace_all(self, collection: str, records: List[Record]) -> None:
+        raise NotImplementedError
+
+    def search(self, collection: str, query: str, limit: int = 10) -> List[Tuple[float, Record]]:
+        """Best-first (score, record) full-text matches. Default: index all() on the fly."""
+        records = self.all(collection)
+        index = TextIndex(TEXT_FIELDS.get(collection) or (LABEL_FIELDS.get(collection, "title"),))
+        for seq, r in enumerate(records):
+            index.add(seq, r)
+        return [(score, records[seq]) for score, seq in index.search(query, limit)]
+
+    def close(self) -> None:
+        pass
+
+
+# =============================================================================
+# File change notification (inotify via ctypes, Linux only)
+# =============================================================================
+
+_IN_MODIFY, _IN_CLOSE_WRITE, _IN_MOVED_TO, _IN_CREATE, _IN_DELETE = 0x2, 0x8, 0x80, 0x100, 0x200
+_IN_DELETE_SELF, _IN_MOVE_SELF, _IN_Q_OVERFLOW, _IN_IGNORED = 0x400, 0x800, 0x4000, 0x8000
+_IN_CLOEXEC = 0o2000000
+_IN_EVENT = struct.Struct("iIII")
+
+
+class FileWatcher:
+    """
+    Counts change events per file name in a set of watched directories.
+
+    Readers remember generation(path) when they load a file and only need to
+    look at the disk again once it moves. If inotify is unavailable, or a
+    watch is lost (directory removed, event queue overflow), `alive` turns
+    False and callers fall back to stat checks.
+    """
+
+    def __init__(self) -> None:
+        self.alive = False
+        self._gens: Dict[str, int] = {}
+        self._dirs: Dict[int, pathlib.Path] = {}
+        self._lock = threading.Lock()
+        self._fd = -1
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._fd = self._libc.inotify_init1(_IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if self._fd < 0:
+            return
+        self.alive = True
+        threading.Thread(target=self._loop, name="storage-inotify", daemon=True).start()
+
+    def watch(self, path: pathlib.Path) -> Optional[str]:
+        """Watch path's directory (created if missing); returns the key for generation()."""
+        if not self.alive:
+            return None
+        directory = path.parent.resolve()
+        key = str(directory / path.name)
+        with self._lock:
+            if directory in self._dirs.values():
+                return key
+        directory.mkdir(parents=True, exist_ok=True)
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), mask)
+        if wd < 0:
+            log.info("[STORAGE] inotify watch on %s failed (errno %d); using stat checks", directory, ctypes.get_errno())
+            self.alive = False
+            return None
+        with self._lock:
+            self._dirs[wd] = directory
+        return key
+
+    def generation(self, key: str) -> int:
+        return self._gens.get(key, 0)
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except OSError:
+                self.alive = False
+                return
+            pos = 0
+            while pos + _IN_EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _IN_EVENT.unpack_from(buf, pos)
+                name = buf[pos + _IN_EVENT.size: pos + _IN_EVENT.size + length].rstrip(b"\0")
+                pos += _IN_EVENT.size + length
+                if mask & (_IN_Q_OVERFLOW | _IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                    log.info("[STORAGE] inotify watch lost; using stat checks")
+                    self.alive = False
+                    return
+                directory = self._dirs.get(wd)
+                if directory is not None and name:
+                    key = str(directory / os.fsdecode(name))
+                    self._gens[key] = self._gens.get(key, 0) + 1
+
+
+_watcher: Optional[FileWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def file_watcher() -> Optional[FileWatcher]:
+    """Process-wide watcher, started on first use; None when disabled or unsupported."""
+    global _watcher
+    if not STORAGE_INOTIFY:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = FileWatcher()
+    return _watcher if _watcher.alive else None
+
+
+# =============================================================================
+# In-memory hash indexes (json / journal backends)
+# =============================================================================
+
+def index_specs(collection: str) -> List[tuple]:
+    """Where-key combinations kept as hash indexes for a collection."""
+    label = LABEL_FIELDS.get(collection, "title") + "_lc"
+    return [("id",), (label,), ("folder_id",), (label, "folder_id")]
+
+
+def _field(record: Record, key: str) -> Any:
+    return norm(record.get(key[:-3])) if key.endswith("_lc") else record.get(key)
+
+
+class RecordIndex:
+    """
+    Hash indexes over one collection's records, maintained on every write.
+
+    Records are identified by a sequence number that grows with file order
+    and stays fixed across updates, so a bucket sorted by it yields matches
+    in the same order a scan would. A lookup uses the index covering the
+    most where keys and checks the rest on that bucket only.
+    """
+
+    def __init__(self, collection: str) -> None:
+        self.specs = index_specs(collection)
+        self.maps: Dict[tuple, Dict[Any, Dict[int, Record]]] = {spec: {} for spec in self.specs}
+        self.text_fields = TEXT_FIELDS.get(collection) or (LABEL_FIELDS.get(collection, "title"),)
+        self.text: Optional[TextIndex] = None   # built by the first search, then kept current
+
+    def search(self, records: Dict[int, Record], query: str, limit: int = 10) -> List[Tuple[float, Record]]:
+        if self.text is None:
+            self.text = TextIndex(self.text_fields)
+            for seq, r in records.items():
+                self.text.add(seq, r)
+        return [(score, records[seq]) for score, seq in self.text.search(query, limit)]
+
+    def add(self, seq: int, record: Record) -> None:
+        if self.text is not None:
+            self.text.add(seq, record)
+        for spec, buckets in self.maps.items():
+            key = tuple(_field(record, k) for k in spec)
+            try:
+                buckets.setdefault(key, {})[seq] = record
+            except TypeError:
+                pass  # unhashable value; lookups on it fall back to a scan
+
+    def remove(self, seq: int, record: Record) -> None:
+        if self.text is not None:
+            self.text.remove(seq, record)
+        for spec, buckets in self.maps.items():
+            key = tuple(_field(record, k) for k in spec)
+            try:
+                bucket = buckets.get(key)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(seq, None)
+                if not bucket:
+                    del buckets[key]
+
+    def select(self, records: Dict[int, Record], where: Where, limit: Optional[int] = None) -> List[tuple]:
+        """(seq, record) pairs matching where, in file order; records is seq -> record."""
+        spec = max((sp for sp in self.specs if all(k in where for k in sp)), key=len, default=None)
+        if spec is None:
+            candidates: Iterable = records.items()
+        else:
+            try:
+                bucket = self.maps[spec].get(tuple(where[k] for k in spec))
+            except TypeError:
+                bucket, spec = None, None
+                candidates = records.items()
+            if spec is not None:
+                if not bucket:
+                    return []
+                candidates = sorted(bucket.items()) if len(bucket) > 1 else bucket.items()
+                if len(spec) == len(where):
+                    where = {}
+        out = []
+        for seq, r in candidates:
+            if not where or matches(r, where):
+                out.append((seq, r))
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+
+# =============================================================================
+# Full-text index
+# =============================================================================
+
+_WORD = re.compile(r"\w+")
+BM25_K1, BM25_B = 1.2, 0.75
+PREFIX_DISCOUNT = 0.7      # a word matched only as a prefix scores this much of an exact hit
+PREFIX_EXPANSIONS = 64     # vocabulary words tried per query prefix
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lower-cased words with accents stripped ("Café" -> "cafe")."""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    return _WORD.findall("".join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+class TextIndex:
+    """
+    Inverted index (term -> {seq: weighted tf}) with a sorted vocabulary for
+    prefix lookups. A record matches a query when every query word hits it
+    exactly or as a prefix; if none does, any single word is enough. Hits are
+    ranked by BM25, keeping the best-scoring word per query word.
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        self.fields = tuple(fields)
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.vocab: List[str] = []
+        self.lengths: Dict[int, float] = {}
+        self.total = 0.0
+
+    def _terms(self, record: Record) -> Dict[str, float]:
+        tf: Dict[str, float] = {}
+        for i, field in enumerate(self.fields):
+            weight = TEXT_TITLE_WEIGHT if i == 0 else 1.0
+            for tok in tokenize(record.get(field)):
+                tf[tok] = tf.get(tok, 0.0) + weight
+        return tf
+
+    def add(self, seq: int, record: Record) -> None:
+        tf = self._terms(record)
+        if not tf:
+            return
+        self.lengths[seq] = length = sum(tf.values())
+        self.total += length
+        for term, count in tf.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.vocab, term)
+            posting[seq] = count
+
+    def remove(self, seq: int, record: Record) -> None:
+        """record must be the version that was added under seq."""
+        length = self.lengths.pop(seq, None)
+        if length is None:
+            return
+        self.total -= length
+        for term in self._terms(record):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(seq, None)
+            if not posting:
+                del self.postings[term]
+                self.vocab.pop(bisect.bisect_left(self.vocab, term))
+
+    def _expand(self, word: str) -> List[Tuple[str, float]]:
+        out = [(word, 1.0)] if word in self.postings else []
+        i = bisect.bisect_left(self.vocab, word)
+        while i < len(self.vocab) and len(out) < PREFIX_EXPANSIONS and self.vocab[i].startswith(word):
+            if self.vocab[i] != word:
+                out.append((self.vocab[i], PREFIX_DISCOUNT))
+            i += 1
+        return out
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, int]]:
+        """Best-first (score, seq) pairs."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or not self.lengths:
+            return []
+        n = len(self.lengths)
+        avgdl = self.total / n
+        per_word: List[Dict[int, float]] = []
+        for word in words:
+            scores: Dict[int, float] = {}
+            for term, factor in self._expand(word):
+                posting = self.postings[term]
+                idf = math.log(1.0 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for seq, tf in posting.items():
+                    norm_tf = tf * (BM25_K1 + 1.0) / (tf + BM25_K1 * (1.0 - BM25_B + BM25_B * self.lengths[seq] / avgdl))
+                    s = factor * idf * norm_tf
+                    if s > scores.get(seq, 0.0):
+                        scores[seq] = s
+            per_word.append(scores)
+        per_word.sort(key=len)
+        hits = [seq for seq in per_word[0] if all(seq in s for s in per_word[1:])]
+        if not hits:
+            hits = list(set().union(*per_word))
+        return heapq.nlargest(
+            max(1, int(limit)),
+            ((round(sum(s.get(seq, 0.0) for s in per_word), 4), seq) for seq in hits),
+            key=lambda x: (x[0], -x[1]),
+        )
+
+
+# =============================================================================
+# JSON files (original layout)
+# =============================================================================
+
+class _Cached:
+    """One collection as last read from (or written to) disk, with its indexes."""
+
+    __slots__ = ("records", "index", "next_seq", "sig", "gen")
+
+    def __init__(self, collection: str, records: List[Record], sig, gen: Optional[int]) -> None:
+        self.records: Dict[int, Record] = dict(enumerate(records))
+        self.index = RecordIndex(collection)
+        for seq, r in self.records.items():
+            self.index.add(seq, r)
+        self.next_seq = len(records)
+        self.sig = sig
+        self.gen = gen
+
+
+class JsonBackend(StorageBackend):
+    """
+    var/<collection>.json arrays, rewritten atomically on every write.
+
+    Reads are served from a per-process copy of each collection. The copy is
+    revalidated against the file only when the watcher saw an event for it
+    (or, without inotify, when its inode/mtime/size changed), so repeated
+    reads do no file I/O, and lookups on id / label / folder_id go through
+    RecordIndex instead of a scan. Records handed out are copies; the cache
+    is only changed by this backend's own writes, after the file is written.
+    """
+
+    name = "json"
+
+    def __init__(self, files: Optional[Dict[str, pathlib.Path]] = None, watch: bool = True) -> None:
+        self.files = dict(files or JSON_FILES)
+        self._lock = threading.RLock()
+        self._cache: Dict[str, _Cached] = {}
+        self._watch = watch
+        self._keys: Dict[str, Optional[str]] = {}
+
+    def _generation(self, collection: str) -> Optional[int]:
+        """Watcher generation of the collection's file; None when stat checks are needed."""
+        watcher = file_watcher() if self._watch else None
+        if watcher is None:
+            return None
+        if collection not in self._keys:
+            self._keys[collection] = watcher.watch(self.files[collection])
+        key = self._keys[collection]
+        return watcher.generation(key) if key is not None else None
+
+    def _load(self, collection: str) -> _Cached:
+        path = self.files[collection]
+        gen = self._generation(collection)
+        cached = self._cache.get(collection)
+        if cached is not None and gen is not None and cached.gen == gen:
+            return cached
+        sig = _sig(path)
+        if cached is not None and cached.sig == sig:
+            cached.gen = gen
+            return cached
+        with self._lock:
+            try:
+                records = json.loads(path.read_text("utf-8")) if sig else []
+            except Exception:
+                records = []
+            cached = self._cache[collection] = _Cached(collection, records if isinstance(records, list) else [], sig, gen)
+        return cached
+
+    def _write(self, collection: str, records: List[Record]) -> None:
+        path = self.files[collection]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(records, indent=2, ensure_ascii=False), "utf-8")
+        os.replace(tmp, path)
+
+    def _written(self, collection: str, cached: _Cached) -> None:
+        """Our own write: remember the new file so its inotify event does not force a reload."""
+        cached.sig = _sig(self.files[collection])
+        cached.gen = self._generation(collection)
+
+    def all(self, collection: str) -> List[Record]:
+        with self._lock:
+            return [dict(r) for r in self._load(collection).records.values()]
+
+    def find(self, collection: str, where: Where, limit: Optional[int] = None) -> List[Record]:
+        with self._lock:
+            cached = self._load(collection)
+            return [dict(r) for _, r in cached.index.select(cached.records, where, limit)]
+
+    def search(self, collection: str, query: str, limit: int = 10) -> List[Tuple[float, Record]]:
+        with self._lock:
+            cached = self._load(collection)
+            return [(score, dict(r)) for score, r in cached.index.search(cached.records, query, limit)]
+
+    def insert(self, collection: str, record: Record) -> Record:
+        with self._lock:
+            cached = self._load(collection)
+            record = {"id": next_id(cached.records.values()), **record}
+            self._write(collection, [*cached.records.values(), record])
+            seq, cached.next_seq = cached.next_seq, cached.next_seq + 1
+            cached.records[seq] = record
+            cached.index.add(seq, record)
+            self._written(collection, cached)
+        return dict(record)
+
+    def update(self, collection: str, where: Where, mutate: Callable[[Record], None]) -> Optional[Record]:
+        with self._lock:
+            cached = self._load(collection)
+            found = cached.index.select(cached.records, where, limit=1)
+            if not found:
+                return None
+            seq, current = found[0]
+            target = dict(current)
+            mutate(target)
+            self._write(collection, [target if s == seq else r for s, r in cached.records.items()])
+            cached.index.remove(seq, current)
+            cached.records[seq] = target
+            cached.index.add(seq, target)
+            self._written(collection, cached)
+        return dict(target)
+
+    def delete(self, collection: str, where: Where) -> int:
+        with self._lock:
+            cached = self._load(collection)
+            doomed = cached.index.select(cached.records, where)
+            if not doomed:
+                return 0
+            gone = {seq for seq, _ in doomed}
+            self._write(collection, [r for s, r in cached.records.items() if s not in gone])
+            for seq, r in doomed:
+                cached.index.remove(seq, r)
+                del cached.records[seq]
+            self._written(collection, cached)
+        return len(doomed)
+
+    def replace_all(self, collection: str, records: List[Record]) -> None:
+        with self._lock:
+            records = [dict(r) for r in records]
+            self._write(collection, records)
+            self._cache[collection] = _Cached(collection, records, _sig(self.files[collection]), self._generation(collection))
+
+
+# =============================================================================
+# SQLite (WAL)
+# =============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    id,                     -- untyped: stored exactly as the JSON had it
+    folder_id,
+    date       TEXT,
+    title_lc   TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_id ON records (collection, id);
+CREATE INDEX IF NOT EXISTS records_folder ON records (collection, folder_id);
+CREATE INDEX IF NOT EXISTS records_date ON records (collection, date);
+CREATE INDEX IF NOT EXISTS records_title ON records (collection, title_lc);
+CREATE INDEX IF NOT EXISTS records_title_folder ON records (collection, title_lc, folder_id);
+"""
+
+# Full-text side table, rowid = records.seq; only TEXT_FIELDS collections get rows.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+    title, body, collection UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+class SqliteBackend(StorageBackend):
+    """
+    All collections in one WAL-mode database; one connection per thread.
+    Predicates on id / folder_id / date / <label>_lc use the indexes; any
+    others are checked in Python on the rows the indexed ones return.
+    Full-text search goes through an FTS5 table (bm25 ranking, prefix
+    queries) when the SQLite build has FTS5, else through the base scan.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: pathlib.Path = STORAGE_DB, timeout_s: float = 10.0) -> None:
+        self.path = pathlib.Path(path)
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+        self.fts = False
+        self._init_fts()
+
+    def _init_fts(self) -> None:
+        conn = self._conn()
+        try:
+            conn.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            log.info("[STORAGE] FTS5 unavailable (%s); full-text search will scan", e)
+            return
+        self.fts = True
+        # Databases created before the FTS table existed: index what is there once.
+        (indexed,) = conn.execute("SELECT COUNT(*) FROM records_fts").fetchone()
+        if not indexed:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for collection in TEXT_FIELDS:
+                    rows = conn.execute("SELECT seq, data FROM records WHERE collection = ?", (collection,)).fetchall()
+                    self._fts_add(conn, collection, [(seq, json.loads(data)) for seq, data in rows])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _fts_add(self, conn: sqlite3.Connection, collection: str, rows: List[tuple]) -> None:
+        fields = TEXT_FIELDS.get(collection)
+        if not fields or not self.fts:
+            return
+        conn.executemany(
+            "INSERT INTO records_fts (rowid, title, body, collection) VALUES (?, ?, ?, ?)",
+            [(seq, str(r.get(fields[0]) or ""), " ".join(str(r.get(f) or "") for f in fields[1:]), collection)
+             for seq, r in rows],
+        )
+
+    def _fts_delete(self, conn: sqlite3.Connection, collection: str, seqs: List[int]) -> None:
+        if collection in TEXT_FIELDS and self.fts:
+            conn.executemany("DELETE FROM records_fts WHERE rowid = ?", [(s,) for s in seqs])
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout_s, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _columns(collection: str, record: Record) -> tuple:
+        return (
+            collection,
+            record.get("id"),
+            record.get("folder_id"),
+            record.get("date"),
+            norm(record.get(LABEL_FIELDS.get(collection, "title"))),
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    def _select(self, collection: str, where: Where, limit: Optional[int] = None, columns: str = "seq, data"):
+        """(sql, params, residual) for where; residual predicates are checked in Python."""
+        label = LABEL_FIELDS.get(collection, "title") + "_lc"
+        clauses, params, residual = ["collection = ?"], [collection], {}
+        for key, value in where.items():
+            if key in ("id", "folder_id", "date"):
+                if value is None:
+                    clauses.append(f"{key} IS NULL")
+                else:
+                    clauses.append(f"{key} = ?")
+                    params.append(value)
+            elif key == label:
+                clauses.append("title_lc = ?")
+                params.append(value)
+            else:
+                residual[key] = value
+        sql = f"SELECT {columns} FROM records WHERE {' AND '.join(clauses)} ORDER BY seq"
+        if limit is not None and not residual:
+            sql += f" LIMIT {int(limit)}"
+        return sql, params, residual
+
+    def _rows(self, conn: sqlite3.Connection, collection: str, where: Where, limit: Optional[int] = None):
+        sql, params, residual = self._select(collection, where, limit)
+        n = 0
+        for seq, data in conn.execute(sql, params):
+            record = json.loads(data)
+            if residual and not matches(record, residual):
+                continue
+            yield seq, record
+            n += 1
+            if limit is not None and n >= limit:
+                return
+
+    def all(self, collection: str) -> List[Record]:
+        return [r for _, r in self._rows(self._conn(), collection, {})]
+
+    def find(self, collection: str, where: Where, limit: Optional[int] = None) -> List[Record]:
+        return [r for _, r in self._rows(self._conn(), collection, where, limit)]
+
+    def insert(self, collection: str, record: Record) -> Record:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (top,) = conn.execute("SELECT MAX(id) FROM records WHERE collection = ?", (collection,)).fetchone()
+            record = {"id": (top or 0) + 1, **record}
+            cur = conn.execute("INSERT INTO records (collection, id, folder_id, date, title_lc, data) VALUES (?, ?, ?, ?, ?, ?)",
+                               self._columns(collection, record))
+            self._fts_add(conn, collection, [(cur.lastrowid, record)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return record
+
+    def update(self, collection: str, where: Where, mutate: Callable[[Record], None]) -> Optional[Record]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            hit = next(self._rows(conn, collection, where, limit=1), None)
+            if hit is None:
+                conn.execute("COMMIT")
+                return None
+            seq, record = hit
+            mutate(record)
+            cols = self._columns(collection, record)
+            conn.execute("UPDATE records SET id = ?, folder_id = ?, date = ?, title_lc = ?, data = ? WHERE seq = ?",
+                         (*cols[1:], seq))
+            self._fts_delete(conn, collection, [seq])
+            self._fts_add(conn, collection, [(seq, record)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return record
+
+    def delete(self, collection: str, where: Where) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seqs = [(seq,) for seq, _ in self._rows(conn, collection, where)]
+            conn.executemany("DELETE FROM records WHERE seq = ?", seqs)
+            self._fts_delete(conn, collection, [s for (s,) in seqs])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(seqs)
+
+    def replace_all(self, collection: str, records: List[Record]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM records WHERE collection = ?", (collection,))
+            if collection in TEXT_FIELDS and self.fts:
+                conn.execute("DELETE FROM records_fts WHERE collection = ?", (collection,))
+            conn.executemany("INSERT INTO records (collection, id, folder_id, date, title_lc, data) VALUES (?, ?, ?, ?, ?, ?)",
+                             [self._columns(collection, r) for r in records])
+            if collection in TEXT_FIELDS and self.fts:
+                rows = conn.execute("SELECT seq, data FROM records WHERE collection = ?", (collection,)).fetchall()
+                self._fts_add(conn, collection, [(seq, json.loads(data)) for seq, data in rows])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def search(self, collection: str, query: str, limit: int = 10) -> List[Tuple[float, Record]]:
+        words = list(dict.fromkeys(tokenize(query)))
+        if collection not in TEXT_FIELDS or not self.fts:
+            return super().search(collection, query, limit)
+        if not words:
+            return []
+        sql = (f"SELECT -bm25(records_fts, {TEXT_TITLE_WEIGHT}, 1.0) AS score, r.data FROM records_fts "
+               "JOIN records r ON r.seq = records_fts.rowid "
+               "WHERE records_fts MATCH ? AND records_fts.collection = ? ORDER BY score DESC, r.seq LIMIT ?")
+        conn = self._conn()
+        for joiner in (" AND ", " OR "):  # every word first, then any word
+            match = joiner.join(f'"{w}"*' for w in words)
+            rows = conn.execute(sql, (match, collection, max(1, int(limit)))).fetchall()
+            if rows:
+                return [(round(score, 4), json.loads(data)) for score, data in rows]
+        return []
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# =============================================================================
+# Journal (JSON snapshot + append-only op-log)
+# =============================================================================
+
+class _Journal:
+    """In-memory state of one collection plus its snapshot / log files."""
+
+    def __init__(self, collection: str, snapshot: pathlib.Path) -> None:
+        self.collection = collection
+        self.snapshot = snapshot
+        self.log_path = snapshot.with_name(snapshot.stem + ".journal.jsonl")
+        self.lock_path = snapshot.with_name(snapshot.stem + ".lock")
+        self.lock = threading.RLock()
+        self.reset([])
+        self.snap_sig = None
+        self.log_ino = None
+        self.offset = 0
+        self.fd: Optional[int] = None
+        self.dirty = False
+        self.compacting = False
+        self.lock_fd: Optional[int] = None
+
+    def reset(self, records: List[Record]) -> None:
+        self.records: Dict[int, Record] = {}   # seq -> record, in file order
+        self.seqs: Dict[Any, int] = {}         # id -> seq
+        self.index = RecordIndex(self.collection)
+        self.next_seq = 0
+        for r in records:
+            self.put(r)
+
+    def put(self, record: Record) -> None:
+        rid = record.get("id")
+        key = ("_pos", self.next_seq) if rid is None else rid
+        seq = self.seqs.get(key)
+        if seq is None:
+            seq = self.seqs[key] = self.next_seq
+            self.next_seq += 1
+        else:
+            self.index.remove(seq, self.records[seq])
+        self.records[seq] = record
+        self.index.add(seq, record)
+
+    def drop(self, rid: Any) -> None:
+        seq = self.seqs.pop(rid, None)
+        if seq is not None:
+            self.index.remove(seq, self.records.pop(seq))
+
+
+class JournalBackend(StorageBackend):
+    """
+    Each collection is its var/<name>.json snapshot (same format as the json
+    backend) plus var/<name>.journal.jsonl, one op per line:
+      {"op": "put", "record": {...}}    insert or replace the record with that id
+      {"op": "del", "ids": [...]}
+    Ops are idempotent, so replaying a log onto a snapshot that already holds
+    some of them (a crash mid-compaction) gives the same state. Records are
+    keyed by id.
+
+    Every process keeps the collection in memory and, before each operation,
+    replays only the log bytes appended since it last looked; a new snapshot
+    or log file (another process compacted) triggers a full reload. Appends
+    and compaction hold an exclusive flock on var/<name>.lock.
+    """
+
+    name = "journal"
+
+    def __init__(
+        self,
+        files: Optional[Dict[str, pathlib.Path]] = None,
+        fsync_ms: float = JOURNAL_FSYNC_MS,
+        compact_bytes: int = JOURNAL_COMPACT_BYTES,
+    ) -> None:
+        self.files = dict(files or JSON_FILES)
+        self.fsync_s = max(0.0, float(fsync_ms)) / 1000.0
+        self.compact_bytes = max(1, int(compact_bytes))
+        self._journals = {name: _Journal(name, path) for name, path in self.files.items()}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if self.fsync_s > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="journal-fsync", daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    # -------------------------------------------------------------------------
+    # Files
+    # -------------------------------------------------------------------------
+
+    class _FileLock:
+        """Thread lock + flock on var/<name>.lock (kept open for the backend's lifetime)."""
+
+        def __init__(self, j: _Journal, exclusive: bool) -> None:
+            self.j, self.exclusive = j, exclusive
+
+        def __enter__(self):
+            j = self.j
+            j.lock.acquire()
+            if fcntl is not None:
+                if j.lock_fd is None:
+                    j.lock_path.parent.mkdir(parents=True, exist_ok=True)
+                    j.lock_fd = os.open(j.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(j.lock_fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+            return j
+
+        def __exit__(self, *exc):
+            if fcntl is not None and self.j.lock_fd is not None:
+                fcntl.flock(self.j.lock_fd, fcntl.LOCK_UN)
+            self.j.lock.release()
+
+    def _open_log(self, j: _Journal) -> None:
+        if j.fd is not None:
+            os.close(j.fd)
+        j.log_path.parent.mkdir(parents=True, exist_ok=True)
+        j.fd = os.open(j.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        j.log_ino = os.fstat(j.fd).st_ino
+
+    @staticmethod
+    def _apply(j: _Journal, op: Dict[str, Any]) -> None:
+        if op.get("op") == "put":
+            j.put(op["record"])
+        elif op.get("op") == "del":
+            for rid in op.get("ids") or []:
+                j.drop(rid)
+
+    def _refresh(self, j: _Journal) -> None:
+        """Catch up with the files: full reload if they were replaced, else replay the log tail."""
+        snap_sig = _sig(j.snapshot)
+        try:
+            log_st = j.log_path.stat()
+        except OSError:
+            log_st = None
+        if j.fd is None or snap_sig != j.snap_sig or log_st is None or log_st.st_ino != j.log_ino or log_st.st_size < j.offset:
+            try:
+                data = json.loads(j.snapshot.read_text("utf-8")) if snap_sig else []
+            except Exception:
+                data = []
+            j.reset(data if isinstance(data, list) else [])
+            j.snap_sig = snap_sig
+            j.offset = 0
+            if log_st is None or j.fd is None or log_st.st_ino != j.log_ino:
+                self._open_log(j)
+        with open(j.log_path, "rb") as fp:
+            fp.seek(j.offset)
+            tail = fp.read()
+        end = tail.rfind(b"\n") + 1           # a line still being written is left for later
+        for line in tail[:end].splitlines():
+            if line.strip():
+                try:
+                    self._apply(j, json.loads(line))
+                except ValueError:
+                    log.warning("[STORAGE] skipping corrupt journal line in %s", j.log_path)
+        j.offset += end
+
+    def _append(self, j: _Journal, op: Dict[str, Any]) -> None:
+        """Callers hold the exclusive flock and have just run _refresh."""
+        size = os.fstat(j.fd).st_size
+        if size > j.offset:
+            # Bytes past the last full line under the exclusive lock can only be a
+            # crashed writer's torn record; appending onto it would lose this op.
+            log.warning("[STORAGE] truncating %d torn byte(s) at the end of %s", size - j.offset, j.log_path)
+            os.ftruncate(j.fd, j.offset)
+        line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+        os.write(j.fd, line)
+        j.offset += len(line)
+        self._apply(j, op)
+        if self.fsync_s == 0:
+            os.fsync(j.fd)
+        else:
+            j.dirty = True
+        if j.offset >= self.compact_bytes and not j.compacting:
+            j.compacting = True
+            threading.Thread(target=self._compact_bg, args=(j,), name="journal-compact", daemon=True).start()
+
+    def _write_snapshot(self, j: _Journal, records: List[Record]) -> None:
+        """New snapshot, then a fresh empty log; both swapped in with os.replace."""
+        j.snapshot.parent.mkdir(parents=True, exist_ok=True)
+        tmp = j.snapshot.with_name(j.snapshot.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fp:
+            fp.write(json.dumps(records, indent=2, ensure_ascii=False))
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, j.snapshot)
+        tmp = j.log_path.with_name(j.log_path.name + ".tmp")
+        open(tmp, "wb").close()
+        os.replace(tmp, j.log_path)
+        self._open_log(j)
+        j.snap_sig = _sig(j.snapshot)
+        j.offset = 0
+        j.dirty = False
+
+    def compact(self, collection: str) -> int:
+        """Fold the log into a new snapshot now; returns the record count."""
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=True):
+            self._refresh(j)
+            records = list(j.records.values())
+            self._write_snapshot(j, records)
+            return len(records)
+
+    def _compact_bg(self, j: _Journal) -> None:
+        name = next(n for n, x in self._journals.items() if x is j)
+        try:
+            t0 = time.perf_counter()
+            n = self.compact(name)
+            log.info("[STORAGE] compacted %s journal (%d records) in %.0f ms", name, n, (time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            log.warning("[STORAGE] compaction of %s failed: %s", name, e)
+        finally:
+            j.compacting = False
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.fsync_s):
+            self.sync()
+
+    def sync(self) -> None:
+        """fsync every collection with unsynced appends (the group commit)."""
+        for j in self._journals.values():
+            if j.dirty and j.fd is not None:
+                with j.lock:
+                    if j.dirty and j.fd is not None:
+                        os.fsync(j.fd)
+                        j.dirty = False
+
+    # -------------------------------------------------------------------------
+    # StorageBackend
+    # -------------------------------------------------------------------------
+
+    def all(self, collection: str) -> List[Record]:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=False):
+            self._refresh(j)
+            return [dict(r) for r in j.records.values()]
+
+    def find(self, collection: str, where: Where, limit: Optional[int] = None) -> List[Record]:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=False):
+            self._refresh(j)
+            return [dict(r) for _, r in j.index.select(j.records, where, limit)]
+
+    def search(self, collection: str, query: str, limit: int = 10) -> List[Tuple[float, Record]]:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=False):
+            self._refresh(j)
+            return [(score, dict(r)) for score, r in j.index.search(j.records, query, limit)]
+
+    def insert(self, collection: str, record: Record) -> Record:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=True):
+            self._refresh(j)
+            record = {"id": next_id(j.records.values()), **record}
+            self._append(j, {"op": "put", "record": record})
+        return dict(record)
+
+    def update(self, collection: str, where: Where, mutate: Callable[[Record], None]) -> Optional[Record]:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=True):
+            self._refresh(j)
+            found = j.index.select(j.records, where, limit=1)
+            if not found:
+                return None
+            record = dict(found[0][1])
+            mutate(record)
+            self._append(j, {"op": "put", "record": record})
+        return dict(record)
+
+    def delete(self, collection: str, where: Where) -> int:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=True):
+            self._refresh(j)
+            ids = [r.get("id") for _, r in j.index.select(j.records, where)]
+            if ids:
+                self._append(j, {"op": "del", "ids": ids})
+        return len(ids)
+
+    def replace_all(self, collection: str, records: List[Record]) -> None:
+        j = self._journals[collection]
+        with self._FileLock(j, exclusive=True):
+            self._write_snapshot(j, list(records))
+            j.reset(list(records))
+
+    def close(self) -> None:
+        self._stop.set()
+        self.sync()
+        for j in self._journals.values():
+            with j.lock:
+                if j.fd is not None:
+                    os.close(j.fd)
+                    j.fd = None
+                if j.lock_fd is not None:
+                    os.close(j.lock_fd)
+                    j.lock_fd = None
+
+
+# =============================================================================
+# Selection
+# =============================================================================
+
+BACKENDS: Dict[str, Callable[[], StorageBackend]] = {
+    "json": JsonBackend,
+    "sqlite": SqliteBackend,
+    "journal": JournalBackend,
+}
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    """The process-wide backend picked by AGENT_STORAGE (created on first use)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                factory = BACKENDS.get(STORAGE_BACKEND)
+                if factory is None:
+                    log.warning("[STORAGE] unknown AGENT_STORAGE=%r; using json", STORAGE_BACKEND)
+                    factory = JsonBackend
+                _backend = factory()
+                log.info("[STORAGE] using %s backend", _backend.name)
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> None:
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# =============================================================================
+# Migration
+# =============================================================================
+
+def migrate(source: StorageBackend, target: StorageBackend, collections: Iterable[str] = COLLECTIONS) -> Dict[str, int]:
+    """Copy every record of each collection from source to target (target's copy is replaced)."""
+    counts = {}
+    for name in collections:
+        records = source.all(name)
+        target.replace_all(name, records)
+        counts[name] = len(records)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Agent record storage tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    mig = sub.add_parser("migrate", help="Copy var/*.json records into another backend.")
+    mig.add_argument("--to", choices=sorted(set(BACKENDS) - {"json"}), default="sqlite")
+    mig.add_argument("--db", type=pathlib.Path, default=STORAGE_DB, help="SQLite database path.")
+
+    sub.add_parser("info", help="Record counts per collection for the configured backend.")
+
+    comp = sub.add_parser("compact", help="Fold the journal backend's op-logs into their snapshots.")
+    comp.add_argument("collections", nargs="*", default=list(COLLECTIONS))
+
+    args = parser.parse_args(argv)
+    if args.cmd == "migrate":
+        target = SqliteBackend(args.db) if args.to == "sqlite" else BACKENDS[args.to]()
+        if isinstance(target, JournalBackend):
+            print("[•] The journal backend reads var/*.json as its snapshots; nothing to copy.")
+            return 0
+        counts = migrate(JsonBackend(), target)
+        target.close()
+        print(f"✅ Migrated var/*.json into {args.to} ({getattr(target, 'path', '')})")
+        for name, n in counts.items():
+            print(f"- {name}: {n} records")
+        print(f"- Set AGENT_STORAGE={args.to} to use it.")
+        return 0
+
+    if args.cmd == "compact":
+        journal = JournalBackend(fsync_ms=0)
+        for name in args.collections:
+            print(f"- {name}: {journal.compact(name)} records")
+        journal.close()
+        print("✅ Journals compacted")
+        return 0
+
+    backend = get_backend()
+    print(f"Backend: {backend.name}")
+    for name in COLLECTIONS:
+        print(f"- {name}: {len(backend.all(name))} records")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
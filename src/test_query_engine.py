@@ -5,7 +5,9 @@
 
 import sys
 from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
+
+from src import embeddings
+from src import rag_cache
 
 def main():
     if len(sys.argv) < 2:
@@ -17,11 +19,10 @@ def main():
 
     
     client = PersistentClient(path="storage/query_engine_store")
-    collection = client.get_or_create_collection("aia107_documents")
+    collection = client.get_or_create_collection(rag_cache.read_index_pointer()["collection"])
 
     
-    embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-    query_embedding = embed_model.encode(query).tolist()
+    query_embedding = embeddings.encode_query(query)
 
    
     results = collection.query(
@@ -0,0 +1,561 @@
+# Developed By Balla Cisse.
+# Alfred AIA
+# Version 1.0.7
+# src/vector_store.py
+# Version 1.0.7
+
+"""
+On-disk vector store that loads lazily and shares pages between processes.
+
+Layout of a store directory (default var/vectorstore/):
+  embeddings.npy      float32 (N, d) matrix, opened with np.load(mmap_mode="r")
+  items.jsonl         one JSON metadata record per line
+  items.offsets.npy   uint64 (N + 1) byte offsets of each line in items.jsonl
+  meta.json           {"format", "count", "dim", "model", "source", "created_at", "quantized"}
+
+Optional quantized copies for the first search pass (written by `quantize`):
+  embeddings.int8.npy    int8 (N, d), symmetric per-row scale (1/4 of float32)
+  embeddings.scale.npy   float32 (N,) per-row scale for the int8 copy
+  embeddings.f16.npy     float16 (N, d) (1/2 of float32)
+  embeddings.norms.npy   float32 (N,) exact squared row norms (for L2 scoring)
+VectorStore.search() scans the quantized copy and re-scores the top
+candidates against the float32 rows, so only those rows are paged in.
+
+Convert existing stores:
+  python -m src.vector_store convert --from-pickle var/vectorstore.pkl
+  python -m src.vector_store convert --from-rag-index data/rag_index --out var/rag_index_store
+  python -m src.vector_store convert --from-json-store data/app/default__vector_store.json --out var/app_store
+  python -m src.vector_store quantize [path] [--dtype int8,float16]
+  python -m src.vector_store evaluate [path] [--k 10] [--queries 200]
+  python -m src.vector_store info [path]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import mmap
+import time
+import pickle
+import pathlib
+import argparse
+import datetime as dt
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent
+VAR_DIR = ROOT.parent / "var"
+DEFAULT_STORE_DIR = VAR_DIR / "vectorstore"
+LEGACY_PICKLE_FILE = VAR_DIR / "vectorstore.pkl"
+
+FORMAT_VERSION = 1
+EMBEDDINGS_FILE = "embeddings.npy"
+ITEMS_FILE = "items.jsonl"
+OFFSETS_FILE = "items.offsets.npy"
+META_FILE = "meta.json"
+
+QUANTIZED_FILES = {"int8": "embeddings.int8.npy", "float16": "embeddings.f16.npy"}
+SCALE_FILE = "embeddings.scale.npy"
+NORMS_FILE = "embeddings.norms.npy"
+QUANTIZE_BLOCK_ROWS = 65536
+SEARCH_BLOCK_ROWS = int(os.getenv("VECTOR_SEARCH_BLOCK_ROWS", "65536"))
+RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))   # candidates re-scored = k * factor
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+
+def write_store(
+    path: pathlib.Path,
+    items: Sequence[Dict[str, Any]],
+    embeddings: Any,
+    model: Optional[str] = None,
+    source: Optional[str] = None,
+) -> pathlib.Path:
+    """Write items + embedding matrix as a store directory. meta.json is written last."""
+    path = pathlib.Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    emb = np.ascontiguousarray(np.asarray(embeddings, dtype="float32"))
+    if emb.ndim != 2:
+        raise ValueError(f"embeddings must be 2-D, got shape {emb.shape}")
+    if len(items) != emb.shape[0]:
+        raise ValueError(f"{len(items)} items but {emb.shape[0]} embedding rows")
+
+    tmp = path / (EMBEDDINGS_FILE + ".tmp")
+    with open(tmp, "wb") as fp:
+        np.save(fp, emb)
+    os.replace(tmp, path / EMBEDDINGS_FILE)
+
+    offsets = np.zeros(len(items) + 1, dtype="uint64")
+    tmp = path / (ITEMS_FILE + ".tmp")
+    with open(tmp, "wb") as fp:
+        pos = 0
+        for i, item in enumerate(items):
+            line = (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            fp.write(line)
+            pos += len(line)
+            offsets[i + 1] = pos
+    os.replace(tmp, path / ITEMS_FILE)
+
+    tmp = path / (OFFSETS_FILE + ".tmp")
+    with open(tmp, "wb") as fp:
+        np.save(fp, offsets)
+    os.replace(tmp, path / OFFSETS_FILE)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "count": int(emb.shape[0]),
+        "dim": int(emb.shape[1]),
+        "model": model,
+        "source": source,
+        "created_at": dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+    }
+    tmp = path / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2), "utf-8")
+    os.replace(tmp, path / META_FILE)
+    return path
+
+
+def _save_npy(path: pathlib.Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fp:
+        np.save(fp, arr)
+    os.replace(tmp, path)
+
+
+def quantize_store(path: pathlib.Path = DEFAULT_STORE_DIR, dtypes: Sequence[str] = ("int8",)) -> Dict[str, Any]:
+    """
+    Write int8 and/or float16 copies of a store's embeddings (block by block,
+    so the float32 matrix is never fully resident) and record them in meta.json.
+    int8 uses a symmetric per-row scale: row ~= codes * scale, scale = max|row| / 127.
+    """
+    path = pathlib.Path(path)
+    dtypes = [d for d in dtypes if d]
+    unknown = [d for d in dtypes if d not in QUANTIZED_FILES]
+    if unknown:
+        raise ValueError(f"unknown dtype(s) {unknown}; choose from {sorted(QUANTIZED_FILES)}")
+    store = VectorStore(path)
+    emb = store.embeddings
+    n, d = emb.shape
+
+    outputs: Dict[str, np.ndarray] = {}
+    tmp_paths: Dict[str, pathlib.Path] = {}
+    for name in list(dtypes) + [NORMS_FILE] + ([SCALE_FILE] if "int8" in dtypes else []):
+        fname = QUANTIZED_FILES.get(name, name)
+        shape = (n,) if fname in (NORMS_FILE, SCALE_FILE) else (n, d)
+        dt_ = {"int8": "int8", "float16": "float16"}.get(name, "float32")
+        tmp_paths[fname] = path / (fname + ".tmp")
+        outputs[fname] = np.lib.format.open_memmap(tmp_paths[fname], mode="w+", dtype=dt_, shape=shape)
+
+    for start in range(0, n, QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(emb[start:start + QUANTIZE_BLOCK_ROWS], dtype="float32")
+        end = start + len(block)
+        outputs[NORMS_FILE][start:end] = np.einsum("ij,ij->i", block, block)
+        if "int8" in dtypes:
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            outputs[SCALE_FILE][start:end] = scale
+            outputs[QUANTIZED_FILES["int8"]][start:end] = np.clip(np.rint(block / scale[:, None]), -127, 127)
+        if "float16" in dtypes:
+            outputs[QUANTIZED_FILES["float16"]][start:end] = block
+
+    for fname, arr in outputs.items():
+        arr.flush()
+        os.replace(tmp_paths[fname], path / fname)
+    outputs.clear()
+
+    meta = dict(store.meta)
+    store.close()
+    meta["quantized"] = sorted(set(meta.get("quantized") or []) | set(dtypes))
+    tmp = path / (META_FILE + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2), "utf-8")
+    os.replace(tmp, path / META_FILE)
+    return meta
+
+
+# =============================================================================
+# Reading
+# =============================================================================
+
+class VectorStore:
+    """
+    Read-only view of a store directory. The embedding matrix and the items
+    file are memory-mapped on first access, so opening a store is O(1) and
+    worker processes share the same page-cache pages.
+    """
+
+    def __init__(self, path: pathlib.Path = DEFAULT_STORE_DIR) -> None:
+        self.path = pathlib.Path(path)
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            hint = ""
+            if LEGACY_PICKLE_FILE.exists():
+                hint = f" (convert the legacy pickle with: python -m src.vector_store convert --from-pickle {LEGACY_PICKLE_FILE})"
+            raise FileNotFoundError(f"No vector store at {self.path}{hint}")
+        self.meta: Dict[str, Any] = json.loads(meta_path.read_text("utf-8"))
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store format {self.meta.get('format')!r} at {self.path}")
+        self._embeddings: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._items_fp = None
+        self._items_map: Optional[mmap.mmap] = None
+        self._quantized: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        self._row_norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta["dim"])
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        if self._embeddings is None:
+            self._embeddings = np.load(self.path / EMBEDDINGS_FILE, mmap_mode="r")
+        return self._embeddings
+
+    def quantized(self, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(matrix, per-row scale or None) for a quantized copy, memory-mapped on first access."""
+        if dtype not in (self.meta.get("quantized") or []):
+            raise ValueError(f"No {dtype} copy in {self.path} (run: python -m src.vector_store quantize {self.path} --dtype {dtype})")
+        if dtype not in self._quantized:
+            mat = np.load(self.path / QUANTIZED_FILES[dtype], mmap_mode="r")
+            scale = np.load(self.path / SCALE_FILE, mmap_mode="r") if dtype == "int8" else None
+            self._quantized[dtype] = (mat, scale)
+        return self._quantized[dtype]
+
+    def _norms(self) -> np.ndarray:
+        if self._row_norms is None:
+            self._row_norms = np.load(self.path / NORMS_FILE, mmap_mode="r")
+        return self._row_norms
+
+    def search(
+        self,
+        queries: Any,
+        k: int = 10,
+        quantized: Optional[str] = None,
+        rescore: Optional[int] = None,
+        metric: str = "l2",
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force top-k over the store, FAISS-style: returns (scores, indices),
+        each (n_queries, k), best first, -1 where the store has fewer rows.
+        metric "l2" scores are squared distances (ascending), "ip" inner products
+        (descending).
+
+        With quantized="int8" / "float16" the scan runs over that copy and the
+        best k * rescore candidates are re-scored exactly in float32. rescore=1
+        returns the quantized ranking unchanged (to measure recall loss).
+        """
+        if metric not in ("l2", "ip"):
+            raise ValueError(f"unknown metric {metric!r}")
+        q = np.atleast_2d(np.asarray(queries, dtype="float32"))
+        n = len(self)
+        k = max(1, int(k))
+        want = min(n, k if quantized is None else k * max(1, int(RESCORE_FACTOR if rescore is None else rescore)))
+        out_scores = np.full((q.shape[0], k), np.inf if metric == "l2" else -np.inf, dtype="float32")
+        out_idx = np.full((q.shape[0], k), -1, dtype="int64")
+        if n == 0:
+            return out_scores, out_idx
+
+        if quantized is None:
+            mat, scale = self.embeddings, None
+        else:
+            mat, scale = self.quantized(quantized)
+        norms = self._norms() if metric == "l2" and quantized is not None else None
+
+        # first pass: blocked scan, keeping the best `want` per query
+        cand_scores = np.empty((q.shape[0], 0), dtype="float32")
+        cand_idx = np.empty((q.shape[0], 0), dtype="int64")
+        for start in range(0, n, SEARCH_BLOCK_ROWS):
+            block = np.asarray(mat[start:start + SEARCH_BLOCK_ROWS], dtype="float32")
+            dots = block @ q.T                                   # (rows, n_queries)
+            if scale is not None:
+                dots *= np.asarray(scale[start:start + len(block)])[:, None]
+            if metric == "l2":
+                sq = np.asarray(norms[start:start + len(block)]) if norms is not None else np.einsum("ij,ij->i", block, block)
+                scores = (sq[:, None] - 2.0 * dots).T            # ||q||^2 dropped: same for every row
+            else:
+                scores = -dots.T                                 # ascending = best first
+            idx = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            cand_scores = np.concatenate([cand_scores, scores], axis=1)
+            cand_idx = np.concatenate([cand_idx, idx], axis=1)
+            if cand_scores.shape[1] > want:
+                part = np.argpartition(cand_scores, want - 1, axis=1)[:, :want]
+                cand_scores = np.take_along_axis(cand_scores, part, axis=1)
+                cand_idx = np.take_along_axis(cand_idx, part, axis=1)
+
+        # second pass: exact float32 scores for the candidates only
+        if quantized is not None and (rescore is None or rescore > 1):
+            emb = self.embeddings
+            for i in range(q.shape[0]):
+                rows = np.sort(cand_idx[i])
+                full = np.asarray(emb[rows], dtype="float32")
+                if metric == "l2":
+                    cand_scores[i] = np.einsum("ij,ij->i", full, full) - 2.0 * (full @ q[i])
+                else:
+                    cand_scores[i] = -(full @ q[i])
+                cand_idx[i] = rows
+
+        order = np.argsort(cand_scores, axis=1)[:, :k]
+        top_scores = np.take_along_axis(cand_scores, order, axis=1)
+        top_idx = np.take_along_axis(cand_idx, order, axis=1)
+        m = top_idx.shape[1]
+        if metric == "l2":
+            out_scores[:, :m] = top_scores + np.einsum("ij,ij->i", q, q)[:, None]
+        else:
+            out_scores[:, :m] = -top_scores
+        out_idx[:, :m] = top_idx
+        return out_scores, out_idx
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Bytes each search representation keeps resident (matrix + per-row side arrays)."""
+        n, d = len(self), self.dim
+        out = {"float32": n * d * 4}
+        quantized = self.meta.get("quantized") or []
+        if "int8" in quantized:
+            out["int8"] = n * d + n * 4 + n * 4      # codes + scale + norms
+        if "float16" in quantized:
+            out["float16"] = n * d * 2 + n * 4       # codes + norms
+        return out
+
+    def _items(self) -> mmap.mmap:
+        if self._items_map is None:
+            self._offsets = np.load(self.path / OFFSETS_FILE, mmap_mode="r")
+            self._items_fp = open(self.path / ITEMS_FILE, "rb")
+            if os.fstat(self._items_fp.fileno()).st_size == 0:
+                self._items_map = mmap.mmap(-1, 1)
+            else:
+                self._items_map = mmap.mmap(self._items_fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._items_map
+
+    def item(self, i: int) -> Dict[str, Any]:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        data = self._items()
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(data[start:end])
+
+    def items(self, indices: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.item(int(i)) for i in indices]
+
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.item(i)
+
+    def close(self) -> None:
+        if self._items_map is not None:
+            self._items_map.close()
+            self._items_map = None
+        if self._items_fp is not None:
+            self._items_fp.close()
+            self._items_fp = None
+        self._embeddings = None
+        self._offsets = None
+        self._quantized = {}
+        self._row_norms = None
+
+    def __enter__(self) -> "VectorStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def load_store(path: pathlib.Path = DEFAULT_STORE_DIR) -> VectorStore:
+    return VectorStore(path)
+
+
+# =============================================================================
+# Converters
+# =============================================================================
+
+def convert_pickle(pkl_path: pathlib.Path = LEGACY_PICKLE_FILE, out: pathlib.Path = DEFAULT_STORE_DIR) -> pathlib.Path:
+    """var/vectorstore.pkl ({"items", "embeddings"}) -> store directory."""
+    with open(pkl_path, "rb") as f:
+        store = pickle.load(f)
+    return write_store(out, store["items"], store["embeddings"], source=str(pkl_path))
+
+
+def convert_rag_index(rag_dir: pathlib.Path, out: pathlib.Path) -> pathlib.Path:
+    """
+    data/rag_index (embeddings.npy + sklearn NearestNeighbors nn.pkl) -> store directory.
+    The legacy index carries no per-row metadata, so items are positional stubs.
+    nn.pkl is only unpickled (needs scikit-learn) when embeddings.npy is missing.
+    """
+    rag_dir = pathlib.Path(rag_dir)
+    emb_path = rag_dir / "embeddings.npy"
+    if emb_path.exists():
+        emb = np.load(emb_path)
+    else:
+        with open(rag_dir / "nn.pkl", "rb") as f:
+            nn = pickle.load(f)
+        emb = np.asarray(nn._fit_X)
+    emb = np.atleast_2d(emb)
+    items = [{"id": f"rag_index:{i}", "source": str(rag_dir)} for i in range(emb.shape[0])]
+    return write_store(out, items, emb, source=str(rag_dir))
+
+
+def convert_json_store(json_path: pathlib.Path, out: pathlib.Path) -> pathlib.Path:
+    """
+    LlamaIndex SimpleVectorStore JSON (data/app/default__vector_store.json:
+    embedding_dict / text_id_to_ref_doc_id / metadata_dict) -> store directory.
+    Vectors stored as decimal text become one float32 matrix; rows keep the
+    node id, ref_doc_id and node metadata.
+    """
+    data = json.loads(pathlib.Path(json_path).read_text("utf-8"))
+    emb_dict = data.get("embedding_dict") or {}
+    ref_ids = data.get("text_id_to_ref_doc_id") or {}
+    metas = data.get("metadata_dict") or {}
+    items, rows = [], []
+    for node_id, vec in emb_dict.items():
+        meta = metas.get(node_id) or {}
+        items.append({"id": node_id, "ref_doc_id": ref_ids.get(node_id), "source": meta.get("file_name") or meta.get("file_path") or "", **meta})
+        rows.append(vec)
+    emb = np.asarray(rows, dtype="float32").reshape(len(rows), -1) if rows else np.zeros((0, 0), dtype="float32")
+    return write_store(out, items, emb, source=str(json_path))
+
+
+# =============================================================================
+# Evaluation (memory footprint + recall loss of the quantized copies)
+# =============================================================================
+
+def evaluate(
+    path: pathlib.Path = DEFAULT_STORE_DIR,
+    k: int = 10,
+    n_queries: int = 200,
+    rescore: Optional[int] = None,
+    metric: str = "l2",
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Use n_queries stored rows as queries (self-matches dropped) and compare
+    each quantized search, with and without re-scoring, against exact float32.
+    recall@k = share of the exact top-k found; latency is per query.
+    """
+    store = VectorStore(path)
+    n = len(store)
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(n, size=min(n, n_queries), replace=False)) if n else np.zeros(0, dtype="int64")
+    queries = np.asarray(store.embeddings[sample], dtype="float32") if n else np.zeros((0, store.dim), dtype="float32")
+    footprint = store.memory_footprint()
+
+    def run(quantized: Optional[str], rs: Optional[int]) -> Tuple[np.ndarray, float]:
+        t0 = time.perf_counter()
+        _, idx = store.search(queries, k + 1, quantized=quantized, rescore=rs, metric=metric)
+        ms = (time.perf_counter() - t0) * 1000.0 / max(1, len(queries))
+        return np.array([[j for j in row if j != self_i and j >= 0][:k] for row, self_i in zip(idx, sample)], dtype=object), ms
+
+    def recall(found: np.ndarray, truth: np.ndarray) -> float:
+        if not len(truth):
+            return 1.0
+        return float(np.mean([len(set(f) & set(t)) / max(1, len(t)) for f, t in zip(found, truth)]))
+
+    truth, exact_ms = run(None, None)
+    report: Dict[str, Any] = {
+        "count": n, "dim": store.dim, "k": k, "queries": int(len(queries)), "metric": metric,
+        "rescore_factor": RESCORE_FACTOR if rescore is None else rescore,
+        "float32": {"bytes": footprint["float32"], "ms_per_query": round(exact_ms, 3)},
+    }
+    for dtype in store.meta.get("quantized") or []:
+        raw, raw_ms = run(dtype, 1)
+        res, res_ms = run(dtype, rescore)
+        report[dtype] = {
+            "bytes": footprint[dtype],
+            "ratio": round(footprint[dtype] / max(1, footprint["float32"]), 3),
+            "recall_at_k_quantized": round(recall(raw, truth), 4),
+            "recall_at_k_rescored": round(recall(res, truth), 4),
+            "ms_per_query_quantized": round(raw_ms, 3),
+            "ms_per_query_rescored": round(res_ms, 3),
+        }
+    store.close()
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Memory-mapped vector store tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    conv = sub.add_parser("convert", help="Convert a legacy store to the mmap format.")
+    src = conv.add_mutually_exclusive_group(required=True)
+    src.add_argument("--from-pickle", type=pathlib.Path, help="Legacy vectorstore.pkl")
+    src.add_argument("--from-rag-index", type=pathlib.Path, help="Directory with embeddings.npy / nn.pkl")
+    src.add_argument("--from-json-store", type=pathlib.Path, help="LlamaIndex default__vector_store.json")
+    conv.add_argument("--out", type=pathlib.Path, default=DEFAULT_STORE_DIR)
+    conv.add_argument("--quantize", default="", help="Also write quantized copies (int8, float16, or both comma-separated).")
+
+    quant = sub.add_parser("quantize", help="Write int8 / float16 copies for the first search pass.")
+    quant.add_argument("path", nargs="?", type=pathlib.Path, default=DEFAULT_STORE_DIR)
+    quant.add_argument("--dtype", default="int8", help="int8, float16, or both comma-separated.")
+
+    ev = sub.add_parser("evaluate", help="Report memory footprint and recall loss of the quantized copies.")
+    ev.add_argument("path", nargs="?", type=pathlib.Path, default=DEFAULT_STORE_DIR)
+    ev.add_argument("--k", type=int, default=10)
+    ev.add_argument("--queries", type=int, default=200, help="Stored rows used as queries.")
+    ev.add_argument("--rescore", type=int, default=None, help=f"Candidates re-scored per result (default {RESCORE_FACTOR}).")
+    ev.add_argument("--metric", choices=("l2", "ip"), default="l2")
+    ev.add_argument("--json", action="store_true", help="Print the raw report.")
+
+    info = sub.add_parser("info", help="Print store metadata.")
+    info.add_argument("path", nargs="?", type=pathlib.Path, default=DEFAULT_STORE_DIR)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "convert":
+        dtypes = [d.strip() for d in args.quantize.split(",") if d.strip()] if args.quantize else []
+        unknown = [d for d in dtypes if d not in QUANTIZED_FILES]
+        if unknown:  # fail before writing the store, not after
+            parser.error(f"unknown --quantize dtype(s) {unknown}; choose from {sorted(QUANTIZED_FILES)}")
+        if args.from_pickle:
+            out = convert_pickle(args.from_pickle, args.out)
+        elif args.from_json_store:
+            out = convert_json_store(args.from_json_store, args.out)
+        else:
+            out = convert_rag_index(args.from_rag_index, args.out)
+        if dtypes:
+            quantize_store(out, dtypes)
+        store = load_store(out)
+        print(f"✅ Vector store written to {out}")
+        print(f"- Vectors: {len(store)} x {store.dim}")
+        if store.meta.get("quantized"):
+            print(f"- Quantized: {', '.join(store.meta['quantized'])}")
+        return 0
+
+    if args.cmd == "quantize":
+        meta = quantize_store(args.path, [d.strip() for d in args.dtype.split(",")])
+        sizes = load_store(args.path).memory_footprint()
+        print(f"✅ Quantized {meta['count']} x {meta['dim']} vectors in {args.path}")
+        for name, size in sizes.items():
+            print(f"- {name}: {size / 1e6:.2f} MB")
+        return 0
+
+    if args.cmd == "evaluate":
+        report = evaluate(args.path, k=args.k, n_queries=args.queries, rescore=args.rescore, metric=args.metric)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            return 0
+        print(f"{report['count']} x {report['dim']} vectors, {report['queries']} queries, recall@{report['k']} vs exact float32 "
+              f"(re-scoring {report['rescore_factor']}x candidates)")
+        print(f"{'store':<9}{'MB':>9}{'ratio':>7}{'recall q':>10}{'recall rs':>11}{'ms/q q':>9}{'ms/q rs':>9}")
+        print(f"{'float32':<9}{report['float32']['bytes'] / 1e6:>9.2f}{1.0:>7.2f}{1.0:>10.4f}{1.0:>11.4f}"
+              f"{report['float32']['ms_per_query']:>9.3f}{report['float32']['ms_per_query']:>9.3f}")
+        for dtype in QUANTIZED_FILES:
+            r = report.get(dtype)
+            if r:
+                print(f"{dtype:<9}{r['bytes'] / 1e6:>9.2f}{r['ratio']:>7.2f}{r['recall_at_k_quantized']:>10.4f}"
+                      f"{r['recall_at_k_rescored']:>11.4f}{r['ms_per_query_quantized']:>9.3f}{r['ms_per_query_rescored']:>9.3f}")
+        return 0
+
+    store = load_store(args.path)
+    print(json.dumps(store.meta, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
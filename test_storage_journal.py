@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Regression test for the journal storage backend: a writer that crashed
+mid-append leaves a torn last line in the log; the next write must not be
+glued onto it and lost.
+"""
+
+import sys
+import os
+import pathlib
+import tempfile
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src import storage
+
+def _files(tmp):
+    return {c: pathlib.Path(tmp) / f"{c}.json" for c in storage.COLLECTIONS}
+
+def test_torn_tail_is_truncated():
+    """Insert after a torn line: both processes' views keep every acknowledged record."""
+    with tempfile.TemporaryDirectory(prefix="journal-torn-") as tmp:
+        files = _files(tmp)
+        first = storage.JournalBackend(files, fsync_ms=0)
+        first.insert("notes", {"title": "before crash"})
+        log_path = files["notes"].with_name("notes.journal.jsonl")
+
+        # A crashed writer: half a record, no trailing newline.
+        with open(log_path, "ab") as fp:
+            fp.write(b'{"op": "put", "record": {"id": 2, "title": "tor')
+
+        writer = storage.JournalBackend(files, fsync_ms=0)
+        saved = writer.insert("notes", {"title": "after crash"})
+        assert saved["id"] == 2, saved
+        assert writer._journals["notes"].offset == log_path.stat().st_size
+
+        # Another process already positioned before the torn bytes, and a cold reader.
+        for reader in (first, storage.JournalBackend(files, fsync_ms=0)):
+            titles = sorted(r["title"] for r in reader.all("notes"))
+            assert titles == ["after crash", "before crash"], titles
+            reader.close()
+        writer.close()
+    return True
+
+if __name__ == "__main__":
+    print("=== Testing journal torn-tail recovery ===\n")
+    try:
+        success = test_torn_tail_is_truncated()
+    except AssertionError as e:
+        print(f"Assertion failed: {e!r}")
+        success = False
+    print(f"Torn tail test: {'PASS' if success else 'FAIL'}")
+    if success:
+        print("\n✅ All tests passed!")
+    else:
+        print("\n❌ Some tests failed. Check the errors above.")
+        sys.exit(1)